@@ -5,235 +5,82 @@
 # INPUT FILES:
 #   EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv
 #   COUNTYFP_TX.csv
-#   PLACES__Local_Data_for_Better_Health,_County_Data_2024_release_20251119.xlsx
+#   PLACES__Local_Data_for_Better_Health,_County_Data_2024_release_20251119.csv
+#   county_adjacency2023.txt (optional, Census county adjacency file for the spatial stage)
 
 # NECESSARY LIBRARIES:
 #   numpy
 #   pandas
-#   sqlalchemy
+#   scipy (spatial stage)
 #   scikit-learn
 #   matplotlib
 #   seaborn
-#   pip install numpy pandas sqlalchemy scikit-learn matplotlib seaborn
+#   openpyxl (only with EXPORT_EXCEL = True)
+#   pip install numpy pandas scipy scikit-learn matplotlib seaborn openpyxl
+
+# The script is split into stages (see make_stages() at the bottom and stage_runner.py).
+# Each stage's result is cached in OutputData/cache and a stage only re-runs when its
+# input files, code, parameters or upstream stages changed (or a file it writes is missing).
+# The figure stages (pca, regression_plots, final_plots) run every time; with --headless the
+# figures that did not change are not redrawn. The walkability and PLACES branches run at the same time.
+#   python "Data Dominators Walkability vs Obesity.py"                    # run whatever is out of date
+#   python "Data Dominators Walkability vs Obesity.py" pcr                # run pcr and what it needs
+#   python "Data Dominators Walkability vs Obesity.py" --only pcr         # (same, by stage name)
+#   python "Data Dominators Walkability vs Obesity.py" --force final_plots
+#   python "Data Dominators Walkability vs Obesity.py" --force all
+#   python "Data Dominators Walkability vs Obesity.py" --headless --formats png svg   # no windows
+#   python "Data Dominators Walkability vs Obesity.py" --force all --profile pcr        # cProfile one stage
+#
+# Every run writes a trace of the stages (time, memory, rows in / out) to OutputData/trace/trace.json.
+#
+# Subcommands: condense, clean-health, merge, persist, spatial, pca, pcr, plot, all (the default).
+# pandas, sklearn, matplotlib and seaborn are only imported inside the stages that use them, so a
+# condense or merge job doesn't pay for the modelling and plotting libraries.
+#   python "Data Dominators Walkability vs Obesity.py" merge --profile-startup   # report import cost
+
+import argparse
+import os
+import sys
+
+from instrument import check_fanout, format_summary, profile_startup, write_trace
+from stage_runner import Stage, run_stages
+
+# The .xlsx files are optional deliverables; the pipeline itself passes data through the cache
+EXPORT_EXCEL = False
+
+# Target memory (MB) for the walkability ingest, set with --memory-budget. None = pandas default dtypes.
+MEMORY_BUDGET_MB = None
+
+# Where the walkability block groups are rolled up to counties, set with --backend:
+#   "pandas"  the block group store is sliced into a DataFrame and grouped (condense_counties)
+#   "sqlite"  the block groups are loaded once into SQLite and rolled up with one GROUP BY (see sld_sql.py)
+CONDENSE_BACKEND = "pandas"
+
+# Number of principal components in the PCR model, or "cv" to use the count picked by cross-validation
+# (set with --pcr-components). The CV curve over every count is printed either way.
+PCR_COMPONENTS = 5
+CV_FOLDS = 5
+CV_REPEATS = 3
+
+# Bootstrap resamples for the confidence intervals on the PCR coefficients / contributions (--bootstrap, 0 = off)
+PCR_BOOTSTRAP = 0
+
+# County contiguity from the Census county adjacency file (a local copy; see spatial.py). When the file is
+# there, the spatial stage writes Moran's I for obesity and the predictors and adds lag_<predictor> columns
+# (neighbor means) to the merged table; --spatial-lags also puts those columns into the PCR model.
+adjacency_path = "InputData/county_adjacency2023.txt"
+SPATIAL_LAGS = False
+MORAN_PERMUTATIONS = 999
+
+# Figures open in windows by default; with --headless they are rendered to OutputData/figures
+# (in parallel, skipping figures whose data hasn't changed) so a batch run never waits on plt.show()
+HEADLESS = False
+FIGURE_FORMATS = ["png"]
 
-print("# ====================================================================================================================== #")
-print("#                                                  DATA CLEANING                                                         #")
-print("# ====================================================================================================================== #")
-# --------- Ethan's Section --------- #
-import pandas as pd
-
-# Filtering walkability dataset down to Texas (state 48)
 walk_path = "InputData/EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv"
-print("="*10, f"Importing {walk_path}", "="*10)
-walk_df = pd.read_csv(walk_path)
-print("Filtering data down to Texas (FIP code 48000)")
-walk_tx_df = walk_df[walk_df['STATEFP'] == 48]
-# walk_tx_df.to_csv('WalkabilityTX.csv', index=False)
-
-# Importing and joining county name data on to walkability data
-# Source: https://transition.fcc.gov/oet/info/maps/census/fips/fips.txt
-print("Merging Texas county FIP codes with county names.")
-county_fp_df = pd.read_csv("InputData/COUNTYFP_TX.csv")
-merged_df = walk_tx_df.merge(county_fp_df, how='left')
-
-# Defining new columns with calculations done to collapse region data into single rows of county data
-def condense_function(df):
-    new_df = pd.Series({
-        'COUNTY_POP': df['TotPop'].sum(), # Total population of county
-        'COUNTY_EMP': df['TotEmp'].sum(), # Total employed population of county
-        'total_low_wage_emp': df['E_LowWageWk'].sum(),
-        'total_med_wage_emp': df['E_MedWageWk'].sum(),
-        'total_hi_wage_emp': df['E_HiWageWk'].sum(),
-        'pct_low_wage_emp': df['E_LowWageWk'].sum() / df['TotEmp'].sum(),
-        'pct_med_wage_emp': df['E_MedWageWk'].sum() / df['TotEmp'].sum(),
-        'pct_hi_wage_emp': df['E_HiWageWk'].sum() / df['TotEmp'].sum(),
-        'COUNTY_WRK': df['Workers'].sum(), # Total worker population of county
-        'total_low_wage_wrk': df['R_LowWageWk'].sum(),
-        'total_med_wage_wrk': df['R_MedWageWk'].sum(),
-        'total_hi_wage_wrk': df['R_HiWageWk'].sum(),
-        'pct_low_wage_wrk': df['R_LowWageWk'].sum() / df['Workers'].sum(),
-        'pct_med_wage_wrk': df['R_MedWageWk'].sum() / df['Workers'].sum(),
-        'pct_hi_wage_wrk': df['R_HiWageWk'].sum() / df['Workers'].sum(),
-        'HH_total': df['HH'].sum(), # total number of households in county
-        'total_0_autos': df['AutoOwn0'].sum(), # number of households with 0 vehicles
-        'total_1_autos': df['AutoOwn1'].sum(), # number of households with 1 vehicles
-        'total_2_autos': df['AutoOwn2p'].sum(), # number of households with 2 or more vehicles
-        '0_autos_pct': df['AutoOwn0'].sum() / df['HH'].sum(), # percentage of households with 0 vehicles
-        '1_autos_pct': df['AutoOwn1'].sum() / df['HH'].sum(), # percentage of households with 1 vehicles
-        '2_autos_pct': df['AutoOwn2p'].sum() / df['HH'].sum(), # percentage of households with 2 or more vehicles
-        'wtd_WrkAge_pop_pct': (df['P_WrkAge'] * df['TotPop']).sum() / df['TotPop'].sum(), # percentage of working age people in population
-        'wtd_avg_walk_index': (df['NatWalkInd'] * df['TotPop']).sum() / df['TotPop'].sum() # average walkability index weighted by region population in county
-    })
-    return new_df
-new_walk_tx_df = merged_df.groupby(['Texas County']).apply(condense_function).reset_index()
-
-# Exporting condensed dataset to view and verify
-print("Dataset cleaned.")
-output_file = "OutputData/Walkability_County_Condensed.xlsx"
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    new_walk_tx_df.to_excel(writer, sheet_name='Walkability_Condensed', index=False)
-print("="*10, f"Exported to {output_file}", "="*10)
-
-# --------- Tejas' Section --------- # 
-# Load File
-# df = pd.read_excel("Texas_df.xlsx")
+county_fp_path = "InputData/COUNTYFP_TX.csv"
 health_path = "InputData/PLACES__Local_Data_for_Better_Health,_County_Data_2024_release_20251119.csv"
-print("="*10, f"Importing {health_path}", "="*10)
-df = pd.read_csv(health_path)
-print("Filtering data down to Texas.")
-df = df[df["StateAbbr"] == "TX"]
-
-# Drop Columns
-drop_cols = [
-    "DataSource",
-    "Data_Value_Footnote_Symbol",
-    "Data_Value_Footnote",
-    "CategoryID",
-    "Geolocation",
-    "Data_Value_Unit"
-]
-
-df = df.drop(columns=[c for c in drop_cols if c in df.columns])
-df = df.drop_duplicates()
-
-measures_to_keep = [
-    "Obesity among adults",
-    "Food insecurity in the past 12 months among adults",
-    "No leisure-time physical activity among adults"
-]
-
-df = df[df["Measure"].isin(measures_to_keep)]
-
-# Pivot Table
-df_counties = df.pivot_table(
-    index=["LocationName", "TotalPopulation", "TotalPop18plus"],
-    columns="Measure",
-    values="Data_Value",
-    aggfunc="mean"
-).reset_index()
-
-# Round Numbers 
-measure_cols = [
-    "Obesity among adults",
-    "Food insecurity in the past 12 months among adults",
-    "No leisure-time physical activity among adults"
-]
-
-for col in measure_cols:
-    df_counties[col] = pd.to_numeric(df_counties[col], errors="coerce").round(1)
-
-# Rename LocationName
-df_counties = df_counties.rename(columns={
-    "LocationName": "Texas County"
-})
-
-# Save Clean Data
-df_counties.to_excel("OutputData/df_tx_counties_health.xlsx", index=False)
-
-print("Cleaned file written to OutputData/df_tx_counties_health.xlsx")
-
-print("# ====================================================================================================================== #")
-print("#                                                  MERGE DATASETS                                                        #")
-print("# ====================================================================================================================== #")
-# --------- Mychael/Group Section --------- # 
-import pandas as pd
-from sqlalchemy import create_engine
-import matplotlib.pyplot as plt
-county_health_df = pd.read_excel('OutputData/df_tx_counties_health.xlsx', sheet_name='Sheet1')
-walkability_df = pd.read_excel('OutputData/Walkability_County_Condensed.xlsx', sheet_name='Walkability_Condensed')
-
-merged_df = county_health_df.merge (walkability_df, how='left')
-print (merged_df.head)
-merged_df.to_excel('OutputData/Merged_Data.xlsx', index=False)
-
-engine = create_engine('sqlite:///OutputData/my_database.db')
-merged_df.to_sql('Merged_Main', con=engine, if_exists='replace', index=False)
-query = """
-    SELECT
-        "TotalPopulation", "TotalPop18plus", "Food insecurity in the past 12 months among adults", 
-        "No leisure-time physical activity among adults", "Obesity among adults", "pct_low_wage_emp",
-        "pct_med_wage_emp", "pct_hi_wage_emp", "pct_low_wage_wrk", "pct_med_wage_wrk", "pct_hi_wage_wrk",
-        "HH_total", "0_autos_pct", "1_autos_pct", "2_autos_pct", "wtd_WrkAge_pop_pct", "wtd_avg_walk_index"
-    FROM
-        Merged_Main;
-"""
-results_df = pd.read_sql(query, engine) 
-print(results_df.head)
-print(results_df.describe(include='all'))
-
-print("# ====================================================================================================================== #")
-print("#                                                      ANALYSIS                                                          #")
-print("# ====================================================================================================================== #")
-# --------- PCA - Ethan --------- # 
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import StandardScaler    # pip install scikit-learn
-from sklearn.decomposition import PCA
-
-df = results_df.copy()
-
-X = df.drop(columns=["Obesity among adults", "TotalPopulation", "TotalPop18plus", "HH_total"])
-y = df["Obesity among adults"]
-
-# Data Normalization
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Run PCA
-pca = PCA()
-X_pca = pca.fit_transform(X_scaled)
-
-print("\nPercentages of explained variance (Scree Plot Data):")
-print(np.round(pca.explained_variance_ratio_, 4))
-
-loadings = pd.DataFrame(
-    pca.components_,
-    columns=X.columns,
-    index=[f"PC{i+1}" for i in range(len(X.columns))]
-)
-
-pca_df = pd.DataFrame(X_pca, columns=[f"PC{i+1}" for i in range(X_pca.shape[1])])
-pca_df['Obesity'] = y.values
-
-corr = pca_df.corr()['Obesity'].sort_values(ascending=False)
-print("\nCorrelation of Principal Components with Obesity:")
-print(corr)
-
-# Getting loadings for PC1 & PC2
-loadings = pca.components_.T[:, 0:2]
-
-plt.figure(figsize=(10,8))
-
-# PCA Biplot
-plt.scatter(pca_df["PC1"], pca_df["PC2"], alpha=0.4)
-for i, var in enumerate(X.columns):
-    plt.arrow(0, 0, loadings[i,0]*5, loadings[i,1]*5,
-              head_width=0.05, color='red')
-    plt.text(loadings[i,0]*5*1.1, loadings[i,1]*5*1.1, var,
-             color='darkred', fontsize=9)
-plt.xlabel("PC1")
-plt.ylabel("PC2")
-plt.title("PCA Biplot")
-plt.grid(True)
-plt.axhline(0, color='black', linewidth=1)
-plt.axvline(0, color='black', linewidth=1)
-plt.show()
-
-# --------- PCR - Tejas --------- # 
-# PCR ANALYSIS
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import r2_score, mean_squared_error
-
-# Load Merged DF
-Merged_Data = pd.read_excel(
-    "OutputData/Merged_Data.xlsx",
-    sheet_name="Sheet1"
-)
+db_path = "OutputData/my_database.db"
 
 # Walkability predictor
 walkability_cols = [
@@ -243,165 +90,477 @@ walkability_cols = [
     "wtd_WrkAge_pop_pct", "wtd_avg_walk_index"
 ]
 
-# Data Cleaning
-df = Merged_Data[walkability_cols + ["Obesity among adults"]].copy()
-
-df["Obesity_clean"] = (
-    df["Obesity among adults"]
-      .astype(str)        # ensure string
-      .str.strip()        # remove spaces
-      .str.rstrip("%")    # drop % sign if present
-)
-
-df["Obesity_clean"] = pd.to_numeric(df["Obesity_clean"], errors="coerce")
-df = df.dropna(subset=walkability_cols + ["Obesity_clean"])
-
-X = df[walkability_cols]
-y = df["Obesity_clean"]     
-
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# PCA Analysis
-
-n_components = min(5, X_scaled.shape[1])
-pca = PCA(n_components=n_components)
-X_pca = pca.fit_transform(X_scaled)
-
-print("Explained variance for selected components:")
-for i, ev in enumerate(pca.explained_variance_ratio_):
-    print(f"PC{i+1}: {ev:.4f}")
-
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X_pca, y, test_size=0.2, random_state=42
-)
-
-# Linear Regression
-model = LinearRegression()
-model.fit(X_train, y_train)
-
-y_pred = model.predict(X_test)
-
-r2 = r2_score(y_test, y_pred)
-mse = mean_squared_error(y_test, y_pred)
-
-print("\nPCR Model Results:")
-print(f"R-squared: {r2:.4f}")
-print(f"MSE: {mse:.4f}")
-
-pc_names = [f"PC{i+1}" for i in range(n_components)]
-coeffs = pd.Series(model.coef_, index=pc_names)
-
-print("\nRegression coefficients on PCs:")
-print(coeffs)
-
-loading_matrix = pd.DataFrame(
-    pca.components_.T,          # predictors x components
-    index=walkability_cols,
-    columns=pc_names
-)
-
-contrib = loading_matrix.mul(coeffs.values, axis=1).sum(axis=1)
-contrib = contrib.sort_values(ascending=False)
-
-print("\nFeature contributions to Obesity (PCR interpretation):")
-print(contrib)
+# Subcommand -> the stages it runs (plus whatever they depend on); None runs every stage
+COMMANDS = {
+    "condense": ["walkability_condense"],
+    "clean-health": ["places_pivot"],
+    "merge": ["merge"],
+    "persist": ["persist"],
+    "spatial": ["spatial"],
+    "pca": ["pca"],
+    "pcr": ["pcr"],
+    "plot": ["regression_plots", "final_plots"],
+    "all": None,
+}
+
+# Helper modules the stages depend on, by file name (hashed into the stage cache keys without importing them)
+def code_files(*names):
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.join(here, f"{name}.py") for name in names]
+
+# Shows or renders a list of figures.FigureSpec
+def plot(specs):
+    import figures
+    if HEADLESS:
+        status = figures.render_figures(specs, formats=FIGURE_FORMATS)
+        rendered = sum(v == "rendered" for v in status.values())
+        print(f"{rendered} figure(s) rendered, {len(status) - rendered} unchanged in {figures.FIGURE_DIR}")
+    else:
+        figures.show_figures(specs)
+
+
+# ====================================================================================================================== #
+#                                                  DATA CLEANING                                                         #
+# ====================================================================================================================== #
+# --------- Ethan's Section --------- #
+def walkability_condense():
+    import pandas as pd
+    from walkability import attach_county_names, condense_counties, plan_chunksize, unmatched_counties
+    from sld_store import load_sld
+    from geo_index import report_unmatched
+
+    # SQLite backend: the Texas block groups never enter pandas, only the condensed county rows do
+    if CONDENSE_BACKEND == "sqlite":
+        from sld_sql import load_sld_sql, condense_counties_sql
+        print("="*10, f"Rolling up {walk_path} in SQLite", "="*10)
+        load_sld_sql(walk_path)
+        new_walk_tx_df, unmatched = condense_counties_sql(pd.read_csv(county_fp_path), key='Texas County', statefp=48)
+        report_unmatched("sld_counties", unmatched)
+    else:
+        # Filtering walkability dataset down to Texas (state 48)
+        # The first run parses the csv (only the columns used by condense_function) into a memory-mapped
+        # block group store sorted by county; later runs just slice Texas out of it (see sld_store.py)
+        print("="*10, f"Importing {walk_path}", "="*10)
+        print("Filtering data down to Texas (FIP code 48000)")
+        # With --memory-budget the store is built from csv chunks sized to the budget (one column at a time)
+        # and the Texas slice uses the compact dtype plan
+        if MEMORY_BUDGET_MB:
+            walk_tx_df = load_sld(walk_path, statefp=48, chunksize=plan_chunksize(walk_path, MEMORY_BUDGET_MB), compact=True)
+        else:
+            walk_tx_df = load_sld(walk_path, statefp=48)
+        # walk_tx_df.to_csv('WalkabilityTX.csv', index=False)
+
+        # Importing and joining county name data on to walkability data
+        # Source: https://transition.fcc.gov/oet/info/maps/census/fips/fips.txt
+        print("Merging Texas county FIP codes with county names.")
+        # (adds the integer GEOID and looks the name up by it, in place instead of merging a copy of the whole frame)
+        county_fp_df = pd.read_csv(county_fp_path)
+        merged_df = attach_county_names(walk_tx_df, county_fp_df, key='Texas County', statefp=48)
+        report_unmatched("sld_counties", unmatched_counties(merged_df, key='Texas County'))
+
+        # Collapsing region data into single rows of county data (see condense_function in walkability.py)
+        # All block group sums are taken in one grouped pass, then the shares and weighted averages come from those sums
+        new_walk_tx_df = condense_counties(merged_df, key=['GEOID', 'Texas County'])
+    print("Dataset cleaned.")
+
+    # Exporting condensed dataset to view and verify
+    if EXPORT_EXCEL:
+        output_file = "OutputData/Walkability_County_Condensed.xlsx"
+        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            new_walk_tx_df.to_excel(writer, sheet_name='Walkability_Condensed', index=False)
+        print("="*10, f"Exported to {output_file}", "="*10)
+    return new_walk_tx_df
+
+# --------- Tejas' Section --------- #
+def places_pivot():
+    import pandas as pd
+    from places import read_places, clean_places
+    from geo_index import CountyIndex, MISSING, attach_geoids, report_unmatched
+
+    # Load File
+    # df = pd.read_excel("Texas_df.xlsx")
+    # The csv is streamed and only Texas rows for the three measures are kept (see places.py)
+    print("="*10, f"Importing {health_path}", "="*10)
+    print("Filtering data down to Texas.")
+    df = read_places(health_path, states="TX")
+    # De-duplicating and pivoting to one row per county
+    df_counties = clean_places(df, state=None, county_col="Texas County")
+
+    # County names -> GEOID through the normalized name index (resolved once, cached in OutputData/cache)
+    index = CountyIndex.from_table(pd.read_csv(county_fp_path), "Texas County", statefp=48)
+    df_counties = attach_geoids(df_counties, index, "Texas County", "TX", county_fips_path=county_fp_path)
+    report_unmatched("places_names", df_counties.loc[df_counties["GEOID"] == MISSING, ["Texas County"]])
+
+    # Save Clean Data
+    if EXPORT_EXCEL:
+        df_counties.to_excel("OutputData/df_tx_counties_health.xlsx", index=False)
+        print("Cleaned file written to OutputData/df_tx_counties_health.xlsx")
+    return df_counties
+
+# ====================================================================================================================== #
+#                                                  MERGE DATASETS                                                        #
+# ====================================================================================================================== #
+# --------- Mychael/Group Section --------- #
+def merge(county_health_df, walkability_df):
+    from geo_index import report_unmatched
+
+    # integer join on the county GEOID (the county name comes from the health side)
+    merged_df = county_health_df.merge (walkability_df.drop(columns='Texas County'), how='left', on='GEOID')
+    check_fanout(county_health_df, merged_df, "health+walkability")
+    report_unmatched("merge_no_walkability",
+                     county_health_df.loc[~county_health_df["GEOID"].isin(walkability_df["GEOID"]), ["GEOID", "Texas County"]])
+    print (merged_df.head)
+    if EXPORT_EXCEL:
+        merged_df.to_excel('OutputData/Merged_Data.xlsx', index=False)
+    return merged_df
+
+def persist(merged_df):
+    import pandas as pd
+    from merged_store import DEFAULT_VINTAGE, write_merged, query_counties
+    from geo_index import MISSING, unpack_geoid
+
+    # Typed, indexed Merged_Main table; only counties whose values changed get written (see merged_store.py)
+    # (COUNTYFP comes straight out of the GEOID, no lookup against the FIPS table)
+    countyfp = pd.Series(unpack_geoid(merged_df['GEOID'])[1], index=merged_df.index)
+    coded_df = merged_df.assign(COUNTYFP=countyfp.where(merged_df['GEOID'] != MISSING))
+    written = write_merged(db_path, coded_df, state="TX",
+                           county_col="Texas County", vintage=DEFAULT_VINTAGE, statefp=48)
+    print(f"{written} counties written to Merged_Main in {db_path}")
+
+    # read back the vintage just written (vintages.py appends other releases to the same database)
+    results_df = query_counties(db_path, states="TX", vintage=DEFAULT_VINTAGE, columns=[
+        "TotalPopulation", "TotalPop18plus", "Food insecurity in the past 12 months among adults",
+        "No leisure-time physical activity among adults", "Obesity among adults", "pct_low_wage_emp",
+        "pct_med_wage_emp", "pct_hi_wage_emp", "pct_low_wage_wrk", "pct_med_wage_wrk", "pct_hi_wage_wrk",
+        "HH_total", "0_autos_pct", "1_autos_pct", "2_autos_pct", "wtd_WrkAge_pop_pct", "wtd_avg_walk_index"
+    ])
+    print(results_df.head)
+    print(results_df.describe(include='all'))
+    return results_df
+
+# --------- Spatial weights --------- #
+def spatial(merged_df):
+    import pandas as pd
+    from geo_index import CountyIndex
+    from spatial import SpatialWeights, add_spatial_lags, local_moran, located_values, moran_table
+
+    if not os.path.exists(adjacency_path):
+        if SPATIAL_LAGS:
+            raise FileNotFoundError(f"--spatial-lags needs the county adjacency file at {adjacency_path}")
+        print(f"No county adjacency file at {adjacency_path}; skipping the spatial weights.")
+        return merged_df
+
+    # Contiguity between every county in COUNTYFP_TX.csv (same GEOID keys), then restricted to the merged rows
+    # (counties whose name didn't resolve have GEOID MISSING: islands, left out of the Moran's I tests)
+    index = CountyIndex.from_table(pd.read_csv(county_fp_path), "Texas County", statefp=48)
+    weights = SpatialWeights.from_adjacency(index.geoids, adjacency_path).subset(merged_df["GEOID"])
+    print(f"{len(weights)} counties, {weights.neighbors.nnz // 2} neighbor pairs, {len(weights.islands)} islands")
+
+    df = merged_df.assign(Obesity_clean=pd.to_numeric(
+        merged_df["Obesity among adults"].astype(str).str.strip().str.rstrip("%"), errors="coerce"))
+    moran_df = moran_table(df, weights, ["Obesity_clean"] + walkability_cols, MORAN_PERMUTATIONS)
+    moran_df.to_csv("OutputData/Spatial_Moran.csv", index=False)
+    print(f"Global Moran's I ({MORAN_PERMUTATIONS} permutations):")
+    print(moran_df[["column", "n", "I", "z_sim", "p_sim"]].to_string(index=False))
+
+    local = []
+    for col in ["Obesity_clean", "wtd_avg_walk_index"]:
+        x, ok = located_values(df, weights, col)
+        part = local_moran(x[ok], weights.subset(weights.geoids[ok]), MORAN_PERMUTATIONS)
+        local.append(part.assign(column=col))
+    pd.concat(local, ignore_index=True).to_csv("OutputData/Spatial_Local_Moran.csv", index=False)
+
+    return add_spatial_lags(merged_df, weights, walkability_cols)
+
+# ====================================================================================================================== #
+#                                                      ANALYSIS                                                          #
+# ====================================================================================================================== #
+# --------- PCA - Ethan --------- #
+def pca_analysis(results_df):
+    import numpy as np
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler    # pip install scikit-learn
+    from sklearn.decomposition import PCA
+    from moments import MomentAccumulator
+    from figures import FigureSpec, draw_biplot
+
+    df = results_df.copy()
+
+    X = df.drop(columns=["Obesity among adults", "TotalPopulation", "TotalPop18plus", "HH_total"])
+    y = df["Obesity among adults"]
+
+    # Data Normalization
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # Run PCA
+    pca = PCA()
+    X_pca = pca.fit_transform(X_scaled)
+
+    print("\nPercentages of explained variance (Scree Plot Data):")
+    print(np.round(pca.explained_variance_ratio_, 4))
+
+    loadings = pd.DataFrame(
+        pca.components_,
+        columns=X.columns,
+        index=[f"PC{i+1}" for i in range(len(X.columns))]
+    )
+
+    pca_df = pd.DataFrame(X_pca, columns=[f"PC{i+1}" for i in range(X_pca.shape[1])])
+    pca_df['Obesity'] = y.values
+
+    # (pairwise-complete Pearson correlation from one pass of moments, same as pca_df.corr())
+    corr = MomentAccumulator.from_frame(pca_df, pairwise=True).correlation()['Obesity'].sort_values(ascending=False)
+    print("\nCorrelation of Principal Components with Obesity:")
+    print(corr)
+
+    # Getting loadings for PC1 & PC2
+    loadings = pca.components_.T[:, 0:2]
+
+    # PCA Biplot
+    plot([FigureSpec("pca_biplot", draw_biplot,
+                             {"pca_df": pca_df[["PC1", "PC2"]], "loadings": loadings, "columns": list(X.columns)},
+                             figsize=(10, 8))])
+    return pca_df
+
+# --------- PCR - Tejas --------- #
+# PCR ANALYSIS
+def pcr(Merged_Data):
+    import numpy as np
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.decomposition import PCA
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import r2_score, mean_squared_error
+    from pcr_cv import cv_components
+    from model_paths import best_by_family, compare_models
+    from pcr_bootstrap import bootstrap_pcr
+    from linear_predictor import PREDICTOR_PATH, collapse_pcr
+
+    # Predictors: the walkability columns, plus their neighbor means with --spatial-lags (spatial stage)
+    predictors = walkability_cols + ([f"lag_{col}" for col in walkability_cols] if SPATIAL_LAGS else [])
+
+    # Data Cleaning
+    df = Merged_Data[predictors + ["Obesity among adults"]].copy()
+
+    df["Obesity_clean"] = (
+        df["Obesity among adults"]
+          .astype(str)        # ensure string
+          .str.strip()        # remove spaces
+          .str.rstrip("%")    # drop % sign if present
+    )
+
+    df["Obesity_clean"] = pd.to_numeric(df["Obesity_clean"], errors="coerce")
+    df = df.dropna(subset=predictors + ["Obesity_clean"])
+
+    X = df[predictors]
+    y = df["Obesity_clean"]
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # Cross-validated error for every number of components (one SVD per fold)
+    cv_curve, cv_k = cv_components(X.to_numpy(), y.to_numpy(), n_splits=CV_FOLDS, n_repeats=CV_REPEATS)
+    print(f"Cross-validated PCR ({CV_FOLDS}-fold x {CV_REPEATS}):")
+    print(cv_curve.to_string(index=False))
+    print(f"Lowest CV MSE with {cv_k} components")
+
+    # OLS, PCR, ridge, lasso / elastic-net paths and the univariate fits scored on the same folds
+    # (one Gram matrix per fold for all of them)
+    model_table, model_coefs = compare_models(X, y, n_splits=CV_FOLDS, n_repeats=CV_REPEATS)
+    model_table.to_csv("OutputData/Model_Comparison.csv", index=False)
+    print(f"\nBest cross-validated model per family ({len(model_table)} models, all in OutputData/Model_Comparison.csv):")
+    print(best_by_family(model_table)[["model", "nonzero", "cv_mse", "cv_mse_se", "cv_r2"]].to_string(index=False))
+
+    # PCA Analysis
+
+    n_components = cv_k if PCR_COMPONENTS == "cv" else min(PCR_COMPONENTS, X_scaled.shape[1])
+    pca = PCA(n_components=n_components)
+    X_pca = pca.fit_transform(X_scaled)
+
+    print("Explained variance for selected components:")
+    for i, ev in enumerate(pca.explained_variance_ratio_):
+        print(f"PC{i+1}: {ev:.4f}")
+
+    # Train-test split
+    X_train, X_test, y_train, y_test, train_rows, _ = train_test_split(
+        X_pca, y, np.arange(len(y)), test_size=0.2, random_state=42
+    )
+
+    # Linear Regression
+    model = LinearRegression()
+    model.fit(X_train, y_train)
+
+    y_pred = model.predict(X_test)
+
+    r2 = r2_score(y_test, y_pred)
+    mse = mean_squared_error(y_test, y_pred)
+
+    print("\nPCR Model Results:")
+    print(f"R-squared: {r2:.4f}")
+    print(f"MSE: {mse:.4f}")
+
+    pc_names = [f"PC{i+1}" for i in range(n_components)]
+    coeffs = pd.Series(model.coef_, index=pc_names)
+
+    print("\nRegression coefficients on PCs:")
+    print(coeffs)
+
+    loading_matrix = pd.DataFrame(
+        pca.components_.T,          # predictors x components
+        index=predictors,
+        columns=pc_names
+    )
+
+    contrib = loading_matrix.mul(coeffs.values, axis=1).sum(axis=1)
+    contrib = contrib.sort_values(ascending=False)
+
+    print("\nFeature contributions to Obesity (PCR interpretation):")
+    print(contrib)
+
+    # Percentile intervals from refitting the whole PCR on resampled counties: the PCA on all of them and the
+    # regression on the train rows, as above, so the estimates are the coefficients and contributions printed above
+    boot = None
+    if PCR_BOOTSTRAP:
+        boot = bootstrap_pcr(X, y, n_components, n_boot=PCR_BOOTSTRAP, fit_rows=train_rows,
+                             components=pca.components_.T)
+        print(f"\nBootstrap 95% intervals ({PCR_BOOTSTRAP} resamples of the train and test counties):")
+        print(boot["coeffs"])
+        print(boot["contrib"])
+
+    # The fitted scaler -> PCA -> regression as one intercept + coefficient vector on the raw predictors.
+    # Saved as a small json so scoring jobs can use it without refitting or sklearn (see linear_predictor.py).
+    predictor = collapse_pcr(scaler, pca, model, predictors, target="Obesity_clean")
+    predictor.save(PREDICTOR_PATH)
+
+    # Everything the regression plots need
+    return {"df": df, "predictors": predictors, "X_scaled": X_scaled, "scaler": scaler, "pca": pca, "model": model,
+            "coeffs": coeffs, "contrib": contrib, "cv_curve": cv_curve, "cv_k": cv_k, "bootstrap": boot,
+            "model_table": model_table, "model_coefs": model_coefs,
+            "predictor": predictor}
 
 # --------- Regression Analysis - Mychael --------- #
-import seaborn as sns
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-from sklearn.linear_model import LinearRegression
-
-for col in walkability_cols:
-    plt.figure()
-    sns.regplot(x=df[col], y=df["Obesity_clean"], scatter_kws={"alpha":0.5})
-    plt.xlabel(col)
-    plt.ylabel("Obesity_clean")
-    plt.title(f"{col} vs Obesity")
-    plt.show()
-
-X_pca_3 = pca.fit_transform(X_scaled)[:, :3]
-fig = plt.figure()
-ax = fig.add_subplot(111, projection='3d')
-sc = ax.scatter(X_pca_3[:,0], X_pca_3[:,1], X_pca_3[:,2],
-                c=df["Obesity_clean"], cmap="viridis")
-ax.set_xlabel("PC1")
-ax.set_ylabel("PC2")
-ax.set_zlabel("PC3")
-fig.colorbar(sc, label="Obesity_clean")
-plt.show()
-
-x_var="pct_low_wage_emp"
-y_var="pct_med_wage_emp"
-
-x_grid =np.linspace(df[x_var].min(), df[x_var].max(), 30)
-y_grid =np.linspace(df[y_var].min(), df[y_var].max(), 30)
-X_grid, Y_grid = np.meshgrid(x_grid, y_grid)
-
-base = df[walkability_cols].mean() #this averages all of the predictors
-n = X_grid.size
-
-grid_df = pd.DataFrame({
-    col: np.full(n, base[col]) for col in walkability_cols
-})
-grid_df[x_var] = X_grid.ravel()
-grid_df[y_var] = Y_grid.ravel()
-
-grid_scaled = scaler.transform(grid_df)
-grid_pca = pca.transform(grid_scaled)
-y_grid_pred = model.predict(grid_pca).reshape(X_grid.shape)
-
-# Plotting #
-
-fig = plt.figure()
-ax = fig.add_subplot(111, projection='3d')
-ax.plot_surface(X_grid, Y_grid, y_grid_pred, cmap= "viridis", alpha=0.8)
-ax.set_xlabel(x_var)
-ax.set_ylabel(y_var)
-ax.set_zlabel("Predicted Obesity")
-plt.show()
-
-# --------- Plotting script for the Data Dominators project - Suad --------- # 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# load the merged dataset
-# df = pd.read_excel("OutputData/Merged_Data.xlsx")
-
-# Walkability vs Obesity
-plt.figure(figsize=(8, 6))
-plt.scatter(
-    results_df["wtd_avg_walk_index"],
-    results_df["Obesity among adults"],
-    alpha=0.6
-)
-plt.xlabel("Weighted Walkability Index")
-plt.ylabel("Obesity (%)")
-plt.title("Walkability vs. Obesity in Texas Counties")
-plt.grid(True)
-plt.show()
-
-# Food Insecurity vs Obesity
-plt.figure(figsize=(8, 6))
-plt.scatter(results_df["Food insecurity in the past 12 months among adults"], 
-            results_df["Obesity among adults"], 
-            alpha=0.6)
-plt.xlabel("Food Insecurity (%)")
-plt.ylabel("Obesity (%)")
-plt.title("Food Insecurity vs Obesity")
-plt.grid(True)
-plt.show()
-
-# Correlation Heatmap
-plt.figure(figsize=(12, 8))
-sns.heatmap(
-    results_df.corr(),
-    annot=True,
-    cmap="coolwarm",
-    fmt=".2f"
-)
-plt.title("Correlation Matrix for Walkability, Food Access, and Health Measures")
-plt.show()
+def regression_plots(pcr_results):
+    import numpy as np
+    from sklearn.decomposition import PCA
+    from figures import FigureSpec, draw_regplot, draw_pc_scatter_3d, draw_response_surface
+
+    df = pcr_results["df"]
+    X_scaled = pcr_results["X_scaled"]
+
+    specs = [FigureSpec(f"regplot_{col}", draw_regplot, {"x": df[col], "y": df["Obesity_clean"]})
+             for col in walkability_cols]
+
+    # (its own 3-component PCA, the PCR model may use fewer components)
+    X_pca_3 = PCA(n_components=3).fit_transform(X_scaled)
+    specs.append(FigureSpec("pc_scatter_3d", draw_pc_scatter_3d,
+                            {"X_pca_3": X_pca_3, "y": df["Obesity_clean"].to_numpy()}, projection='3d'))
+
+    x_var="pct_low_wage_emp"
+    y_var="pct_med_wage_emp"
+
+    x_grid =np.linspace(df[x_var].min(), df[x_var].max(), 30)
+    y_grid =np.linspace(df[y_var].min(), df[y_var].max(), 30)
+
+    base = df[pcr_results["predictors"]].mean() #this averages all of the predictors
+
+    # the collapsed model scores the grid directly (same values as scaler -> pca -> model.predict)
+    _, _, y_grid_pred = pcr_results["predictor"].surface(x_var, y_var, x_grid, y_grid, base)
+
+    # Plotting #
+    specs.append(FigureSpec("response_surface", draw_response_surface,
+                            {"x_grid": x_grid, "y_grid": y_grid, "z": y_grid_pred, "x_var": x_var, "y_var": y_var},
+                            projection='3d'))
+    plot(specs)
+
+# --------- Plotting script for the Data Dominators project - Suad --------- #
+def final_plots(results_df):
+    from figures import final_figures
+
+    # load the merged dataset
+    # df = pd.read_excel("OutputData/Merged_Data.xlsx")
+
+    # Walkability vs Obesity, Food Insecurity vs Obesity, Correlation Heatmap (see figures.final_figures)
+    plot(final_figures(results_df))
+
+# ====================================================================================================================== #
+#                                                  STAGE GRAPH                                                           #
+# ====================================================================================================================== #
+def make_stages():
+    from linear_predictor import PREDICTOR_PATH
+    plot_params = {"headless": HEADLESS, "formats": FIGURE_FORMATS}
+    # files each stage writes besides its cached result (a missing one re-runs the stage)
+    excel = lambda *paths: list(paths) if EXPORT_EXCEL else []
+    spatial_outputs = ["OutputData/Spatial_Moran.csv", "OutputData/Spatial_Local_Moran.csv"] if os.path.exists(adjacency_path) else []
+    return [
+        Stage("walkability_condense", walkability_condense, files=[walk_path, county_fp_path],
+              code=code_files("walkability", "sld_store", "sld_sql", "geo_index"),
+              params={"statefp": 48, "excel": EXPORT_EXCEL, "compact": bool(MEMORY_BUDGET_MB),
+                      "backend": CONDENSE_BACKEND}, threaded=True,
+              outputs=excel("OutputData/Walkability_County_Condensed.xlsx")),
+        Stage("places_pivot", places_pivot, files=[health_path, county_fp_path],
+              code=code_files("places", "geo_index"), params={"state": "TX", "excel": EXPORT_EXCEL}, threaded=True,
+              outputs=excel("OutputData/df_tx_counties_health.xlsx")),
+        Stage("merge", merge, deps=["places_pivot", "walkability_condense"], code=code_files("geo_index"),
+              params={"excel": EXPORT_EXCEL}, outputs=excel("OutputData/Merged_Data.xlsx")),
+        Stage("persist", persist, deps=["merge"], code=code_files("merged_store", "geo_index"),
+              params={"db": db_path}, outputs=[db_path]),
+        Stage("spatial", spatial, deps=["merge"], files=[adjacency_path, county_fp_path],
+              code=code_files("spatial", "geo_index"),
+              params={"walkability_cols": walkability_cols, "permutations": MORAN_PERMUTATIONS,
+                      "required": SPATIAL_LAGS}, outputs=spatial_outputs),
+        Stage("pca", pca_analysis, deps=["persist"], code=code_files("figures", "moments"), params=plot_params,
+              always=True),
+        Stage("pcr", pcr, deps=["spatial"], code=code_files("pcr_cv", "model_paths", "pcr_bootstrap", "linear_predictor"),
+              params={"walkability_cols": walkability_cols, "components": PCR_COMPONENTS,
+                      "cv": [CV_FOLDS, CV_REPEATS], "bootstrap": PCR_BOOTSTRAP, "spatial_lags": SPATIAL_LAGS},
+              outputs=["OutputData/Model_Comparison.csv", PREDICTOR_PATH]),
+        Stage("regression_plots", regression_plots, deps=["pcr"], code=code_files("figures"), params=plot_params,
+              always=True),
+        Stage("final_plots", final_plots, deps=["persist"], code=code_files("figures", "moments"),
+              params=plot_params, always=True),
+    ]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Data Dominators - Walkability vs Obesity pipeline")
+    parser.add_argument('command', nargs='?', default="all", choices=list(COMMANDS),
+                        help='part of the pipeline to run (plus whatever it depends on)')
+    parser.add_argument('--only', nargs='+', default=None, help='stages to run (plus whatever they depend on)')
+    parser.add_argument('--force', nargs='+', default=[], help='stages to re-run even if up to date, or "all"')
+    parser.add_argument('--memory-budget', type=float, default=None, help='target memory in MB for the walkability ingest')
+    parser.add_argument('--backend', choices=["pandas", "sqlite"], default=CONDENSE_BACKEND,
+                        help='where the block groups are rolled up to counties')
+    parser.add_argument('--pcr-components', default=str(PCR_COMPONENTS),
+                        help='number of components in the PCR model, or "cv" to pick it by cross-validation')
+    parser.add_argument('--bootstrap', type=int, default=PCR_BOOTSTRAP,
+                        help='bootstrap resamples for confidence intervals on the PCR results (0 = off)')
+    parser.add_argument('--spatial-lags', action='store_true',
+                        help='add the neighbor means of the predictors (needs the county adjacency file) to the PCR model')
+    parser.add_argument('--permutations', type=int, default=MORAN_PERMUTATIONS,
+                        help="permutations for the Moran's I tests in the spatial stage")
+    parser.add_argument('--headless', action='store_true',
+                        help='render the figures to OutputData/figures instead of opening windows')
+    parser.add_argument('--formats', nargs='+', default=FIGURE_FORMATS, help='figure formats for --headless (png, svg)')
+    parser.add_argument('--profile', nargs='+', default=[],
+                        help='stages to run under cProfile (stats saved to OutputData/trace/<stage>.prof)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='run the command under python -X importtime and report the import cost per package')
+    args = parser.parse_args()
+    if args.profile_startup:
+        sys.exit(profile_startup([__file__] + [a for a in sys.argv[1:] if a != '--profile-startup']))
+    MEMORY_BUDGET_MB = args.memory_budget
+    CONDENSE_BACKEND = args.backend
+    PCR_BOOTSTRAP = args.bootstrap
+    HEADLESS = args.headless
+    SPATIAL_LAGS = args.spatial_lags
+    MORAN_PERMUTATIONS = args.permutations
+    FIGURE_FORMATS = args.formats
+    PCR_COMPONENTS = args.pcr_components if args.pcr_components == "cv" else int(args.pcr_components)
+
+    trace = []
+    run_stages(make_stages(), targets=args.only or COMMANDS[args.command], force=args.force, profile=args.profile, trace=trace)
+    trace_path = write_trace(trace, meta={"args": vars(args)})
+    print("="*10, "Stage summary", "="*10)
+    print(format_summary(trace))
+    print(f"Trace written to {trace_path}")
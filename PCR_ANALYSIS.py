@@ -83,4 +83,12 @@ contrib = loading_matrix.mul(coeffs.values, axis=1).sum(axis=1)
 contrib = contrib.sort_values(ascending=False)
 
 print("\nFeature contributions to Obesity (PCR interpretation):")
-print(contrib)
\ No newline at end of file
+print(contrib)
+
+# Cross-validated component selection (every k = 1..p, 5-fold x 3, one SVD per fold - see pcr_cv.py)
+from pcr_cv import cv_components
+
+cv_curve, cv_k = cv_components(X.to_numpy(), y.to_numpy(), n_splits=5, n_repeats=3)
+print("\nCross-validated PCR:")
+print(cv_curve.to_string(index=False))
+print(f"Lowest CV MSE with {cv_k} components")
\ No newline at end of file
@@ -0,0 +1,173 @@
+# Intermediate-artifact cache for the Data Dominators pipeline
+# Each stage result is stored as a binary columnar file (parquet, or pickle when pyarrow isn't installed)
+# under OutputData/cache, named after the stage and a hash of everything that went into it.
+# If the inputs, code and parameters haven't changed, the stage result is loaded instead of recomputed.
+# pandas is only imported once a DataFrame is hashed, read or written, so checking which stages are
+# up to date stays cheap for short jobs.
+
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import sys
+import threading
+
+CACHE_DIR = "OutputData/cache"
+
+# Remembers the content hash of big input files by (size, mtime) so a multi-GB csv is only hashed once
+_STAMP_FILE = "file_hashes.json"
+
+# (pyarrow is only looked up here, not imported; pandas imports it when a parquet file is read or written)
+CACHE_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") else "pkl"
+
+
+# True for a DataFrame, without importing pandas for values that can't be one
+def _is_frame(value):
+    pd = sys.modules.get("pandas")
+    return pd is not None and isinstance(value, pd.DataFrame)
+
+
+def _load_stamps(cache_dir):
+    path = os.path.join(cache_dir, _STAMP_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+# Written to a temporary file and renamed into place, so a reader (another stage thread or worker
+# process) never sees a half-written file; the temporary name is per process and thread.
+def _save_stamps(cache_dir, stamps):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, _STAMP_FILE)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stamps, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+# Content hash of a file on disk (re-hashed only when its size or modification time changes)
+def file_hash(path, cache_dir=CACHE_DIR):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamps = _load_stamps(cache_dir)
+    stamp = stamps.get(path)
+    if stamp and stamp["size"] == st.st_size and stamp["mtime_ns"] == st.st_mtime_ns:
+        return stamp["hash"]
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    stamps[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": h.hexdigest()}
+    _save_stamps(cache_dir, stamps)
+    return stamps[path]["hash"]
+
+
+# Hash of a DataFrame's values, index, column names and dtypes
+def frame_hash(df):
+    import pandas as pd
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    h.update(repr(list(df.columns)).encode())
+    h.update(repr([str(t) for t in df.dtypes]).encode())
+    return h.hexdigest()
+
+
+# Builds a cache key from the stage inputs.
+# Positional inputs can be file paths (hashed by content), DataFrames, or other cache keys / strings;
+# keyword arguments are the stage parameters.
+def cache_key(*inputs, **params):
+    h = hashlib.blake2b(digest_size=16)
+    for item in inputs:
+        if _is_frame(item):
+            h.update(frame_hash(item).encode())
+        elif isinstance(item, (str, os.PathLike)) and os.path.isfile(item):
+            h.update(file_hash(item).encode())
+        else:
+            h.update(repr(item).encode())
+        h.update(b"|")
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def artifact_path(name, key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{name}-{key}.{CACHE_FORMAT}")
+
+
+# Returns the cached DataFrame for (name, key), or None if this stage hasn't been run with these inputs
+def load_artifact(name, key, cache_dir=CACHE_DIR):
+    path = artifact_path(name, key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    import pandas as pd
+    if CACHE_FORMAT == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+# Stores a stage result and removes older artifacts of the same stage
+def save_artifact(name, key, df, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = artifact_path(name, key, cache_dir)
+    tmp_path = path + ".tmp"
+    if CACHE_FORMAT == "parquet":
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    _remove_old(name, path, cache_dir)
+    return path
+
+
+def object_path(name, key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{name}-{key}.obj.pkl")
+
+
+# Like load_artifact/save_artifact but for any stage result (fitted models, dicts, None for plot-only stages).
+# DataFrames still go to the columnar format; everything else is pickled.
+# load_result returns (found, value) since None is a valid result.
+def load_result(name, key, cache_dir=CACHE_DIR):
+    df = load_artifact(name, key, cache_dir)
+    if df is not None:
+        return True, df
+    path = object_path(name, key, cache_dir)
+    if not os.path.exists(path):
+        return False, None
+    with open(path, "rb") as f:
+        return True, pickle.load(f)
+
+
+def has_result(name, key, cache_dir=CACHE_DIR):
+    return os.path.exists(artifact_path(name, key, cache_dir)) or os.path.exists(object_path(name, key, cache_dir))
+
+
+def save_result(name, key, value, cache_dir=CACHE_DIR):
+    if _is_frame(value):
+        return save_artifact(name, key, value, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = object_path(name, key, cache_dir)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+    _remove_old(name, path, cache_dir)
+    return path
+
+
+# Removes older artifacts of the same stage
+def _remove_old(name, path, cache_dir):
+    for old in os.listdir(cache_dir):
+        if old.startswith(f"{name}-") and os.path.join(cache_dir, old) != path and not old.endswith(".tmp"):
+            os.remove(os.path.join(cache_dir, old))
+
+
+# Loads the artifact if it exists, otherwise runs compute() and caches what it returns
+def cached(name, key, compute, cache_dir=CACHE_DIR):
+    df = load_artifact(name, key, cache_dir)
+    if df is not None:
+        print(f"Loaded cached {name} ({key[:8]})")
+        return df
+    df = compute()
+    save_artifact(name, key, df, cache_dir)
+    return df
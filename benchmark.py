@@ -0,0 +1,335 @@
+# Benchmark suite for the Data Dominators pipeline on synthetic data
+# The real EPA SLD and PLACES files aren't in the repo, so this generates inputs with the same schema
+# (column names, types, count identities, county / state structure) at any scale, then times and
+# memory-profiles every stage of the Texas pipeline on them. Results go to a json file that a later
+# run can be compared against (--baseline), so performance work can be checked before it ships.
+#
+# Example:
+#   python benchmark.py --block-groups 10000 100000 --states 1 5 --output OutputData/bench/results.json
+#   python benchmark.py --block-groups 100000 --states 50 --baseline OutputData/bench/results.json
+#
+# Stages: csv_ingest (all states), state_filter (Texas), fips_merge, condense, [condense_reference],
+#         places_pivot, merge, sqlite_persist, pca_pcr, grid_prediction
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = "OutputData/bench"
+
+# Rows generated and written per csv block (keeps generation memory flat at 10M block groups)
+GEN_CHUNK = 250_000
+
+# Counties per synthetic state (Texas gets its real 254)
+COUNTIES_PER_STATE = 100
+
+# Columns of the real SLD that the pipeline doesn't read, kept so the csv is as wide as the real one
+SLD_FILLER_COLS = 95
+
+# Measures per county in the synthetic PLACES file (the pipeline keeps 3 of them)
+PLACES_MEASURES = 40
+
+walkability_cols = [
+    "pct_low_wage_emp", "pct_med_wage_emp", "pct_hi_wage_emp",
+    "pct_low_wage_wrk", "pct_med_wage_wrk", "pct_hi_wage_wrk",
+    "0_autos_pct", "1_autos_pct", "2_autos_pct",
+    "wtd_WrkAge_pop_pct", "wtd_avg_walk_index"
+]
+
+
+# ====================================================================================================================== #
+#                                                  SYNTHETIC DATA                                                        #
+# ====================================================================================================================== #
+
+# (STATEFP, StateAbbr, county FIPS codes) for the first n_states, Texas first
+def synthetic_states(n_states):
+    from national import STATE_FIPS
+    abbrs = ['TX'] + [s for s in STATE_FIPS if s != 'TX']
+    states = []
+    for abbr in abbrs[:n_states]:
+        n_counties = 254 if abbr == 'TX' else COUNTIES_PER_STATE
+        states.append((STATE_FIPS[abbr], abbr, np.arange(n_counties) * 2 + 1))
+    return states
+
+
+def _split(rng, total, shares):
+    # splits integer totals into parts with the given (random) shares, parts summing to the total
+    parts = np.floor(total[:, None] * shares).astype('int64')
+    parts[:, -1] = total - parts[:, :-1].sum(axis=1)
+    return parts
+
+
+def _sld_block(rng, start, n, geoids):
+    pick = geoids[rng.integers(0, len(geoids), n)]
+    statefp, countyfp = pick // 1000, pick % 1000
+    df = pd.DataFrame({
+        'OBJECTID': np.arange(start + 1, start + n + 1),
+        'GEOID10': pick * 10_000_000 + rng.integers(0, 10_000_000, n),
+        'GEOID20': pick * 10_000_000 + rng.integers(0, 10_000_000, n),
+        'STATEFP': statefp, 'COUNTYFP': countyfp,
+        'TRACTCE': rng.integers(100, 999_999, n), 'BLKGRPCE': rng.integers(1, 6, n),
+    })
+    pop = rng.gamma(2.0, 700, n).astype('int64')
+    emp = rng.gamma(1.2, 400, n).astype('int64')
+    workers = (pop * rng.uniform(0.3, 0.6, n)).astype('int64')
+    hh = (pop / rng.uniform(2.2, 3.2, n)).astype('int64')
+    df['TotPop'] = pop
+    df['TotEmp'] = emp
+    df[['E_LowWageWk', 'E_MedWageWk', 'E_HiWageWk']] = _split(rng, emp, rng.dirichlet([2, 3, 2], n))
+    df['Workers'] = workers
+    df[['R_LowWageWk', 'R_MedWageWk', 'R_HiWageWk']] = _split(rng, workers, rng.dirichlet([2, 3, 2], n))
+    df['HH'] = hh
+    df[['AutoOwn0', 'AutoOwn1', 'AutoOwn2p']] = _split(rng, hh, rng.dirichlet([1, 4, 6], n))
+    df['P_WrkAge'] = rng.beta(8, 4, n).round(4)
+    df['NatWalkInd'] = rng.uniform(1, 20, n).round(4)
+    filler = pd.DataFrame(rng.random((n, SLD_FILLER_COLS)).round(5), columns=[f'D{i}' for i in range(SLD_FILLER_COLS)])
+    return pd.concat([df, filler], axis=1)
+
+
+# Writes sld.csv, places.csv, county_fips.csv (national layout) and COUNTYFP_TX.csv into out_dir
+def generate_inputs(out_dir, n_block_groups, n_states, seed=0):
+    from places import measures_to_keep
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    states = synthetic_states(n_states)
+    geoids = np.concatenate([fips * 1000 + counties for fips, _, counties in states])
+
+    # Like the real files: the national FIPS table has "<name> County", PLACES and COUNTYFP_TX the bare name,
+    # so every generated county resolves through geo_index.CountyIndex
+    names = [f"{abbr}{c:03d}" for fips, abbr, counties in states for c in counties]
+    county_fp = pd.DataFrame([(fips, c) for fips, abbr, counties in states for c in counties], columns=['STATEFP', 'COUNTYFP'])
+    county_fp['County'] = [f"{name} County" for name in names]
+    county_fp.to_csv(os.path.join(out_dir, "county_fips.csv"), index=False)
+    is_tx = (county_fp['STATEFP'] == 48).to_numpy()
+    tx = pd.DataFrame({'COUNTYFP': county_fp.loc[is_tx, 'COUNTYFP'], 'Texas County': np.asarray(names, dtype=object)[is_tx]})
+    tx.to_csv(os.path.join(out_dir, "COUNTYFP_TX.csv"), index=False)
+
+    sld_path = os.path.join(out_dir, "sld.csv")
+    for start in range(0, n_block_groups, GEN_CHUNK):
+        block = _sld_block(rng, start, min(GEN_CHUNK, n_block_groups - start), geoids)
+        block.to_csv(sld_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+
+    measures = list(measures_to_keep) + [f"Synthetic measure {i}" for i in range(PLACES_MEASURES - len(measures_to_keep))]
+    n = len(county_fp)
+    pop = rng.integers(1_000, 2_000_000, n)
+    abbr_of = {fips: abbr for fips, abbr, _ in states}
+    base = pd.DataFrame({
+        'Year': 2022, 'StateAbbr': county_fp['STATEFP'].map(abbr_of), 'LocationName': names,
+        'TotalPopulation': pop, 'TotalPop18plus': (pop * 0.76).astype('int64'),
+        'LocationID': county_fp['STATEFP'] * 1000 + county_fp['COUNTYFP'],
+    })
+    parts = []
+    for measure in measures:
+        for value_type in ["Crude prevalence", "Age-adjusted prevalence"]:
+            part = base.copy()
+            part['StateDesc'] = part['StateAbbr']
+            part['DataSource'] = 'BRFSS'
+            part['Category'] = 'Health Outcomes'
+            part['Measure'] = measure
+            part['Data_Value_Unit'] = '%'
+            part['Data_Value_Type'] = value_type
+            part['Data_Value'] = rng.uniform(5, 45, n).round(1)
+            part['Low_Confidence_Limit'] = (part['Data_Value'] - 2).round(1)
+            part['High_Confidence_Limit'] = (part['Data_Value'] + 2).round(1)
+            part['Geolocation'] = 'POINT (-97.0 31.0)'
+            parts.append(part)
+    places = pd.concat(parts, ignore_index=True)
+    places.to_csv(os.path.join(out_dir, "places.csv"), index=False)
+    return out_dir
+
+
+# ====================================================================================================================== #
+#                                                  STAGES                                                                #
+# ====================================================================================================================== #
+
+# Runs fn() and returns (result, seconds, peak traced MB)
+def measure(fn, memory=True):
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak_mb = None
+    if memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+# Every stage of the Texas pipeline as (name, fn(state) -> result); each stage stores what later ones need
+def pipeline_stages(data_dir, reference=False, grid_resolution=1000):
+    from walkability import read_sld, attach_county_names, condense_counties, condense_function
+    from places import read_places, clean_places
+    from geo_index import CountyIndex, attach_geoids, unpack_geoid
+    from merged_store import write_merged
+    from pcr_cv import cv_components
+    from linear_predictor import collapse_pcr
+    # imported here so the import time isn't charged to the pca_pcr stage
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.decomposition import PCA
+    from sklearn.linear_model import LinearRegression
+
+    sld_path = os.path.join(data_dir, "sld.csv")
+    places_path = os.path.join(data_dir, "places.csv")
+    county_fp_path = os.path.join(data_dir, "COUNTYFP_TX.csv")
+    db_path = os.path.join(data_dir, "bench.db")
+
+    def csv_ingest(st):
+        return len(read_sld(sld_path, statefp=None))
+
+    def state_filter(st):
+        st['walk'] = read_sld(sld_path, statefp=48)
+        return len(st['walk'])
+
+    # Same joins as the main script: block groups and PLACES names both get the packed GEOID,
+    # and the county tables are merged on it
+    def fips_merge(st):
+        st['walk'] = attach_county_names(st['walk'], pd.read_csv(county_fp_path), key='Texas County', statefp=48)
+        return len(st['walk'])
+
+    def condense(st):
+        st['walk_counties'] = condense_counties(st['walk'], key=['GEOID', 'Texas County'])
+        return len(st['walk_counties'])
+
+    def condense_reference(st):
+        return len(st['walk'].groupby(['Texas County'], observed=True).apply(condense_function))
+
+    def places_pivot(st):
+        health = clean_places(read_places(places_path, states="TX"), state=None)
+        index = CountyIndex.from_table(pd.read_csv(county_fp_path), "Texas County", statefp=48)
+        st['health'] = attach_geoids(health, index, "Texas County", "TX")
+        return len(st['health'])
+
+    def merge(st):
+        st['merged'] = st['health'].merge(st['walk_counties'].drop(columns='Texas County'), how='left', on='GEOID')
+        return len(st['merged'])
+
+    def sqlite_persist(st):
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        merged = st['merged'].assign(COUNTYFP=unpack_geoid(st['merged']['GEOID'])[1])
+        return write_merged(db_path, merged, state="TX", county_col="Texas County", statefp=48)
+
+    def pca_pcr(st):
+        df = st['merged'].dropna(subset=walkability_cols + ["Obesity among adults"])
+        X, y = df[walkability_cols].to_numpy(), df["Obesity among adults"].to_numpy()
+        scaler = StandardScaler().fit(X)
+        pca = PCA(n_components=5).fit(scaler.transform(X))
+        model = LinearRegression().fit(pca.transform(scaler.transform(X)), y)
+        cv_components(X, y, n_splits=5, n_repeats=3)
+        st['predictor'] = collapse_pcr(scaler, pca, model, walkability_cols)
+        st['base'] = df[walkability_cols].mean()
+        st['ranges'] = {c: (df[c].min(), df[c].max()) for c in walkability_cols}
+        return len(df)
+
+    def grid_prediction(st):
+        return sum(z.size for *_, z in st['predictor'].pair_surfaces(st['ranges'], st['base'], grid_resolution))
+
+    stages = [("csv_ingest", csv_ingest), ("state_filter", state_filter), ("fips_merge", fips_merge),
+              ("condense", condense)]
+    if reference:
+        stages.append(("condense_reference", condense_reference))
+    stages += [("places_pivot", places_pivot), ("merge", merge), ("sqlite_persist", sqlite_persist),
+               ("pca_pcr", pca_pcr), ("grid_prediction", grid_prediction)]
+    return stages
+
+
+# Generates (or reuses) the inputs for one scale and times every stage.
+# With repeat > 1 the fastest run of each stage is kept (memory is measured on the first run).
+def run_scale(n_block_groups, n_states, repeat=1, memory=True, reference=False, bench_dir=BENCH_DIR, seed=0):
+    data_dir = os.path.join(bench_dir, f"data_{n_block_groups}bg_{n_states}st")
+    if not os.path.exists(os.path.join(data_dir, "places.csv")):
+        print("="*10, f"Generating {n_block_groups} block groups in {n_states} state(s)", "="*10)
+        generate_inputs(data_dir, n_block_groups, n_states, seed)
+
+    results = {}
+    for run in range(repeat):
+        state = {}
+        for name, fn in pipeline_stages(data_dir, reference):
+            rows, seconds, peak_mb = measure(lambda: fn(state), memory and run == 0)
+            entry = results.setdefault(name, {"seconds": seconds, "peak_mb": peak_mb, "rows": rows})
+            entry["seconds"] = min(entry["seconds"], seconds)
+            print(f"{name:<20} {seconds:9.3f} s" + (f" {peak_mb:9.1f} MB" if peak_mb is not None else ""))
+    return results
+
+
+# ====================================================================================================================== #
+#                                                  COMPARISON                                                            #
+# ====================================================================================================================== #
+
+# Stage-by-stage comparison with a baseline results file. Returns rows of
+# (scale, stage, baseline s, current s, ratio) and prints them; ratio > 1 means slower than the baseline.
+def compare(results, baseline):
+    rows = []
+    for scale, stages in results["scales"].items():
+        base_stages = baseline.get("scales", {}).get(scale, {})
+        for stage, entry in stages.items():
+            if stage not in base_stages:
+                continue
+            before, after = base_stages[stage]["seconds"], entry["seconds"]
+            rows.append((scale, stage, before, after, after / before if before else float('inf')))
+    print(f"{'scale':<16} {'stage':<20} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for scale, stage, before, after, ratio in rows:
+        print(f"{scale:<16} {stage:<20} {before:10.3f} {after:10.3f} {ratio:7.2f}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic SLD / PLACES data.")
+    parser.add_argument('--block-groups', type=int, nargs='+', default=[10_000], help='block group counts to run')
+    parser.add_argument('--states', type=int, nargs='+', default=[1], help='numbers of states to spread them over')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scale (fastest time is kept)')
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc (it slows pandas down)")
+    parser.add_argument('--reference', action='store_true', help='also time the original condense_function rollup')
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, "results.json"))
+    parser.add_argument('--baseline', default=None, help='results file to compare against')
+    parser.add_argument('--max-ratio', type=float, default=None,
+                        help='with --baseline, exit with status 1 if any stage is slower than this ratio')
+    parser.add_argument('--clean', action='store_true', help='delete the generated inputs afterwards')
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {"timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                 "python": sys.version.split()[0], "pandas": pd.__version__, "numpy": np.__version__,
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "repeat": args.repeat},
+        "scales": {},
+    }
+    for n_states in args.states:
+        for n_block_groups in args.block_groups:
+            scale = f"{n_block_groups}bg_{n_states}st"
+            print("="*10, f"Scale {scale}", "="*10)
+            results["scales"][scale] = run_scale(n_block_groups, n_states, args.repeat, not args.no_memory,
+                                                 args.reference)
+            if args.clean:
+                shutil.rmtree(os.path.join(BENCH_DIR, f"data_{scale}"), ignore_errors=True)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    print("="*10, f"Results written to {args.output}", "="*10)
+
+    if baseline is not None:
+        rows = compare(results, baseline)
+        if args.max_ratio is not None and any(ratio > args.max_ratio for *_, ratio in rows):
+            print(f"Slower than the baseline by more than {args.max_ratio}x")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+# Out-of-core PCA at the block group grain of the Smart Location Database
+# The county PCA/PCR works on ~254 Texas counties; this fits the same StandardScaler -> PCA model on
+# the ~220k block groups without ever holding the feature matrix in memory. One pass over the chunks
+# accumulates the count, means and co-moments (moments.MomentAccumulator); the Gram matrix of the
+# standardized features follows from those and is eigendecomposed. Memory is one chunk plus O(p^2).
+# With the full-rank Gram matrix the result is the exact PCA, so it matches StandardScaler + PCA on
+# inputs small enough to fit in memory. Accumulators from separate runs (e.g. per state) can be merged
+# and fitted with fit_moments.
+#
+# Example:
+#   python blockgroup_pca.py --states TX --n-components 5
+#   python blockgroup_pca.py --states all --extra-cols D1B D3B D4A --sld-store
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from moments import MomentAccumulator
+from walkability import SLD_CHUNKSIZE, SLD_COLS, iter_sld
+
+# Block group versions of the county walkability columns: (feature, numerator, denominator)
+# (a denominator of None means the SLD column is used as is)
+BG_FEATURES = [
+    ('pct_low_wage_emp', 'E_LowWageWk', 'TotEmp'),
+    ('pct_med_wage_emp', 'E_MedWageWk', 'TotEmp'),
+    ('pct_hi_wage_emp', 'E_HiWageWk', 'TotEmp'),
+    ('pct_low_wage_wrk', 'R_LowWageWk', 'Workers'),
+    ('pct_med_wage_wrk', 'R_MedWageWk', 'Workers'),
+    ('pct_hi_wage_wrk', 'R_HiWageWk', 'Workers'),
+    ('0_autos_pct', 'AutoOwn0', 'HH'),
+    ('1_autos_pct', 'AutoOwn1', 'HH'),
+    ('2_autos_pct', 'AutoOwn2p', 'HH'),
+    ('P_WrkAge', 'P_WrkAge', None),
+    ('NatWalkInd', 'NatWalkInd', None),
+]
+
+walk_path = "InputData/EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv"
+
+
+# Feature matrix of one chunk of block groups: the BG_FEATURES plus any extra SLD columns as is.
+# Block groups with a zero denominator or a missing value are dropped (like the county dropna),
+# unless dropna=False, which keeps every row (with NaN) so the rows still line up with the chunk.
+def block_group_features(chunk, extra_cols=(), dropna=True):
+    features = {}
+    for name, num, den in BG_FEATURES:
+        values = chunk[num].to_numpy(dtype='float64')
+        if den is not None:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = values / chunk[den].to_numpy(dtype='float64')
+        features[name] = values
+    for col in extra_cols:
+        features[col] = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype='float64')
+    X = np.column_stack(list(features.values()))
+    if not dropna:
+        X[~np.isfinite(X)] = np.nan
+        return X
+    return X[np.isfinite(X).all(axis=1)]
+
+
+# Running mean / variance with StandardScaler's conventions (population variance, zero variance -> scale 1).
+# Chunks are merged with the pairwise update, so the result does not drift with the number of chunks.
+class RunningScaler:
+    def __init__(self):
+        self.n_samples_seen_ = 0
+        self.mean_ = None
+        self._m2 = None
+
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype='float64')
+        if not len(X):
+            return self
+        n_b = len(X)
+        mean_b = X.mean(axis=0)
+        m2_b = ((X - mean_b) ** 2).sum(axis=0)
+        if self.mean_ is None:
+            self.n_samples_seen_, self.mean_, self._m2 = n_b, mean_b, m2_b
+            return self
+        n_a = self.n_samples_seen_
+        n = n_a + n_b
+        delta = mean_b - self.mean_
+        self.mean_ = self.mean_ + delta * (n_b / n)
+        self._m2 = self._m2 + m2_b + delta ** 2 * (n_a * n_b / n)
+        self.n_samples_seen_ = n
+        return self
+
+    @property
+    def var_(self):
+        return self._m2 / self.n_samples_seen_
+
+    @property
+    def scale_(self):
+        scale = np.sqrt(self.var_)
+        scale[scale == 0] = 1.0
+        return scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype='float64') - self.mean_) / self.scale_
+
+    # Scaler with the means / variances of a complete-case MomentAccumulator
+    @classmethod
+    def from_moments(cls, acc):
+        scaler = cls()
+        scaler.n_samples_seen_ = int(acc.n[0, 0]) if len(acc.columns) else 0
+        scaler.mean_ = acc.means().to_numpy()
+        scaler._m2 = np.diag(acc.m2).copy()
+        return scaler
+
+
+# StandardScaler + PCA fitted from a stream of chunks.
+# make_chunks is a function returning an iterator of 2-D arrays (read once).
+# Attributes follow sklearn's PCA: components_, explained_variance_, explained_variance_ratio_,
+# singular_values_, plus scaler (a RunningScaler) for the standardization.
+class StreamingPCA:
+    def __init__(self, n_components=None):
+        self.n_components = n_components
+
+    def fit(self, make_chunks, columns=None):
+        acc = None
+        for X in make_chunks():
+            if acc is None:
+                acc = MomentAccumulator(columns or range(np.shape(X)[1]))
+            acc.update(X)
+        if acc is None:
+            raise ValueError("StreamingPCA needs at least 2 complete rows")
+        return self.fit_moments(acc)
+
+    # Fits from a complete-case MomentAccumulator (e.g. several merged per-state accumulators)
+    def fit_moments(self, acc):
+        self.scaler = RunningScaler.from_moments(acc)
+        n = self.scaler.n_samples_seen_
+        if n < 2:
+            raise ValueError("StreamingPCA needs at least 2 complete rows")
+        p = len(acc.columns)
+
+        eigvals, eigvecs = np.linalg.eigh(acc.standardized_gram())
+        eigvals = np.clip(eigvals[::-1], 0, None)
+        components = eigvecs[:, ::-1].T
+        # sklearn's sign convention: the largest loading of each component is positive
+        signs = np.sign(components[np.arange(p), np.abs(components).argmax(axis=1)])
+        components *= signs[:, None]
+
+        k = p if self.n_components is None else min(self.n_components, p)
+        self.n_samples_ = n
+        self.n_features_in_ = p
+        self.components_ = components[:k]
+        self.explained_variance_ = eigvals[:k] / (n - 1)
+        self.explained_variance_ratio_ = eigvals[:k] / eigvals.sum()
+        self.singular_values_ = np.sqrt(eigvals[:k])
+        return self
+
+    # PC scores of one chunk of raw (unstandardized) features
+    def transform(self, X):
+        return self.scaler.transform(X) @ self.components_.T
+
+
+# Chunk source for the block group features of the requested states, from the csv or the block group store
+def sld_feature_chunks(walk_path=walk_path, statefp=None, extra_cols=(), chunksize=SLD_CHUNKSIZE, use_store=False):
+    usecols = list(dict.fromkeys(SLD_COLS + list(extra_cols)))
+    statefps = None if statefp is None else ([statefp] if np.isscalar(statefp) else list(statefp))
+
+    def from_csv():
+        for chunk in iter_sld(walk_path, statefp=statefps, usecols=usecols, chunksize=chunksize):
+            yield block_group_features(chunk, extra_cols)
+
+    def from_store():
+        from sld_store import open_sld_store
+        store = open_sld_store(walk_path, columns=usecols)
+        ranges = [(0, store.meta["rows"])] if statefps is None else [store.state_range(s) for s in statefps]
+        for start, stop in ranges:
+            for lo in range(start, stop, chunksize):
+                hi = min(lo + chunksize, stop)
+                chunk = pd.DataFrame({c: store.column(c)[lo:hi] for c in usecols})
+                yield block_group_features(chunk, extra_cols)
+
+    return from_store if use_store else from_csv
+
+
+def main(argv=None):
+    from national import parse_states, STATE_FIPS
+
+    parser = argparse.ArgumentParser(description="Out-of-core PCA of the SLD block group features.")
+    parser.add_argument('--states', nargs='+', default=['TX'], help='state abbreviations / FIPS codes, or "all"')
+    parser.add_argument('--walk-path', default=walk_path)
+    parser.add_argument('--extra-cols', nargs='*', default=[], help='additional SLD columns to use as features')
+    parser.add_argument('--n-components', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=SLD_CHUNKSIZE)
+    parser.add_argument('--sld-store', action='store_true', help='stream from the memory-mapped block group store')
+    parser.add_argument('--output', default="OutputData/BlockGroup_PCA_Loadings.csv")
+    args = parser.parse_args(argv)
+
+    states = parse_states(args.states)
+    statefp = None if len(states) == len(STATE_FIPS) else [STATE_FIPS[s] for s in states]
+    chunks = sld_feature_chunks(args.walk_path, statefp, args.extra_cols, args.chunksize, args.sld_store)
+    pca = StreamingPCA(args.n_components).fit(chunks)
+
+    names = [name for name, _, _ in BG_FEATURES] + list(args.extra_cols)
+    pc_names = [f"PC{i+1}" for i in range(len(pca.components_))]
+    print(f"Block group PCA on {pca.n_samples_} block groups, {len(names)} features")
+    print("Explained variance ratio:")
+    for name, ev in zip(pc_names, pca.explained_variance_ratio_):
+        print(f"{name}: {ev:.4f}")
+    loadings = pd.DataFrame(pca.components_.T, index=names, columns=pc_names)
+    loadings.to_csv(args.output)
+    print("="*10, f"Exported loadings to {args.output}", "="*10)
+
+
+if __name__ == '__main__':
+    main()
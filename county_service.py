@@ -0,0 +1,599 @@
+# Local query service for the merged county table and the fitted PCR model
+# Loads one vintage of Merged_Main (merged_store.py; DEFAULT_VINTAGE unless --vintage names another or "latest")
+# and the collapsed scaler -> PCA -> regression (linear_predictor.py, OutputData/PCR_Predictor.json) once,
+# keeps them in memory as arrays with a GEOID index and a normalized county name index
+# (geo_index.normalize_name), and answers:
+#   county   metrics of one county, by GEOID or name    GET  /county/<GEOID or name>?state=TX
+#   top      top-N counties by predicted obesity        GET  /top?n=10&order=desc
+#   whatif   predicted obesity with one predictor set   GET  /whatif?feature=wtd_avg_walk_index&value=12[&county=Harris]
+#   batch    a list of the requests above in one call   POST /batch   [{"op": "county", "county": "48201"}, ...]
+#   stats    counties, model features, cache hit rate   GET  /stats
+# Predictions for every county are computed at startup; a what-if is one coefficient times the change in
+# that predictor. Answers are kept in an LRU cache keyed by the normalized request, and a batch computes
+# its uncached what-ifs per (feature, county) with one vectorized call.
+# The HTTP side is asyncio on the standard library (HTTP/1.1 with keep-alive, JSON in and out), local only.
+#
+# Example:
+#   python county_service.py serve --port 8615
+#   python county_service.py bench --queries 100000 --http-queries 20000
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from geo_index import STATE_FIPS, normalize_name
+from linear_predictor import PREDICTOR_PATH, load_predictor
+from merged_store import DEFAULT_VINTAGE, SCHEMA, query_counties
+
+DB_PATH = "OutputData/my_database.db"
+HOST = "127.0.0.1"
+PORT = 8615
+CACHE_SIZE = 4096
+MAX_BATCH = 10_000
+MAX_TOP = 1_000
+BENCH_OUTPUT = "OutputData/bench/service.json"
+
+OBSERVED_COL = "Obesity among adults"
+KEY_COLS = ["StateAbbr", "County", "GEOID"]
+
+
+class LRUCache:
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else None}
+
+
+# JSON-ready value (NaN -> null, numpy scalars -> python)
+def _plain(value):
+    if isinstance(value, (float, np.floating)):
+        return None if not np.isfinite(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class CountyService:
+    # data: {column: array} of the county table (merged_store.query_counties(..., as_arrays=True))
+    def __init__(self, data, predictor, cache_size=CACHE_SIZE):
+        missing = [f for f in predictor.features if f not in data]
+        if missing:
+            raise ValueError(f"County table has no column for model feature(s) {missing}")
+        self.columns = list(data)
+        self.data = data
+        self.predictor = predictor
+        self.n = len(data["GEOID"])
+        self.X = np.column_stack([np.asarray(data[f], dtype="float64") for f in predictor.features])
+        self.predicted = predictor.predict(self.X) if self.n else np.empty(0)
+        self.feature_means = np.nanmean(self.X, axis=0) if self.n else np.full(len(predictor.features), np.nan)
+        self._feature_pos = {f: j for j, f in enumerate(predictor.features)}
+
+        self.geoids = np.asarray(data["GEOID"], dtype="float64")     # (NULL GEOIDs come back as NaN)
+        self.located = np.flatnonzero(np.isfinite(self.geoids))     # rows that have a GEOID
+        self._by_geoid = {int(self.geoids[i]): int(i) for i in self.located}
+        self._by_name, by_bare = {}, {}
+        for i, (state, county) in enumerate(zip(data["StateAbbr"], data["County"])):
+            name = normalize_name(county)
+            self._by_name[(state, name)] = i
+            by_bare.setdefault(name, []).append(i)
+        self._by_bare = {name: rows[0] for name, rows in by_bare.items() if len(rows) == 1}   # unique across states
+
+        # highest prediction first, counties without a prediction last
+        order = np.argsort(-np.where(np.isnan(self.predicted), -np.inf, self.predicted), kind="stable")
+        self._ranked = order[np.isfinite(self.predicted[order])]
+        self._records = [self._record(i) for i in range(self.n)]
+        self.cache = LRUCache(cache_size)
+
+    @classmethod
+    def from_store(cls, db_path=DB_PATH, predictor_path=PREDICTOR_PATH, states=None, vintage=DEFAULT_VINTAGE,
+                   cache_size=CACHE_SIZE):
+        columns = [c for c, _ in SCHEMA if c != "row_hash"]
+        data = query_counties(db_path, columns=columns, states=states, vintage=vintage, as_arrays=True)
+        return cls(data, load_predictor(predictor_path), cache_size)
+
+    def _record(self, i):
+        record = {c: _plain(self.data[c][i]) for c in self.columns}
+        # (a NULL anywhere in the column turns it into floats; GEOIDs go out as int or null)
+        record["GEOID"] = int(self.geoids[i]) if np.isfinite(self.geoids[i]) else None
+        record["predicted_obesity"] = _plain(self.predicted[i])
+        return record
+
+    # Row of a county given as a GEOID (int or digits) or a name ("Harris", "Harris County"); the name needs
+    # state unless it is unique across the loaded states. Raises KeyError.
+    def row_of(self, county, state=None):
+        if isinstance(county, (int, np.integer)) or (isinstance(county, str) and county.strip().isdigit()):
+            row = self._by_geoid.get(int(county))
+        else:
+            name = normalize_name(county)
+            row = self._by_name.get((state.upper(), name)) if state else self._by_bare.get(name)
+        if row is None:
+            raise KeyError(f"Unknown county {county!r}" + (f" in {state}" if state else ""))
+        return row
+
+    def metrics(self, county, state=None):
+        return self._records[self.row_of(county, state)]
+
+    def top(self, n=10, order="desc"):
+        n = max(0, min(int(n), MAX_TOP))
+        rows = self._ranked[:n] if order == "desc" else self._ranked[::-1][:n]
+        keep = KEY_COLS + [OBSERVED_COL, "predicted_obesity"]
+        return [{c: self._records[i][c] for c in keep} for i in rows]
+
+    # Predicted obesity with `feature` set to each of values, the other predictors at the county's own values
+    # (or at the mean over all counties when county is None). Returns an array with one prediction per value.
+    def what_if_many(self, feature, values, county=None, state=None):
+        if feature not in self._feature_pos:
+            raise ValueError(f"{feature!r} is not a model feature; expected one of {self.predictor.features}")
+        j = self._feature_pos[feature]
+        if county is None:
+            base_x, base_pred = self.feature_means, self.predictor.predict(self.feature_means[None, :])[0]
+        else:
+            row = self.row_of(county, state)
+            base_x, base_pred = self.X[row], self.predicted[row]
+        values = np.asarray(values, dtype="float64")
+        return base_pred + self.predictor.coef[j] * (values - base_x[j])
+
+    def what_if(self, feature, value, county=None, state=None):
+        prediction = self.what_if_many(feature, [value], county, state)[0]
+        answer = {"feature": feature, "value": float(value), "predicted_obesity": _plain(prediction)}
+        if county is not None:
+            record = self.metrics(county, state)
+            answer.update({c: record[c] for c in KEY_COLS})
+            answer["current_value"] = record[feature]
+            answer["current_prediction"] = record["predicted_obesity"]
+        return answer
+
+    # Normalized, hashable form of a request dict (the cache key)
+    @staticmethod
+    def request_key(request):
+        op = request.get("op")
+        state = request.get("state")
+        state = state.upper() if isinstance(state, str) else None
+        if op == "county":
+            county = request.get("county")
+            if county is None:
+                raise ValueError("county request needs 'county'")
+            county = str(county).strip()
+            return ("county", county if county.isdigit() else normalize_name(county), state)
+        if op == "top":
+            order = request.get("order", "desc")
+            if order not in ("asc", "desc"):
+                raise ValueError("order must be 'asc' or 'desc'")
+            return ("top", int(request.get("n", 10)), order)
+        if op == "whatif":
+            if "feature" not in request or "value" not in request:
+                raise ValueError("whatif request needs 'feature' and 'value'")
+            county = request.get("county")
+            county = None if county is None else str(county).strip()
+            if county is not None and not county.isdigit():
+                county = normalize_name(county)
+            return ("whatif", request["feature"], float(request["value"]), county, state)
+        raise ValueError(f"Unknown op {op!r}; expected county, top or whatif")
+
+    def _compute(self, key):
+        op = key[0]
+        if op == "county":
+            return self.metrics(key[1], key[2])
+        if op == "top":
+            return self.top(key[1], key[2])
+        return self.what_if(*key[1:])
+
+    # Answer for a request key, computed and cached on a miss ({"error": ..., "status": 400/404} if it fails)
+    def _answer(self, key):
+        try:
+            answer = self._compute(key)
+        except KeyError as e:
+            return {"error": e.args[0], "status": 404}
+        except ValueError as e:
+            return {"error": str(e), "status": 400}
+        self.cache.put(key, answer)
+        return answer
+
+    # One request dict -> answer dict
+    def query(self, request):
+        try:
+            key = self.request_key(request)
+        except (TypeError, ValueError) as e:
+            return {"error": str(e), "status": 400}
+        answer = self.cache.get(key)
+        return self._answer(key) if answer is None else answer
+
+    # A list of requests -> answers in the same order. Cache hits are answered first; the uncached what-ifs
+    # are grouped by (feature, county) and each group is one vectorized what_if_many call.
+    def batch(self, requests):
+        if len(requests) > MAX_BATCH:
+            return [{"error": f"batch larger than {MAX_BATCH} requests", "status": 400}] * len(requests)
+        answers = [None] * len(requests)
+        groups = {}
+        for i, request in enumerate(requests):
+            try:
+                key = self.request_key(request) if isinstance(request, dict) else self.request_key({})
+            except (TypeError, ValueError) as e:
+                answers[i] = {"error": str(e), "status": 400}
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                answers[i] = cached
+            elif key[0] == "whatif":
+                groups.setdefault((key[1], key[3], key[4]), []).append((i, key))
+            else:
+                answers[i] = self._answer(key)
+        for (feature, county, state), members in groups.items():
+            try:
+                predictions = self.what_if_many(feature, [key[2] for _, key in members], county, state)
+            except KeyError as e:
+                for i, _ in members:
+                    answers[i] = {"error": e.args[0], "status": 404}
+                continue
+            except ValueError as e:
+                for i, _ in members:
+                    answers[i] = {"error": str(e), "status": 400}
+                continue
+            extra = {}
+            if county is not None:
+                record = self.metrics(county, state)
+                extra = {c: record[c] for c in KEY_COLS}
+                extra.update(current_value=record[feature], current_prediction=record["predicted_obesity"])
+            for (i, key), prediction in zip(members, predictions):
+                answer = {"feature": feature, "value": key[2], "predicted_obesity": _plain(prediction), **extra}
+                self.cache.put(key, answer)
+                answers[i] = answer
+        return answers
+
+    def stats(self):
+        return {"counties": self.n, "features": self.predictor.features, "target": self.predictor.target,
+                "cache": self.cache.stats()}
+
+
+# ---------------------------------------------------------------- HTTP
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+MAX_BODY = 16 * 2**20
+
+
+# (status, payload) for one HTTP request
+def route(service, method, target, body):
+    url = urlsplit(target)
+    params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+    if not parts:
+        return 404, {"error": "try /county/<GEOID or name>, /top, /whatif, /batch or /stats"}
+    if parts[0] == "batch":
+        if method != "POST":
+            return 405, {"error": "POST a JSON list of requests to /batch"}
+        try:
+            requests = json.loads(body or b"[]")
+        except ValueError as e:
+            return 400, {"error": f"invalid JSON: {e}"}
+        if not isinstance(requests, list):
+            return 400, {"error": "/batch expects a JSON list"}
+        return 200, service.batch(requests)
+    if method != "GET":
+        return 405, {"error": f"{method} not supported on /{parts[0]}"}
+    if parts[0] == "stats":
+        return 200, service.stats()
+    # (the path wins over query parameters of the same name)
+    if parts[0] == "county" and len(parts) == 2:
+        request = {**params, "op": "county", "county": parts[1]}
+    elif parts[0] in ("top", "whatif") and len(parts) == 1:
+        request = {**params, "op": parts[0]}
+    else:
+        return 404, {"error": f"unknown path {url.path}"}
+    answer = service.query(request)
+    if isinstance(answer, dict) and "error" in answer:
+        return answer["status"], answer
+    return 200, answer
+
+
+async def handle_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0) or 0)
+            if length > MAX_BODY:
+                status, payload = 413, {"error": "request body too large"}
+                body = b""
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = route(service, method.upper(), target, body)
+            out = json.dumps(payload).encode()
+            close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0" or status == 413
+            writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(out)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n"
+                         .encode() + out)
+            await writer.drain()
+            if close:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host=HOST, port=PORT, ready=None):
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+# ---------------------------------------------------------------- benchmark
+
+# A repeatable mix of county lookups (GEOID and name), top-N and what-if requests
+def query_mix(service, n_queries, seed=0, distinct_values=50):
+    rng = np.random.default_rng(seed)
+    names = service.data["County"]
+    states = service.data["StateAbbr"]
+    # counties are asked for by GEOID, or by name where the GEOID is NULL
+    def county_of(row):
+        if np.isfinite(service.geoids[row]):
+            return {"county": str(int(service.geoids[row]))}
+        return {"county": names[row], "state": states[row]}
+    feature = "wtd_avg_walk_index" if "wtd_avg_walk_index" in service._feature_pos else service.predictor.features[0]
+    j = service._feature_pos[feature]
+    lo, hi = np.nanmin(service.X[:, j]), np.nanmax(service.X[:, j])
+    values = np.round(np.linspace(lo, hi, distinct_values), 3)
+    ops = rng.choice(["county", "name", "top", "whatif", "whatif_county"], size=n_queries, p=[0.4, 0.2, 0.1, 0.15, 0.15])
+    rows = rng.integers(0, service.n, size=n_queries)
+    requests = []
+    for op, row in zip(ops, rows):
+        if op == "county":
+            requests.append({"op": "county", **county_of(row)})
+        elif op == "name":
+            requests.append({"op": "county", "county": names[row], "state": states[row]})
+        elif op == "top":
+            requests.append({"op": "top", "n": int(rng.choice([5, 10, 25]))})
+        elif op == "whatif":
+            requests.append({"op": "whatif", "feature": feature, "value": float(rng.choice(values))})
+        else:
+            requests.append({"op": "whatif", "feature": feature, "value": float(rng.choice(values)),
+                             **county_of(row)})
+    return requests
+
+
+def _latency_summary(seconds, wall):
+    seconds = np.asarray(seconds)
+    return {"queries": len(seconds), "wall_s": wall, "qps": len(seconds) / wall if wall else None,
+            "mean_us": seconds.mean() * 1e6, "p50_us": np.percentile(seconds, 50) * 1e6,
+            "p99_us": np.percentile(seconds, 99) * 1e6}
+
+
+def bench_in_process(service, requests):
+    latencies = np.empty(len(requests))
+    start = time.perf_counter()
+    for i, request in enumerate(requests):
+        t = time.perf_counter()
+        service.query(request)
+        latencies[i] = time.perf_counter() - t
+    return _latency_summary(latencies, time.perf_counter() - start)
+
+
+def bench_batches(service, requests, batch_size):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(requests), batch_size):
+        t = time.perf_counter()
+        service.batch(requests[i:i + batch_size])
+        latencies.append((time.perf_counter() - t) / len(requests[i:i + batch_size]))
+    result = _latency_summary(latencies, time.perf_counter() - start)
+    result.update(queries=len(requests), qps=len(requests) / result["wall_s"], batch_size=batch_size)
+    return result
+
+
+def _request_path(request):
+    from urllib.parse import quote, urlencode
+    params = {k: v for k, v in request.items() if k not in ("op", "county")}
+    if request["op"] == "county":
+        return f"/county/{quote(str(request['county']))}" + (f"?{urlencode(params)}" if params else "")
+    if request["op"] == "whatif" and "county" in request:
+        params["county"] = request["county"]
+    return f"/{request['op']}?{urlencode(params)}"
+
+
+# Requests over keep-alive HTTP connections to a running server, `concurrency` connections at once
+async def _http_clients(host, port, requests, concurrency):
+    latencies = []
+
+    async def client(chunk):
+        reader, writer = await asyncio.open_connection(host, port)
+        for request in chunk:
+            t = time.perf_counter()
+            writer.write(f"GET {_request_path(request)} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - t)
+        writer.close()
+        await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(requests[i::concurrency]) for i in range(concurrency)))
+    return _latency_summary(latencies, time.perf_counter() - start)
+
+
+# HTTP throughput against a server on a background thread (its own event loop)
+def bench_http(service, requests, concurrency=8, host=HOST, port=0):
+    started = threading.Event()
+    box = {}
+
+    def ready(server):
+        box["port"] = server.sockets[0].getsockname()[1]
+        started.set()
+
+    loop = asyncio.new_event_loop()
+    server_task = loop.create_task(serve(service, host, port, ready))
+
+    def run_server():
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(server_task)
+        except asyncio.CancelledError:
+            pass
+        # let the connection handlers see their clients close, then shut the loop down
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+
+    thread = threading.Thread(target=run_server, daemon=True)
+    thread.start()
+    started.wait()
+    result = asyncio.run(_http_clients(host, box["port"], requests, concurrency))
+    result["concurrency"] = concurrency
+    loop.call_soon_threadsafe(server_task.cancel)
+    thread.join()
+    return result
+
+
+# The lookup as it works without the service: one query against my_database.db per request
+# (counties with a NULL GEOID can't be looked up by GEOID and are skipped)
+def bench_store_lookups(db_path, geoids, n_lookups=200, vintage=DEFAULT_VINTAGE):
+    geoids = np.asarray(geoids, dtype="float64")
+    geoids = geoids[np.isfinite(geoids)]
+    latencies = []
+    start = time.perf_counter()
+    for geoid in geoids[:n_lookups]:
+        t = time.perf_counter()
+        query_counties(db_path, geoids=[int(geoid)], vintage=vintage)
+        latencies.append(time.perf_counter() - t)
+    return _latency_summary(latencies, time.perf_counter() - start)
+
+
+# Benchmarks the service as configured: the same states, vintage and cache size that `serve` would use
+def run_benchmark(db_path=DB_PATH, predictor_path=PREDICTOR_PATH, n_queries=100_000, http_queries=20_000,
+                  batch_size=100, concurrency=8, seed=0, output=BENCH_OUTPUT, states=None, vintage=DEFAULT_VINTAGE,
+                  cache_size=CACHE_SIZE):
+    t = time.perf_counter()
+    service = CountyService.from_store(db_path, predictor_path, states, vintage, cache_size)
+    startup = time.perf_counter() - t
+    print(f"Loaded {service.n} counties and the {len(service.predictor.features)}-feature model in {startup:.3f} s")
+    requests = query_mix(service, n_queries, seed)
+
+    results = {"meta": {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        "python": sys.version.split()[0], "counties": service.n, "startup_s": startup,
+                        "cache_size": service.cache.maxsize, "states": states, "vintage": vintage}}
+    if len(service.located):
+        results["store_lookup"] = bench_store_lookups(db_path, service.geoids, vintage=vintage)
+
+    uncached = CountyService(service.data, service.predictor, cache_size=0)
+    results["in_process_uncached"] = bench_in_process(uncached, requests)
+    results["in_process_cached"] = bench_in_process(service, requests)
+    results["cache_after_in_process"] = service.cache.stats()
+    service.cache = LRUCache(service.cache.maxsize)
+    results["batched"] = bench_batches(service, requests, batch_size)
+    if http_queries:
+        results["http"] = bench_http(service, requests[:http_queries], concurrency)
+
+    print(f"{'mode':<22} {'queries':>8} {'qps':>12} {'p50_us':>9} {'p99_us':>9}")
+    for mode in ["store_lookup", "in_process_uncached", "in_process_cached", "batched", "http"]:
+        if mode in results:
+            r = results[mode]
+            print(f"{mode:<22} {r['queries']:>8} {r['qps']:>12,.0f} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f}")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=1, default=float)
+    print("="*10, f"Results written to {output}", "="*10)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve county metrics and PCR predictions from memory.")
+    parser.add_argument('command', choices=["serve", "bench"])
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--predictor', default=PREDICTOR_PATH, help='collapsed PCR model (written by the pcr stage)')
+    parser.add_argument('--states', nargs='+', default=None, help='state abbreviations to load (default: all stored)')
+    parser.add_argument('--vintage', default=DEFAULT_VINTAGE,
+                        help=f'vintage to serve, or "latest" (default: {DEFAULT_VINTAGE}, the one the pipeline writes)')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='answers kept in the LRU cache')
+    parser.add_argument('--queries', type=int, default=100_000, help='bench: in-process queries')
+    parser.add_argument('--http-queries', type=int, default=20_000, help='bench: HTTP queries (0 = skip)')
+    parser.add_argument('--batch-size', type=int, default=100, help='bench: requests per batch call')
+    parser.add_argument('--concurrency', type=int, default=8, help='bench: concurrent HTTP connections')
+    parser.add_argument('--output', default=BENCH_OUTPUT, help='bench: results json')
+    args = parser.parse_args(argv)
+
+    if args.states:
+        unknown = [s for s in args.states if s.upper() not in STATE_FIPS]
+        if unknown:
+            parser.error(f"unknown state(s) {unknown}")
+        args.states = [s.upper() for s in args.states]
+
+    if args.command == "bench":
+        run_benchmark(args.db, args.predictor, args.queries, args.http_queries, args.batch_size, args.concurrency,
+                      output=args.output, states=args.states, vintage=args.vintage, cache_size=args.cache_size)
+        return 0
+
+    service = CountyService.from_store(args.db, args.predictor, args.states, args.vintage, args.cache_size)
+    print("="*10, f"Serving {service.n} counties on http://{args.host}:{args.port}", "="*10)
+
+    def ready(server):
+        print("Endpoints: /county/<GEOID or name>?state=TX, /top?n=10, /whatif?feature=...&value=..., POST /batch, /stats")
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+# Figures for the Data Dominators project
+# Every chart is a FigureSpec: a name, a draw function and the (plain) data it plots.
+# show_figures() draws them one by one in windows (the original interactive behaviour);
+# render_figures() is the headless batch mode: it renders the specs to PNG/SVG on the Agg backend
+# across a process pool and skips any figure whose data and draw code are unchanged since the last render.
+#
+# The draw functions are module-level so they can be sent to worker processes.
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from artifact_cache import frame_hash
+from moments import MomentAccumulator
+
+FIGURE_DIR = "OutputData/figures"
+
+# Scatter layers with more points than this are rasterized inside vector (SVG) output
+RASTERIZE_POINTS = 5_000
+
+
+class FigureSpec:
+    def __init__(self, name, draw, data, figsize=None, projection=None):
+        self.name = name                # file name (without extension)
+        self.draw = draw                # draw(ax, data), a module-level function
+        self.data = data                # everything the figure plots
+        self.figsize = figsize
+        self.projection = projection    # e.g. '3d'
+
+    def __repr__(self):
+        return f"FigureSpec({self.name!r})"
+
+
+def _data_hash(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(frame_hash(obj).encode())
+    elif isinstance(obj, pd.Series):
+        h.update(frame_hash(obj.to_frame()).encode())
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode() + repr(obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=str):
+            h.update(repr(k).encode())
+            _data_hash(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _data_hash(h, item)
+    else:
+        h.update(pickle.dumps(obj))
+    h.update(b"|")
+
+
+# Hash of a spec's data, draw code and layout (decides whether the saved file is still current)
+def spec_hash(spec, fmt):
+    h = hashlib.blake2b(digest_size=16)
+    _data_hash(h, spec.data)
+    h.update(inspect.getsource(spec.draw).encode())
+    h.update(repr((spec.figsize, spec.projection, fmt, RASTERIZE_POINTS)).encode())
+    return h.hexdigest()
+
+
+def _new_axes(spec):
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=spec.figsize)
+    ax = fig.add_subplot(111, projection=spec.projection) if spec.projection else fig.gca()
+    return fig, ax
+
+
+# Draws the specs in interactive windows, one plt.show() per figure
+def show_figures(specs):
+    import matplotlib.pyplot as plt
+    for spec in specs:
+        fig, ax = _new_axes(spec)
+        spec.draw(ax, spec.data)
+        plt.show()
+
+
+def _render_one(spec, paths):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, ax = _new_axes(spec)
+    spec.draw(ax, spec.data)
+    for path in paths:
+        fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    return spec.name
+
+
+# Renders the specs to out_dir/<name>.<fmt> in a process pool.
+# A figure is skipped when its file exists and its hash (data + draw code) matches the manifest.
+# Returns {name: "rendered" / "unchanged"}.
+def render_figures(specs, out_dir=FIGURE_DIR, formats=("png",), max_workers=None, force=False):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    status, jobs, hashes = {}, [], {}
+    for spec in specs:
+        paths = [os.path.join(out_dir, f"{spec.name}.{fmt}") for fmt in formats]
+        hashes[spec.name] = {fmt: spec_hash(spec, fmt) for fmt in formats}
+        current = all(manifest.get(spec.name, {}).get(fmt) == hashes[spec.name][fmt] and os.path.exists(p)
+                      for fmt, p in zip(formats, paths))
+        if current and not force:
+            status[spec.name] = "unchanged"
+        else:
+            jobs.append((spec, paths))
+
+    if jobs:
+        workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name in pool.map(_render_one, *zip(*jobs)):
+                status[name] = "rendered"
+                manifest[name] = hashes[name]
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return status
+
+
+# Scatter that is rasterized once it has many points (keeps SVGs small and fast to write)
+def scatter(ax, x, y, **kwargs):
+    kwargs.setdefault("rasterized", len(x) > RASTERIZE_POINTS)
+    return ax.scatter(x, y, **kwargs)
+
+
+# ---------------------------------------------------------------- draw functions (ax, data)
+
+def draw_biplot(ax, data):
+    pca_df, loadings, columns = data["pca_df"], data["loadings"], data["columns"]
+    scatter(ax, pca_df["PC1"], pca_df["PC2"], alpha=0.4)
+    for i, var in enumerate(columns):
+        ax.arrow(0, 0, loadings[i, 0]*5, loadings[i, 1]*5, head_width=0.05, color='red')
+        ax.text(loadings[i, 0]*5*1.1, loadings[i, 1]*5*1.1, var, color='darkred', fontsize=9)
+    ax.set_xlabel("PC1")
+    ax.set_ylabel("PC2")
+    ax.set_title("PCA Biplot")
+    ax.grid(True)
+    ax.axhline(0, color='black', linewidth=1)
+    ax.axvline(0, color='black', linewidth=1)
+
+
+def draw_regplot(ax, data):
+    import seaborn as sns
+    col = data["x"].name
+    sns.regplot(x=data["x"], y=data["y"], scatter_kws={"alpha": 0.5,
+                "rasterized": len(data["x"]) > RASTERIZE_POINTS}, ax=ax)
+    ax.set_xlabel(col)
+    ax.set_ylabel("Obesity_clean")
+    ax.set_title(f"{col} vs Obesity")
+
+
+def draw_pc_scatter_3d(ax, data):
+    import matplotlib.pyplot as plt
+    X_pca_3 = data["X_pca_3"]
+    sc = ax.scatter(X_pca_3[:, 0], X_pca_3[:, 1], X_pca_3[:, 2], c=data["y"], cmap="viridis",
+                    rasterized=len(X_pca_3) > RASTERIZE_POINTS)
+    ax.set_xlabel("PC1")
+    ax.set_ylabel("PC2")
+    ax.set_zlabel("PC3")
+    plt.colorbar(sc, ax=ax, label="Obesity_clean")
+
+
+def draw_response_surface(ax, data):
+    X_grid, Y_grid = np.meshgrid(data["x_grid"], data["y_grid"])
+    ax.plot_surface(X_grid, Y_grid, data["z"], cmap="viridis", alpha=0.8)
+    ax.set_xlabel(data["x_var"])
+    ax.set_ylabel(data["y_var"])
+    ax.set_zlabel("Predicted Obesity")
+
+
+def draw_scatter(ax, data):
+    scatter(ax, data["x"], data["y"], alpha=0.6)
+    ax.set_xlabel(data["xlabel"])
+    ax.set_ylabel(data["ylabel"])
+    ax.set_title(data["title"])
+    ax.grid(True)
+
+
+def draw_heatmap(ax, data):
+    import seaborn as sns
+    sns.heatmap(data["corr"], annot=True, cmap="coolwarm", fmt=".2f", ax=ax)
+    ax.set_title(data["title"])
+
+
+# ---------------------------------------------------------------- spec builders
+
+# Walkability vs obesity, food insecurity vs obesity and the correlation heatmap (final_plots)
+def final_figures(results_df):
+    obesity = results_df["Obesity among adults"]
+    return [
+        FigureSpec("walkability_vs_obesity", draw_scatter, {
+            "x": results_df["wtd_avg_walk_index"], "y": obesity, "xlabel": "Weighted Walkability Index",
+            "ylabel": "Obesity (%)", "title": "Walkability vs. Obesity in Texas Counties"}, figsize=(8, 6)),
+        FigureSpec("food_insecurity_vs_obesity", draw_scatter, {
+            "x": results_df["Food insecurity in the past 12 months among adults"], "y": obesity,
+            "xlabel": "Food Insecurity (%)", "ylabel": "Obesity (%)", "title": "Food Insecurity vs Obesity"},
+            figsize=(8, 6)),
+        FigureSpec("correlation_heatmap", draw_heatmap, {
+            "corr": MomentAccumulator.from_frame(results_df, pairwise=True).correlation(),
+            "title": "Correlation Matrix for Walkability, Food Access, and Health Measures"}, figsize=(12, 8)),
+    ]
@@ -1,43 +1,20 @@
 # Plotting script for the Data Dominators project 
+# The figures themselves are defined in figures.py (final_figures); pass --headless to render them
+# to OutputData/figures instead of opening a window for each one.
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import sys
 
-# load the merged dataset
-df = pd.read_excel("Merged_Data.xlsx")
+import pandas as pd
 
-# Walkability vs Obesity
-plt.figure(figsize=(8, 6))
-plt.scatter(
-    results_df["wtd_avg_walk_index"],
-    results_df["Obesity among adults"],
-    alpha=0.6
-)
-plt.xlabel("Weighted Walkability Index")
-plt.ylabel("Obesity (%)")
-plt.title("Walkability vs. Obesity in Texas Counties")
-plt.grid(True)
-plt.show()
+from figures import final_figures, render_figures, show_figures
 
-# Food Insecurity vs Obesity
-plt.figure(figsize=(8, 6))
-plt.scatter(df["Food insecurity in the past 12 months among adults"], 
-            df["Obesity among adults"], 
-            alpha=0.6)
-plt.xlabel("Food Insecurity (%)")
-plt.ylabel("Obesity (%)")
-plt.title("Food Insecurity vs Obesity")
-plt.grid(True)
-plt.show()
+if __name__ == '__main__':
+    # load the merged dataset
+    df = pd.read_excel("Merged_Data.xlsx")
 
-# Correlation Heatmap
-plt.figure(figsize=(12, 8))
-sns.heatmap(
-    results_df.corr(),
-    annot=True,
-    cmap="coolwarm",
-    fmt=".2f"
-)
-plt.title("Correlation Matrix for Walkability, Food Access, and Health Measures")
-plt.show()
+    # Walkability vs Obesity, Food Insecurity vs Obesity, Correlation Heatmap
+    specs = final_figures(df)
+    if "--headless" in sys.argv:
+        print(render_figures(specs))
+    else:
+        show_figures(specs)
@@ -0,0 +1,176 @@
+# County join index for the Data Dominators project
+# Counties are keyed by a packed integer GEOID (STATEFP * 1000 + COUNTYFP, the 5-digit county FIPS).
+# CountyIndex maps GEOIDs to rows of the county FIPS table with one array lookup (no string merges),
+# and resolves free-text county names (PLACES LocationName) to GEOIDs through a normalized name index
+# per state. Resolved PLACES names are cached in OutputData/cache, keyed by the county table's content,
+# so the names are only matched once; after that every join between the sources is an integer join.
+# Keys that don't resolve are collected by report_unmatched() instead of silently dropping out of a merge.
+
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from artifact_cache import CACHE_DIR, file_hash
+
+# State postal abbreviation -> state FIPS code (50 states + DC)
+STATE_FIPS = {
+    'AL': 1, 'AK': 2, 'AZ': 4, 'AR': 5, 'CA': 6, 'CO': 8, 'CT': 9, 'DE': 10, 'DC': 11,
+    'FL': 12, 'GA': 13, 'HI': 15, 'ID': 16, 'IL': 17, 'IN': 18, 'IA': 19, 'KS': 20,
+    'KY': 21, 'LA': 22, 'ME': 23, 'MD': 24, 'MA': 25, 'MI': 26, 'MN': 27, 'MS': 28,
+    'MO': 29, 'MT': 30, 'NE': 31, 'NV': 32, 'NH': 33, 'NJ': 34, 'NM': 35, 'NY': 36,
+    'NC': 37, 'ND': 38, 'OH': 39, 'OK': 40, 'OR': 41, 'PA': 42, 'RI': 44, 'SC': 45,
+    'SD': 46, 'TN': 47, 'TX': 48, 'UT': 49, 'VT': 50, 'VA': 51, 'WA': 53, 'WV': 54,
+    'WI': 55, 'WY': 56
+}
+
+GEOID_STRIDE = 1000         # GEOID = STATEFP * GEOID_STRIDE + COUNTYFP
+MAX_STATEFP = 99            # size of the dense GEOID -> row table (100k int32 entries)
+MISSING = -1                # GEOID / position of a key that didn't resolve
+
+UNMATCHED_DIR = "OutputData/unmatched"
+
+# Bump when normalize_name changes so cached name resolutions are rebuilt
+NAME_RULES_VERSION = 1
+
+# County-equivalent suffixes dropped from names ("Harris County" -> "harris"). "city" is kept on purpose:
+# independent cities (Baltimore city, St. Louis city) share their name with a county in the same state.
+_SUFFIXES = ("county", "parish", "borough", "census area", "city and borough", "municipality")
+_SUFFIX_RE = re.compile(r"\s+(?:" + "|".join(sorted(map(re.escape, _SUFFIXES), key=len, reverse=True)) + r")$")
+
+
+def pack_geoid(statefp, countyfp):
+    return np.asarray(statefp, dtype='int64') * GEOID_STRIDE + np.asarray(countyfp, dtype='int64')
+
+
+# (STATEFP, COUNTYFP) arrays from GEOIDs
+def unpack_geoid(geoid):
+    return np.divmod(np.asarray(geoid, dtype='int64'), GEOID_STRIDE)
+
+
+# Lower case, accents and punctuation removed, "st"/"ste" spelled out, county-type suffix dropped,
+# then the spaces too ("De Kalb" and "DeKalb", "La Salle" and "LaSalle" are the same county)
+def normalize_name(name):
+    name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    name = re.sub(r"[.`\-]", " ", name.lower()).replace("'", "").replace("&", " and ")
+    name = re.sub(r"\bste\b", "sainte", re.sub(r"\bst\b", "saint", name))
+    name = " ".join(name.split())
+    return _SUFFIX_RE.sub("", name).replace(" ", "")
+
+
+class CountyIndex:
+    def __init__(self, statefp, countyfp, names):
+        geoids = pack_geoid(statefp, countyfp)
+        names = np.asarray(names, dtype=object)
+        # first row wins for a repeated GEOID (same as drop_duplicates on the FIPS columns)
+        _, first = np.unique(geoids, return_index=True)
+        first.sort()
+        self.geoids = geoids[first]
+        self.names = names[first]
+        if len(self.geoids) and (self.geoids.min() < 0 or self.geoids.max() >= (MAX_STATEFP + 1) * GEOID_STRIDE):
+            raise ValueError("County FIPS codes out of range")
+
+        # dense GEOID -> row table, so mapping millions of block groups is one fancy-indexing pass
+        self._row = np.full((MAX_STATEFP + 1) * GEOID_STRIDE, MISSING, dtype='int32')
+        self._row[self.geoids] = np.arange(len(self.geoids), dtype='int32')
+        self._name_codes, self._name_values = pd.factorize(self.names)
+
+        # (STATEFP, normalized name) -> GEOID; names that normalize to the same key within a state are ambiguous
+        self._by_name, self.ambiguous = {}, set()
+        for geoid, name in zip(self.geoids.tolist(), self.names):
+            key = (geoid // GEOID_STRIDE, normalize_name(name))
+            if key in self._by_name:
+                self.ambiguous.add(key)
+            self._by_name[key] = geoid
+        for key in self.ambiguous:
+            del self._by_name[key]
+
+    # Index over a county FIPS table. Tables without a STATEFP column (COUNTYFP_TX.csv) need statefp.
+    @classmethod
+    def from_table(cls, county_fp_df, name_col, statefp=None):
+        if 'STATEFP' in county_fp_df.columns:
+            states = county_fp_df['STATEFP'].to_numpy()
+        elif statefp is not None:
+            states = np.full(len(county_fp_df), statefp)
+        else:
+            raise ValueError("County table has no STATEFP column; pass statefp")
+        return cls(states, county_fp_df['COUNTYFP'].to_numpy(), county_fp_df[name_col].to_numpy())
+
+    def __len__(self):
+        return len(self.geoids)
+
+    # Row of every GEOID in the table (MISSING where the county isn't in it)
+    def positions(self, geoids):
+        geoids = np.asarray(geoids, dtype='int64')
+        pos = np.full(geoids.shape, MISSING, dtype='int32')
+        inside = (geoids >= 0) & (geoids < len(self._row))
+        pos[inside] = self._row[geoids[inside]]
+        return pos
+
+    def contains(self, geoids):
+        return self.positions(geoids) != MISSING
+
+    # County names of GEOIDs as a Categorical (NaN where unmatched)
+    def names_of(self, geoids):
+        pos = self.positions(geoids)
+        codes = np.append(self._name_codes, -1)[pos]     # (MISSING = -1 picks the trailing -1 code)
+        return pd.Categorical.from_codes(codes, categories=self._name_values)
+
+    # GEOID of a county name within a state (MISSING if it doesn't resolve)
+    def geoid_of_name(self, statefp, name):
+        return self._by_name.get((int(statefp), normalize_name(name)), MISSING)
+
+
+def _name_cache_path(county_fips_path, cache_dir):
+    return os.path.join(cache_dir, f"place_geoids-{file_hash(county_fips_path, cache_dir)[:16]}-v{NAME_RULES_VERSION}.json")
+
+
+# GEOIDs of (StateAbbr, name) pairs, resolved through the index's name table.
+# With county_fips_path, resolutions are cached next to the stage artifacts (keyed by that file's content),
+# so later runs only normalize names they haven't seen. Returns {(StateAbbr, name): GEOID or MISSING}.
+def resolve_names(index, pairs, county_fips_path=None, cache_dir=CACHE_DIR):
+    pairs = list(dict.fromkeys((str(s), str(n)) for s, n in pairs))
+    cache_path = _name_cache_path(county_fips_path, cache_dir) if county_fips_path else None
+    cached = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cached = {(s, n): g for s, n, g in json.load(f)}
+
+    new = [p for p in pairs if p not in cached]
+    for state, name in new:
+        cached[(state, name)] = index.geoid_of_name(STATE_FIPS[state], name) if state in STATE_FIPS else MISSING
+    if cache_path and new:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path + ".tmp", "w") as f:
+            json.dump([[s, n, g] for (s, n), g in cached.items()], f)
+        os.replace(cache_path + ".tmp", cache_path)
+    return {p: cached[p] for p in pairs}
+
+
+# Adds a GEOID column (int64, MISSING where unresolved) to a county table keyed by name, at position 0.
+# state is one StateAbbr for the whole table or the name of its StateAbbr column.
+def attach_geoids(df, index, name_col, state, county_fips_path=None, cache_dir=CACHE_DIR):
+    states = df[state].astype(str) if state in df.columns else pd.Series(state, index=df.index)
+    names = df[name_col].astype(str)
+    resolved = resolve_names(index, zip(states, names), county_fips_path, cache_dir)
+    df.insert(0, 'GEOID', np.array([resolved[p] for p in zip(states, names)], dtype='int64'))
+    return df
+
+
+# Prints and saves keys that didn't resolve (OutputData/unmatched/<source>.csv) and notes the count on
+# the current stage's trace record. An empty report removes the previous run's file.
+def report_unmatched(source, unmatched_df, out_dir=UNMATCHED_DIR):
+    from instrument import note
+    path = os.path.join(out_dir, f"{source}.csv")
+    note(f"unmatched:{source}", len(unmatched_df))
+    if not len(unmatched_df):
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    os.makedirs(out_dir, exist_ok=True)
+    unmatched_df.to_csv(path, index=False)
+    print(f"WARNING: {len(unmatched_df)} unmatched {source} key(s), written to {path}")
+    return path
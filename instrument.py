@@ -0,0 +1,241 @@
+# Per-stage instrumentation for the stage runner
+# Records wall time, CPU time, resident memory and the rows / columns going into and out of every stage,
+# plus notes the stages add themselves (check_fanout flags left merges that multiplied rows).
+# The run is written as a JSON trace and printed as a summary table; named stages can also be run
+# under cProfile.
+#
+# Memory is sampled, not read from ru_maxrss (a process-wide high-water mark that stops moving once an
+# earlier stage has set it): while any stage runs, a background thread reads the current RSS from
+# /proc/self/statm every RSS_INTERVAL seconds. Each record gets the RSS when the stage started, the highest
+# sample while it ran and the growth between the two. RSS belongs to the process, so for stages that ran
+# at the same time (threaded branches) the same growth is shared; those are listed in "overlapped".
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TRACE_DIR = "OutputData/trace"
+RSS_INTERVAL = 0.01             # seconds between RSS samples while a stage runs
+STATM_PATH = "/proc/self/statm"  # Linux only; elsewhere the memory fields are left out of the trace
+
+_current = threading.local()    # the stage record the calling thread is working on
+_lock = threading.Lock()
+
+
+# Current resident set size of the process in MB (None where it can't be read)
+def current_rss_mb():
+    try:
+        with open(STATM_PATH) as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+# Samples the current RSS on a background thread while at least one stage is running and keeps
+# the highest value seen by each running stage
+class RSSSampler:
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.running = {}           # stage name -> {"start": MB, "peak": MB, "overlapped": set of names}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _sample(self, rss):
+        for stage in self.running.values():
+            stage["peak"] = max(stage["peak"], rss)
+
+    def _loop(self):
+        while True:
+            rss = current_rss_mb()
+            with self._lock:
+                if not self.running:
+                    self._thread = None
+                    return
+                self._sample(rss)
+            time.sleep(self.interval)
+
+    # Starts measuring a stage; returns False where RSS can't be read
+    def start(self, name):
+        rss = current_rss_mb()
+        if rss is None:
+            return False
+        with self._lock:
+            for other, stage in self.running.items():
+                stage["overlapped"].add(name)
+            self.running[name] = {"start": rss, "peak": rss, "overlapped": set(self.running)}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="rss-sampler", daemon=True)
+                self._thread.start()
+        return True
+
+    # Stops measuring a stage; returns its {"start", "peak", "overlapped"}
+    def stop(self, name):
+        rss = current_rss_mb()
+        with self._lock:
+            self._sample(rss)
+            return self.running.pop(name)
+
+
+_sampler = RSSSampler()
+
+
+# (rows, columns) of a stage input / output: DataFrames, arrays, or the "df" of a result dict
+def shape_of(value):
+    if isinstance(value, dict) and "df" in value:
+        value = value["df"]
+    shape = getattr(value, "shape", None)
+    if shape is None:
+        return None
+    return [int(shape[0]), int(shape[1]) if len(shape) > 1 else 1]
+
+
+# Adds a note to the record of the stage running on this thread (ignored outside a traced stage)
+def note(key, value):
+    record = getattr(_current, "record", None)
+    if record is not None:
+        with _lock:
+            record.setdefault("notes", {})[key] = value
+
+
+# Call after a left merge: records rows before / after and flags fan-out (duplicate keys on the right side).
+# Returns the number of extra rows the merge created.
+def check_fanout(left, merged, label):
+    extra = len(merged) - len(left)
+    note(f"merge:{label}", {"rows_left": len(left), "rows_out": len(merged), "fanout": extra > 0})
+    if extra > 0:
+        print(f"WARNING: left merge '{label}' went from {len(left)} to {len(merged)} rows "
+              f"(duplicate keys on the right side)")
+    return extra
+
+
+# Measures one stage. Yields the record; the caller sets record["out"] and anything else it knows.
+# profile=True runs the body under cProfile and saves the stats next to the trace.
+@contextmanager
+def traced_stage(name, inputs=(), profile=False, trace_dir=TRACE_DIR):
+    record = {"stage": name, "status": "ran", "thread": threading.current_thread().name,
+              "in": [shape_of(v) for v in inputs]}
+    _current.record = record
+    sampled = _sampler.start(name)
+    profiler = None
+    if profile:
+        import cProfile     # (profiling modules are only imported when asked for)
+        profiler = cProfile.Profile()
+        profiler.enable()
+    cpu_start, wall_start = time.thread_time(), time.perf_counter()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = time.thread_time() - cpu_start
+        if sampled:
+            rss = _sampler.stop(name)
+            record.update(rss_start_mb=rss["start"], rss_peak_mb=rss["peak"], rss_growth_mb=rss["peak"] - rss["start"],
+                          overlapped=sorted(rss["overlapped"]))
+        _current.record = None
+        if profiler:
+            os.makedirs(trace_dir, exist_ok=True)
+            path = os.path.join(trace_dir, f"{name}.prof")
+            profiler.dump_stats(path)
+            import io
+            import pstats
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(20)
+            record["profile"] = path
+            print(out.getvalue())
+
+
+# Writes the records as OutputData/trace/trace.json (the latest run) plus a timestamped copy
+def write_trace(records, trace_dir=TRACE_DIR, meta=None):
+    os.makedirs(trace_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc)
+    trace = {"started": stamp.isoformat(timespec="seconds"), "meta": meta or {}, "stages": records}
+    paths = [os.path.join(trace_dir, "trace.json"),
+             os.path.join(trace_dir, f"trace-{stamp.strftime('%Y%m%d-%H%M%S')}.json")]
+    for path in paths:
+        with open(path, "w") as f:
+            json.dump(trace, f, indent=1, default=str)
+    return paths[0]
+
+
+# Summary of a trace, one row (dict) per stage
+def summary_rows(records):
+    rows = []
+    for r in records:
+        fanout = [k.split(":", 1)[1] for k, v in r.get("notes", {}).items() if isinstance(v, dict) and v.get("fanout")]
+        rows.append({
+            "stage": r["stage"], "status": r["status"],
+            "wall_s": r.get("wall_s"), "cpu_s": r.get("cpu_s"),
+            "rss_peak_mb": r.get("rss_peak_mb"), "rss_growth_mb": r.get("rss_growth_mb"),
+            "rows_in": ",".join(str(s[0]) for s in r.get("in", []) if s) or None,
+            "rows_out": r["out"][0] if r.get("out") else None,
+            "cols_out": r["out"][1] if r.get("out") else None,
+            "fanout": ",".join(fanout) or None,
+        })
+    return rows
+
+
+# The summary as a printable table (seconds / MB to 2 decimals, "-" where a value doesn't apply).
+# Plain string formatting, so printing it doesn't import pandas into an otherwise cached run.
+def format_summary(records):
+    rows = summary_rows(records)
+    if not rows:
+        return "(no stages)"
+    cells = [[("-" if v is None else f"{v:.2f}" if isinstance(v, float) else str(v)) for v in row.values()]
+             for row in rows]
+    header = list(rows[0])
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(header)]
+    return "\n".join(" ".join(c.rjust(w) for c, w in zip(line, widths)) for line in [header] + cells)
+
+
+# ---------------------------------------------------------------- startup cost
+
+# Totals the output of `python -X importtime` per top-level package: the cumulative time of every
+# import made outside another import (so a package's total includes whatever it pulled in).
+# Returns ({package: seconds}, the stderr lines that were not import timings).
+def parse_importtime(stderr):
+    totals, other = {}, []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit() or fields[2].startswith("  "):
+            continue    # header line, or an import made inside another one
+        package = fields[2].strip().split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(fields[1]) / 1e6
+    return totals, other
+
+
+# Runs `python -X importtime <argv>` and reports how much of its wall time went to imports.
+# The report is printed and written to OutputData/trace/startup.json; returns the command's exit code.
+def profile_startup(argv, top=15, trace_dir=TRACE_DIR):
+    import subprocess
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", *argv], stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    totals, other = parse_importtime(proc.stderr)
+    if other:
+        print("\n".join(other), file=sys.stderr)
+
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+    imports = sum(totals.values())
+    print("="*10, "Startup profile", "="*10)
+    print(f"{'package':<28} {'import_s':>9}")
+    for package, seconds in ranked[:top]:
+        print(f"{package:<28} {seconds:>9.3f}")
+    if len(ranked) > top:
+        print(f"{f'({len(ranked) - top} more)':<28} {sum(s for _, s in ranked[top:]):>9.3f}")
+    print(f"Imports took {imports:.2f} s of {wall:.2f} s ({imports / wall:.0%})")
+
+    os.makedirs(trace_dir, exist_ok=True)
+    with open(os.path.join(trace_dir, "startup.json"), "w") as f:
+        json.dump({"argv": argv, "wall_s": wall, "import_s": imports, "returncode": proc.returncode,
+                   "packages": dict(ranked)}, f, indent=1)
+    return proc.returncode
@@ -0,0 +1,118 @@
+# Collapsed PCR predictor
+# StandardScaler -> PCA -> LinearRegression is affine end to end, so the fitted pipeline is the same as
+#   prediction = intercept + X @ coef
+# in the original feature space. Collapsing it once gives a small artifact (feature names, intercept,
+# coefficient vector) that scores grids or millions of block groups with chunked matrix-vector
+# products, without DataFrames in between and without importing sklearn.
+#
+# For a response surface over two predictors with the others held fixed, the prediction is
+#   base + coef_x * x + coef_y * y
+# so a dense grid is one outer sum rather than a scored grid of full feature rows.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+PREDICTOR_PATH = "OutputData/PCR_Predictor.json"
+
+# Rows per matrix-vector product when scoring large inputs
+SCORE_CHUNK = 1_000_000
+
+# Block group feature (blockgroup_pca.BG_FEATURES) standing in for each county-level predictor
+BG_FEATURE_FOR = {"wtd_WrkAge_pop_pct": "P_WrkAge", "wtd_avg_walk_index": "NatWalkInd"}
+
+
+class LinearPredictor:
+    def __init__(self, features, intercept, coef, target=None):
+        self.features = list(features)
+        self.intercept = float(intercept)
+        self.coef = np.asarray(coef, dtype='float64')
+        self.target = target
+
+    # Predictions for a DataFrame (columns picked by name) or an array with the features in order
+    def predict(self, X, chunk_rows=SCORE_CHUNK):
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features].to_numpy(dtype='float64')
+        X = np.asarray(X)
+        out = np.empty(len(X))
+        for start in range(0, len(X), chunk_rows):
+            out[start:start + chunk_rows] = X[start:start + chunk_rows] @ self.coef + self.intercept
+        return out
+
+    # Predictions for a stream of chunks (arrays or DataFrames), concatenated
+    def predict_chunks(self, chunks):
+        return np.concatenate([self.predict(chunk) for chunk in chunks])
+
+    # Response surface over x_var and y_var with every other feature held at base (a Series / dict of values).
+    # Returns (x_values, y_values, predictions) with predictions[i, j] at (x_values[j], y_values[i]),
+    # the same layout as np.meshgrid(x_values, y_values).
+    def surface(self, x_var, y_var, x_values, y_values, base):
+        base = np.array([base[f] for f in self.features], dtype='float64')
+        i, j = self.features.index(x_var), self.features.index(y_var)
+        rest = self.intercept + base @ self.coef - base[i] * self.coef[i] - base[j] * self.coef[j]
+        x_values = np.asarray(x_values, dtype='float64')
+        y_values = np.asarray(y_values, dtype='float64')
+        return x_values, y_values, rest + self.coef[j] * y_values[:, None] + self.coef[i] * x_values[None, :]
+
+    # Surfaces for every pair of features over their [min, max] ranges (a resolution x resolution grid each).
+    # ranges maps feature -> (min, max). Yields (x_var, y_var, x_values, y_values, predictions) one pair at a time.
+    def pair_surfaces(self, ranges, base, resolution=1000):
+        for a, x_var in enumerate(self.features):
+            for y_var in self.features[a + 1:]:
+                x_values = np.linspace(*ranges[x_var], resolution)
+                y_values = np.linspace(*ranges[y_var], resolution)
+                yield (x_var, y_var) + self.surface(x_var, y_var, x_values, y_values, base)
+
+    def to_dict(self):
+        return {"features": self.features, "intercept": self.intercept, "coef": self.coef.tolist(),
+                "target": self.target}
+
+    def save(self, path=PREDICTOR_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        return path
+
+
+def load_predictor(path=PREDICTOR_PATH):
+    with open(path) as f:
+        spec = json.load(f)
+    return LinearPredictor(spec["features"], spec["intercept"], spec["coef"], spec.get("target"))
+
+
+# Collapses fitted StandardScaler, PCA and LinearRegression objects into one LinearPredictor.
+#   y = b0 + beta . (C ((x - mu) / s - m))  =  [b0 - beta . C m - sum(mu * w)] + x . w,   w = (C' beta) / s
+# (C = pca.components_, m = pca.mean_, mu / s = scaler.mean_ / scaler.scale_)
+def collapse_pcr(scaler, pca, model, features, target=None):
+    beta = np.ravel(model.coef_)
+    direction = pca.components_.T @ beta
+    coef = direction / scaler.scale_
+    intercept = float(np.ravel(model.intercept_)[0]) - pca.mean_ @ direction - scaler.mean_ @ coef
+    return LinearPredictor(features, intercept, coef, target)
+
+
+# Scores every block group of the SLD with a county-level predictor, streaming the csv chunk by chunk.
+# The county shares are replaced by the same ratios at the block group, and the population-weighted
+# county means by the block group values (BG_FEATURE_FOR). Block groups with a missing or undefined
+# feature get NaN. Returns STATEFP, COUNTYFP and the prediction per block group.
+def score_block_groups(predictor, walk_path, statefp=None, chunksize=None):
+    from blockgroup_pca import BG_FEATURES, block_group_features
+    from walkability import SLD_CHUNKSIZE, SLD_COLS, iter_sld
+
+    bg_names = [name for name, _, _ in BG_FEATURES]
+    missing = [f for f in predictor.features if BG_FEATURE_FOR.get(f, f) not in bg_names]
+    if missing:
+        raise ValueError(f"No block group feature for: {missing}")
+    order = [bg_names.index(BG_FEATURE_FOR.get(f, f)) for f in predictor.features]
+
+    keys, scores = [], []
+    for chunk in iter_sld(walk_path, statefp=statefp, usecols=SLD_COLS, chunksize=chunksize or SLD_CHUNKSIZE):
+        X = block_group_features(chunk, dropna=False)[:, order]
+        keys.append(chunk[["STATEFP", "COUNTYFP"]].to_numpy())
+        with np.errstate(invalid='ignore'):
+            scores.append(predictor.predict(X))
+    keys = np.concatenate(keys) if keys else np.empty((0, 2), dtype='int64')
+    return pd.DataFrame({"STATEFP": keys[:, 0], "COUNTYFP": keys[:, 1],
+                         "prediction": np.concatenate(scores) if scores else np.empty(0)})
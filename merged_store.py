@@ -0,0 +1,243 @@
+# SQLite store for the merged county table (Merged_Main in OutputData/my_database.db)
+# Explicit typed schema, bulk inserts in large transactions, indexes on county / FIPS / state,
+# and upserts of only the counties whose values changed instead of replacing the whole table.
+# query_counties() is the read side: column subsets, state / county filters and a vintage.
+
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from walkability import COUNTY_COLS
+from places import measures_to_keep
+
+TABLE = "Merged_Main"
+DEFAULT_VINTAGE = "PLACES_2024_20251119"
+
+# Rows per transaction for bulk loads
+BATCH_ROWS = 50_000
+
+# (column, SQLite type) in table order. vintage + StateAbbr + County identify a row.
+KEY_SCHEMA = [
+    ("vintage", "TEXT NOT NULL"),
+    ("StateAbbr", "TEXT NOT NULL"),
+    ("County", "TEXT NOT NULL"),
+    ("STATEFP", "INTEGER"),
+    ("COUNTYFP", "INTEGER"),
+    ("GEOID", "INTEGER"),
+]
+VALUE_SCHEMA = (
+    [("TotalPopulation", "INTEGER"), ("TotalPop18plus", "INTEGER")]
+    + [(m, "REAL") for m in sorted(measures_to_keep)]
+    + [(name, "REAL") for name, _, _ in COUNTY_COLS]
+)
+SCHEMA = KEY_SCHEMA + VALUE_SCHEMA + [("row_hash", "INTEGER NOT NULL")]
+KEY_COLS = ["vintage", "StateAbbr", "County"]
+VALUE_COLS = [c for c, _ in VALUE_SCHEMA]
+COLUMN_TYPES = {c: t.split()[0] for c, t in SCHEMA}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+
+# Creates Merged_Main and its indexes if they don't exist yet.
+# A Merged_Main left over from the old to_sql(if_exists='replace') dumps has no schema to upsert into, so it is dropped.
+def create_schema(con):
+    existing = [row[1] for row in con.execute(f"PRAGMA table_info({TABLE})")]
+    if existing and existing != [c for c, _ in SCHEMA]:
+        print(f"Replacing old {TABLE} table layout with the typed schema.")
+        con.execute(f"DROP TABLE {TABLE}")
+    cols = ",\n    ".join(f"{_quote(c)} {t}" for c, t in SCHEMA)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} (\n    {cols},\n    PRIMARY KEY (vintage, StateAbbr, County)\n)")
+    con.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_county ON {TABLE} (County)")
+    con.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_geoid ON {TABLE} (GEOID)")
+    con.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_state ON {TABLE} (StateAbbr, vintage)")
+    con.commit()
+
+
+# Puts a merged county table (one state or national) into the store's column layout
+def to_store_frame(merged_df, state=None, county_col="Texas County", vintage=DEFAULT_VINTAGE, statefp=None):
+    df = pd.DataFrame({"vintage": vintage}, index=merged_df.index)
+    df["StateAbbr"] = merged_df["StateAbbr"] if "StateAbbr" in merged_df.columns else state
+    df["County"] = merged_df[county_col].astype(str)
+    df["STATEFP"] = pd.to_numeric(merged_df["STATEFP"] if "STATEFP" in merged_df.columns else statefp)
+    df["COUNTYFP"] = pd.to_numeric(merged_df["COUNTYFP"] if "COUNTYFP" in merged_df.columns else np.nan)
+    df["GEOID"] = df["STATEFP"] * 1000 + df["COUNTYFP"]
+    for col in VALUE_COLS:
+        df[col] = merged_df[col] if col in merged_df.columns else np.nan
+    # A hash of the values decides whether a county changed since the last write
+    df["row_hash"] = pd.util.hash_pandas_object(df[["STATEFP", "COUNTYFP"] + VALUE_COLS], index=False).astype("int64")
+    return df.reset_index(drop=True)
+
+
+def _python_rows(df):
+    # sqlite3 wants plain Python values with None for missing
+    obj = df.astype(object).where(df.notna(), None)
+    return list(obj.itertuples(index=False, name=None))
+
+
+# Writes a merged county table into the store.
+# Only counties that are new or whose values changed are written (INSERT ... ON CONFLICT DO UPDATE),
+# in batches of BATCH_ROWS per transaction. With prune=True, counties of the same vintage and state(s)
+# that are no longer in merged_df are deleted, so the result matches a full replace.
+# Returns the number of rows written.
+def write_merged(db_path, merged_df, state=None, county_col="Texas County", vintage=DEFAULT_VINTAGE,
+                 statefp=None, prune=True):
+    new = to_store_frame(merged_df, state, county_col, vintage, statefp)
+    con = connect(db_path)
+    try:
+        create_schema(con)
+        states = sorted(new["StateAbbr"].dropna().unique())
+        marks = ",".join("?" * len(states))
+        old = pd.read_sql_query(
+            f"SELECT StateAbbr, County, row_hash FROM {TABLE} WHERE vintage = ? AND StateAbbr IN ({marks})",
+            con, params=[vintage] + states)
+
+        old["row_hash"] = old["row_hash"].astype("Int64")  # keep all 64 bits through the left merge
+        merged = new.merge(old, on=["StateAbbr", "County"], how="left", suffixes=("", "_old"))
+        is_changed = (merged["row_hash"] != merged["row_hash_old"]).fillna(True).to_numpy(dtype=bool)
+        changed = new[is_changed]
+
+        cols = [c for c, _ in SCHEMA]
+        updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in cols if c not in KEY_COLS)
+        sql = (f"INSERT INTO {TABLE} ({', '.join(_quote(c) for c in cols)}) VALUES ({', '.join('?' * len(cols))}) "
+               f"ON CONFLICT (vintage, StateAbbr, County) DO UPDATE SET {updates}")
+        for start in range(0, len(changed), BATCH_ROWS):
+            with con:
+                con.executemany(sql, _python_rows(changed[cols].iloc[start:start + BATCH_ROWS]))
+
+        if prune and len(old):
+            gone = old.merge(new[["StateAbbr", "County"]], how="left", indicator=True)
+            gone = gone[gone["_merge"] == "left_only"]
+            with con:
+                con.executemany(f"DELETE FROM {TABLE} WHERE vintage = ? AND StateAbbr = ? AND County = ?",
+                                [(vintage, s, c) for s, c in zip(gone["StateAbbr"], gone["County"])])
+        return len(changed)
+    finally:
+        con.close()
+
+
+def list_vintages(db_path):
+    con = connect(db_path)
+    try:
+        create_schema(con)
+        return [v for (v,) in con.execute(f"SELECT DISTINCT vintage FROM {TABLE} ORDER BY vintage")]
+    finally:
+        con.close()
+
+
+# {vintage: set of StateAbbr} already in the store (what an incremental load can skip)
+def vintage_states(db_path):
+    con = connect(db_path)
+    try:
+        create_schema(con)
+        stored = {}
+        for vintage, state in con.execute(f"SELECT DISTINCT vintage, StateAbbr FROM {TABLE}"):
+            stored.setdefault(vintage, set()).add(state)
+        return stored
+    finally:
+        con.close()
+
+
+# Reads counties from the store.
+#   columns  - list of columns to return (default: everything but row_hash)
+#   states   - StateAbbr or list of them;  counties - county name(s);  geoids - GEOID(s)
+#   vintage  - a vintage (DEFAULT_VINTAGE, the one write_merged writes by default), a list of them, "all",
+#              or "latest" for the newest one stored
+#   as_arrays - return {column: numpy array} instead of a DataFrame
+def query_counties(db_path, columns=None, states=None, counties=None, geoids=None, vintage=DEFAULT_VINTAGE,
+                   as_arrays=False):
+    if columns is None:
+        columns = [c for c, _ in SCHEMA if c != "row_hash"]
+    unknown = set(columns) - set(COLUMN_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown columns: {sorted(unknown)}")
+
+    where, params = [], []
+    def add_filter(col, values):
+        if values is None:
+            return
+        if isinstance(values, (str, int, np.integer)):
+            values = [values]
+        values = list(values)
+        where.append(f"{col} IN ({','.join('?' * len(values))})")
+        params.extend(values)
+
+    con = connect(db_path)
+    try:
+        create_schema(con)
+        if vintage == "latest":
+            latest = con.execute(f"SELECT MAX(vintage) FROM {TABLE}").fetchone()[0]
+            add_filter("vintage", [latest] if latest is not None else [])
+        elif vintage != "all":
+            add_filter("vintage", vintage)
+        add_filter("StateAbbr", states)
+        add_filter("County", counties)
+        add_filter("GEOID", geoids)
+
+        sql = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {TABLE}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY vintage, StateAbbr, County"
+        rows = con.execute(sql, params).fetchall()
+    finally:
+        con.close()
+
+    data = {}
+    for i, col in enumerate(columns):
+        values = [r[i] for r in rows]
+        kind = COLUMN_TYPES[col]
+        if kind == "TEXT":
+            data[col] = np.array(values, dtype=object)
+        elif kind == "INTEGER" and None not in values:
+            data[col] = np.array(values, dtype="int64")
+        else:
+            data[col] = np.array([np.nan if v is None else v for v in values], dtype="float64")
+    if as_arrays:
+        return data
+    return pd.DataFrame(data, columns=columns)
+
+
+# Change of each column between two vintages, county by county: one self-join of Merged_Main on GEOID
+# (indexed), so a year-over-year table never re-reads or re-processes the source files.
+# Counties in only one of the two vintages are left out. Returns StateAbbr, County, GEOID, base_vintage,
+# vintage and, per column, <col>_prev (base value), <col> (target value) and <col>_change (target - base).
+def change_table(db_path, base, target, columns=None, states=None):
+    if columns is None:
+        columns = sorted(measures_to_keep)
+    unknown = set(columns) - set(VALUE_COLS)
+    if unknown:
+        raise ValueError(f"Unknown value columns: {sorted(unknown)}")
+
+    select = ["t.StateAbbr", "t.County", "t.GEOID"]
+    for col in columns:
+        q = _quote(col)
+        select += [f"b.{q} AS {_quote(col + '_prev')}", f"t.{q} AS {q}", f"t.{q} - b.{q} AS {_quote(col + '_change')}"]
+    sql = (f"SELECT {', '.join(select)} FROM {TABLE} t JOIN {TABLE} b ON b.GEOID = t.GEOID AND b.vintage = ? "
+           f"WHERE t.vintage = ?")
+    params = [base, target]
+    if states is not None:
+        states = [states] if isinstance(states, str) else list(states)
+        sql += f" AND t.StateAbbr IN ({','.join('?' * len(states))})"
+        params += states
+    sql += " ORDER BY t.GEOID"
+
+    con = connect(db_path)
+    try:
+        create_schema(con)
+        df = pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+    df.insert(3, "base_vintage", base)
+    df.insert(4, "vintage", target)
+    return df
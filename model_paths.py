@@ -0,0 +1,195 @@
+# Model comparison for the walkability predictors vs Obesity_clean
+# Every model here is linear in the standardized predictors, so each CV fold only needs the training
+# rows' standardized Gram matrix G = Z'Z / n, the cross products c = Z'(y - y_mean) / n and the
+# eigendecomposition of G. From those cached statistics, per fold:
+#   ols         G b = c (pseudo-inverse over the non-zero eigenvalues)
+#   pcr         the first k eigenvectors of G (the PCA components), k = 1..p
+#   ridge       b(alpha) = V diag(1 / (lambda + alpha / n)) V'c for the whole alpha grid at once
+#   lasso/enet  coordinate descent on G and c down the alpha path, each alpha warm-started from the last
+#   univariate  b_j = c_j / G_jj for every predictor on its own (the regplot lines)
+# The test rows of the fold are then scored for all models with one matrix product.
+# alpha uses the sklearn conventions (Ridge: ||y - Xb||^2 + alpha ||b||^2; Lasso / ElasticNet:
+# ||y - Xb||^2 / 2n + alpha (l1_ratio ||b||_1 + (1 - l1_ratio) ||b||^2 / 2)) on the standardized predictors.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pcr_cv import SVD_RTOL, cv_se, kfold_splits
+
+RIDGE_ALPHAS = np.logspace(-3, 5, 100)
+L1_RATIOS = (1.0, 0.5)              # 1.0 = lasso
+N_PATH_ALPHAS = 100
+PATH_EPS = 1e-3                     # smallest path alpha = PATH_EPS * the alpha that zeroes every coefficient
+CD_TOL = 1e-8                       # coordinate descent stops when no coefficient moves more than this
+CD_MAX_ITER = 10_000
+CD_SUPPORT_TOL = 1e-4               # sweeps settle the support to here, then it is solved exactly
+
+
+# Standardization, Gram matrix, cross products and eigendecomposition of one fold's training rows
+def fold_stats(X_train, y_train):
+    n = len(X_train)
+    mean = X_train.mean(axis=0)
+    scale = X_train.std(axis=0)          # ddof=0, same as StandardScaler
+    scale[scale == 0] = 1.0
+    Z = (X_train - mean) / scale
+    y_mean = y_train.mean()
+    G = Z.T @ Z / n
+    c = Z.T @ (y_train - y_mean) / n
+    lam, V = np.linalg.eigh(G)
+    order = np.argsort(lam)[::-1]
+    return {"n": n, "mean": mean, "scale": scale, "y_mean": y_mean, "G": G, "c": c,
+            "lam": lam[order], "V": V[:, order]}
+
+
+# Largest alpha of an l1 path: every coefficient is zero from there on
+def path_alpha_max(c, l1_ratio):
+    return np.abs(c).max() / l1_ratio
+
+
+# Alpha grid of an l1 path, largest first
+def path_alphas(c, l1_ratio, n_alphas=N_PATH_ALPHAS, eps=PATH_EPS):
+    alpha_max = path_alpha_max(c, l1_ratio)
+    if alpha_max == 0:
+        return np.zeros(1)
+    return np.logspace(np.log10(alpha_max), np.log10(alpha_max * eps), n_alphas)
+
+
+# Exact elastic-net solution on b's support and signs, or None if it fails the optimality conditions
+# (a sign flips, or a zero coefficient's gradient exceeds l1)
+def _solve_support(G, c, b, l1, l2):
+    active = b != 0
+    signs = np.sign(b[active])
+    exact = np.zeros_like(b)
+    if active.any():
+        exact[active] = np.linalg.solve(G[np.ix_(active, active)] + l2 * np.eye(active.sum()), c[active] - l1 * signs)
+        if np.any(np.sign(exact[active]) != signs):
+            return None
+    grad = c - G @ exact
+    if np.any(np.abs(grad[~active]) > l1 * (1 + 1e-9) + 1e-12):
+        return None
+    return exact
+
+
+# Elastic-net coefficients along a (decreasing) alpha path by coordinate descent on the Gram matrix.
+# Each alpha starts from the previous solution; once the sweeps have settled on a support (CD_SUPPORT_TOL)
+# the coefficients are solved exactly on it, and the sweeps only go on to CD_TOL if that solution isn't optimal.
+# Returns a p x len(alphas) matrix.
+def enet_path(G, c, alphas, l1_ratio, tol=CD_TOL, max_iter=CD_MAX_ITER):
+    p = len(c)
+    b = np.zeros(p)
+    Gb = np.zeros(p)                    # G @ b, kept up to date coordinate by coordinate
+    diag = np.diag(G)
+    coefs = np.zeros((p, len(alphas)))
+    for a, alpha in enumerate(alphas):
+        l1, l2 = alpha * l1_ratio, alpha * (1 - l1_ratio)
+        polished = False
+        for _ in range(max_iter):
+            max_step = 0.0
+            for j in range(p):
+                if diag[j] == 0:
+                    continue
+                rho = c[j] - Gb[j] + diag[j] * b[j]
+                new = np.sign(rho) * max(abs(rho) - l1, 0.0) / (diag[j] + l2)
+                step = new - b[j]
+                if step:
+                    Gb += G[:, j] * step
+                    b[j] = new
+                    max_step = max(max_step, abs(step))
+            if max_step < tol:
+                break
+            if max_step < CD_SUPPORT_TOL and not polished:
+                polished = True
+                exact = _solve_support(G, c, b, l1, l2)
+                if exact is not None:
+                    b, Gb = exact, G @ exact
+                    break
+        coefs[:, a] = b
+    return coefs
+
+
+# Model specs (one dict per model) for p predictors, in the column order of fold_coefs
+def model_specs(features, ridge_alphas, paths):
+    specs = [{"model": "ols", "family": "ols"}]
+    specs += [{"model": f"pcr_k{k}", "family": "pcr", "n_components": k} for k in range(1, len(features) + 1)]
+    specs += [{"model": f"ridge_{alpha:.4g}", "family": "ridge", "alpha": alpha} for alpha in ridge_alphas]
+    for l1_ratio, alphas in paths.items():
+        family = "lasso" if l1_ratio == 1 else "enet"
+        specs += [{"model": f"{family}_{l1_ratio:g}_{alpha:.4g}", "family": family, "alpha": alpha,
+                   "l1_ratio": l1_ratio} for alpha in alphas]
+    specs += [{"model": f"univariate_{f}", "family": "univariate", "predictor": f} for f in features]
+    return specs
+
+
+# Standardized coefficients of every model from one fold's statistics (p x n_models, model_specs order)
+def fold_coefs(stats, ridge_alphas, paths):
+    G, c, lam, V, n = stats["G"], stats["c"], stats["lam"], stats["V"], stats["n"]
+    keep = lam > SVD_RTOL * (lam[0] if len(lam) else 0)
+    Vc = V.T @ c
+    inv = np.zeros_like(lam)
+    inv[keep] = 1 / lam[keep]
+
+    ols = V @ (Vc * inv)
+    pcr = np.cumsum(V * (Vc * inv), axis=1)                 # column k-1: first k components
+    ridge = V @ (Vc[:, None] / (lam[:, None] + np.asarray(ridge_alphas)[None, :] / n))
+    l1 = [enet_path(G, c, alphas, l1_ratio) for l1_ratio, alphas in paths.items()]
+    diag = np.diag(G)
+    univariate = np.diag(np.divide(c, diag, out=np.zeros_like(c), where=diag > 0))
+    return np.column_stack([ols[:, None], pcr, ridge, *l1, univariate])
+
+
+# Squared error totals of one fold for every model
+def score_fold(X, y, train_idx, test_idx, ridge_alphas, paths):
+    stats = fold_stats(X[train_idx], y[train_idx])
+    B = fold_coefs(stats, ridge_alphas, paths)
+    Z_test = (X[test_idx] - stats["mean"]) / stats["scale"]
+    y_test = y[test_idx]
+    preds = stats["y_mean"] + Z_test @ B
+    sse = ((y_test[:, None] - preds) ** 2).sum(axis=0)
+    sst = ((y_test - y_test.mean()) ** 2).sum()
+    return sse, sst, len(test_idx)
+
+
+# Cross-validated error of every model (OLS, PCR for every k, the ridge grid, the lasso / elastic-net
+# paths and the univariate fits) on the same K-fold splits as cv_components.
+# The l1 path alphas are set from all rows (as LassoCV does) so every fold scores the same grid.
+# Returns (table, coefs): table has one row per model with its parameters and the fold mean / standard
+# error of the MSE and the mean R-squared; coefs has the same models' standardized coefficients fitted
+# on all rows (one column per model, one row per feature).
+def compare_models(X, y, features=None, n_splits=5, n_repeats=1, seed=42, ridge_alphas=RIDGE_ALPHAS,
+                   l1_ratios=L1_RATIOS, n_alphas=N_PATH_ALPHAS, max_workers=None):
+    if isinstance(X, pd.DataFrame):
+        features = list(X.columns) if features is None else features
+    X = np.asarray(X, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    features = features or [f"x{j}" for j in range(X.shape[1])]
+    full = fold_stats(X, y)
+    paths = {l1_ratio: path_alphas(full["c"], l1_ratio, n_alphas) for l1_ratio in l1_ratios}
+    specs = model_specs(features, ridge_alphas, paths)
+
+    splits = kfold_splits(len(X), n_splits, n_repeats, seed)
+    workers = max_workers or min(len(splits), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda split: score_fold(X, y, split[0], split[1], ridge_alphas, paths), splits))
+
+    sse = np.array([r[0] for r in results])
+    sst = np.array([r[1] for r in results])
+    n_test = np.array([r[2] for r in results])
+    fold_mse = sse / n_test[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fold_r2 = 1 - sse / sst[:, None]
+
+    coefs = pd.DataFrame(fold_coefs(full, ridge_alphas, paths), index=features, columns=[s["model"] for s in specs])
+    table = pd.DataFrame(specs)
+    table["nonzero"] = (coefs.to_numpy() != 0).sum(axis=0)
+    table["cv_mse"] = fold_mse.mean(axis=0)
+    table["cv_mse_se"] = cv_se(fold_mse, n_splits)
+    table["cv_r2"] = np.nanmean(fold_r2, axis=0)
+    return table, coefs
+
+
+# Lowest-CV-MSE model of each family
+def best_by_family(table):
+    return table.loc[table.groupby("family", sort=False)["cv_mse"].idxmin()].reset_index(drop=True)
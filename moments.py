@@ -0,0 +1,122 @@
+# One-pass, mergeable moment accumulator (count, means, co-moments)
+# Fed chunk by chunk, per state or per worker; two accumulators over disjoint rows merge exactly
+# (pairwise update of Chan, Golub & LeVeque), so partial results from parallel runs combine into the
+# same covariance / correlation as one pass over all rows, without holding the rows in memory.
+#
+# pairwise=False  complete cases only: rows with a NaN in any column are skipped (like dropna + PCA)
+# pairwise=True   every pair of columns uses the rows where both are present (like DataFrame.corr / cov)
+#
+# Every statistic is kept per column pair (p x p): n[i, j] rows, mean[i, j] = mean of column i over
+# those rows, m2[i, j] = its sum of squared deviations, and the co-moment c[i, j].
+
+import numpy as np
+import pandas as pd
+
+# Rows per block when accumulating a DataFrame that is already in memory
+MOMENT_CHUNK = 100_000
+
+
+class MomentAccumulator:
+    def __init__(self, columns, pairwise=False):
+        self.columns = list(columns)
+        self.pairwise = pairwise
+        p = len(self.columns)
+        self.n = np.zeros((p, p))
+        self.mean = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))
+        self.c = np.zeros((p, p))
+
+    # Adds a block of rows (DataFrame with the accumulator's columns, or a 2-D array in column order)
+    def update(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[self.columns]
+        X = np.asarray(X, dtype='float64')
+        if X.ndim != 2 or X.shape[1] != len(self.columns):
+            raise ValueError(f"Expected {len(self.columns)} columns, got shape {X.shape}")
+        present = ~np.isnan(X)
+        if not self.pairwise:
+            X = X[present.all(axis=1)]
+            present = np.ones(X.shape, dtype=bool)
+        if not len(X):
+            return self
+
+        # Block statistics from masked sums, around a shift so large means don't cost precision
+        col_n = present.sum(axis=0)
+        shift = np.where(present, X, 0.0).sum(axis=0) / np.maximum(col_n, 1)
+        D = np.where(present, X - shift, 0.0)
+        W = present.astype('float64')
+        n_b = W.T @ W
+        s = D.T @ W                  # s[i, j] = sum of (x_i - shift_i) over rows with i and j present
+        q = (D * D).T @ W
+        cross = D.T @ D
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_d = np.where(n_b > 0, s / n_b, 0.0)
+        block = MomentAccumulator(self.columns, self.pairwise)
+        block.n = n_b
+        block.mean = mean_d + shift[:, None]
+        block.m2 = q - s * mean_d
+        block.c = cross - s * mean_d.T
+        return self.merge(block)
+
+    # Folds another accumulator over different rows into this one (exact)
+    def merge(self, other):
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge accumulators over different columns")
+        n_a, n_b = self.n, other.n
+        n = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = np.where(n > 0, n_a * n_b / n, 0.0)
+            delta = other.mean - self.mean
+            self.mean = np.where(n > 0, self.mean + delta * np.where(n > 0, n_b / n, 0.0), 0.0)
+        self.m2 = self.m2 + other.m2 + delta * delta * w
+        self.c = self.c + other.c + delta * delta.T * w
+        self.n = n
+        return self
+
+    @classmethod
+    def from_frame(cls, df, columns=None, pairwise=False, chunk_rows=MOMENT_CHUNK):
+        if columns is None:
+            columns = list(df.select_dtypes('number').columns)
+        acc = cls(columns, pairwise)
+        for start in range(0, len(df), chunk_rows):
+            acc.update(df[columns].iloc[start:start + chunk_rows])
+        return acc
+
+    @classmethod
+    def from_chunks(cls, chunks, columns, pairwise=False):
+        acc = cls(columns, pairwise)
+        for chunk in chunks:
+            acc.update(chunk)
+        return acc
+
+    @property
+    def count(self):
+        return pd.Series(np.diag(self.n), index=self.columns)
+
+    def means(self):
+        return pd.Series(np.diag(self.mean), index=self.columns)
+
+    def variances(self, ddof=1):
+        n = np.diag(self.n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.Series(np.where(n > ddof, np.diag(self.m2) / (n - ddof), np.nan), index=self.columns)
+
+    def covariance(self, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self.n > ddof, self.c / (self.n - ddof), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    # Pearson correlation (for pairwise=True each pair uses its own means / variances, as DataFrame.corr)
+    def correlation(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.c / np.sqrt(self.m2 * self.m2.T)
+        corr[self.n < 2] = np.nan
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    # Z'Z of the standardized data (StandardScaler conventions: population variance, constant column -> scale 1).
+    # Its eigenvectors are the PCA components; only meaningful for complete-case accumulators.
+    def standardized_gram(self):
+        n = np.diag(self.n)
+        scale = np.sqrt(np.diag(self.m2) / np.where(n > 0, n, 1))
+        scale[scale == 0] = 1.0
+        return self.c / np.outer(scale, scale)
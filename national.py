@@ -0,0 +1,213 @@
+# Nationwide (multi-state) mode for the Data Dominators pipeline
+# Reads the SLD and PLACES files once, splits them by state and runs the
+# walkability condense + PLACES pivot + merge for each state in a process pool.
+#
+# INPUT FILES:
+#   EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv
+#   PLACES__Local_Data_for_Better_Health,_County_Data_2024_release_20251119.csv
+#   A national county FIPS table with columns STATEFP, COUNTYFP, County
+#   (same layout as COUNTYFP_TX.csv plus STATEFP; source: https://transition.fcc.gov/oet/info/maps/census/fips/fips.txt)
+#
+# Example:
+#   python national.py --states TX OK NM --county-fips InputData/COUNTYFP_US.csv
+#   python national.py --states all --county-fips InputData/COUNTYFP_US.csv --workers 8
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from walkability import SLD_CHUNKSIZE, COUNTY_COLS, attach_county_names, condense_counties, plan_chunksize, read_sld
+from geo_index import MISSING, STATE_FIPS, CountyIndex, resolve_names, report_unmatched, unpack_geoid
+from sld_store import SLDStore, open_sld_store
+from places import read_places, clean_places, measures_to_keep
+from moments import MomentAccumulator
+from instrument import check_fanout
+
+# County name column used by the national tables (the Texas-only script uses 'Texas County')
+COUNTY_COL = 'County'
+
+# Numeric county columns whose covariance / correlation is accumulated per state with moments=True
+MOMENT_COLS = ['TotalPopulation', 'TotalPop18plus'] + sorted(measures_to_keep) + [name for name, _, _ in COUNTY_COLS]
+
+walk_path = "InputData/EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv"
+health_path = "InputData/PLACES__Local_Data_for_Better_Health,_County_Data_2024_release_20251119.csv"
+
+
+# Turns "all" or a list of abbreviations / FIPS codes into a list of state abbreviations
+def parse_states(states):
+    if states is None or states == 'all' or list(states) == ['all']:
+        return list(STATE_FIPS)
+    if isinstance(states, str):
+        states = [states]
+    fips_to_abbr = {v: k for k, v in STATE_FIPS.items()}
+    parsed = []
+    for state in states:
+        state = str(state).strip().upper()
+        if state.isdigit():
+            state = fips_to_abbr[int(state)]
+        if state not in STATE_FIPS:
+            raise ValueError(f"Unknown state: {state}")
+        parsed.append(state)
+    return parsed
+
+
+# Loads the national county FIPS table and tags each row with its StateAbbr
+def read_county_fips(path):
+    county_fp_df = pd.read_csv(path)
+    missing = {'STATEFP', 'COUNTYFP', COUNTY_COL} - set(county_fp_df.columns)
+    if missing:
+        raise ValueError(f"{path} is missing columns: {sorted(missing)}")
+    fips_to_abbr = {v: k for k, v in STATE_FIPS.items()}
+    county_fp_df['StateAbbr'] = county_fp_df['STATEFP'].map(fips_to_abbr)
+    return county_fp_df
+
+
+# Cleaning and county aggregation for one state (runs inside a worker process).
+# walk_state_df can also be a (block group store path, compact) pair, in which case the worker maps the
+# store itself and copies out its state's slice (in the compact dtypes when compact is set).
+# place_geoids maps the state's PLACES LocationNames to county GEOIDs (resolved here when not given), so
+# both sides are joined on the integer GEOID.
+# With moment_cols, also returns a pairwise MomentAccumulator over those columns of the state's counties.
+def run_state(state, walk_state_df, health_state_df, county_fp_state_df, moment_cols=None, place_geoids=None):
+    if isinstance(walk_state_df, tuple):
+        store_dir, compact = walk_state_df
+        walk_state_df = SLDStore(store_dir).frame(statefp=STATE_FIPS[state], compact=compact)
+    merged_walk = attach_county_names(walk_state_df, county_fp_state_df, key=COUNTY_COL)
+    walk_counties = condense_counties(merged_walk, key=['GEOID', COUNTY_COL]).drop(columns=COUNTY_COL)
+    health_counties = clean_places(health_state_df, state=None, county_col=COUNTY_COL)
+    if place_geoids is None:
+        index = CountyIndex.from_table(county_fp_state_df, COUNTY_COL)
+        place_geoids = {name: index.geoid_of_name(STATE_FIPS[state], name) for name in health_counties[COUNTY_COL]}
+    geoids = health_counties[COUNTY_COL].astype(str).map(place_geoids).fillna(MISSING).astype('int64')
+
+    merged_df = health_counties.assign(GEOID=geoids).merge(walk_counties, how='left', on='GEOID')
+    check_fanout(health_counties, merged_df, f"{state} health+walkability")
+    geoids = merged_df.pop('GEOID')
+    merged_df.insert(0, 'StateAbbr', state)
+    merged_df.insert(1, 'STATEFP', STATE_FIPS[state])
+    merged_df.insert(2, 'COUNTYFP', pd.Series(unpack_geoid(geoids)[1]).where(geoids != MISSING))
+    if moment_cols is not None:
+        return merged_df, MomentAccumulator.from_frame(merged_df.reindex(columns=moment_cols), moment_cols, pairwise=True)
+    return merged_df
+
+
+# SLD block groups of the requested states, split by STATEFP. With use_store=True the values are the
+# path of the memory-mapped block group store and whether to compact the slice (each worker maps its
+# own state's slice).
+def read_walk_parts(walk_path, statefps, use_store=False, memory_budget_mb=None):
+    read_opts = {}
+    if memory_budget_mb:
+        read_opts = {'chunksize': plan_chunksize(walk_path, memory_budget_mb), 'compact': True}
+    print("="*10, f"Importing {walk_path} for {len(statefps)} state(s)", "="*10)
+    if use_store:
+        # (the store is built in budget-sized chunks; the slices are compacted as they are copied out)
+        store = open_sld_store(walk_path, chunksize=read_opts.get('chunksize', SLD_CHUNKSIZE))
+        present = {int(g) // 1000 for g in store.county_geoid}
+        compact = read_opts.get('compact', False)
+        return {fips: (store.store_dir, compact) for fips in statefps if fips in present}
+    walk_df = read_sld(walk_path, statefp=statefps, **read_opts)
+    return dict(tuple(walk_df.groupby('STATEFP')))
+
+
+# run_state argument tuples for every state that has both walkability and health rows.
+# PLACES county names are resolved to GEOIDs once for every state through the shared county index
+# (and cached between runs); names that don't resolve are reported as <label>_places_names.
+def state_jobs(states, walk_parts, health_df, county_fp_df, index, county_fips_path=None, moment_cols=None,
+               label="national"):
+    health_parts = dict(tuple(health_df.groupby('StateAbbr', observed=True)))
+    county_parts = dict(tuple(county_fp_df.groupby('STATEFP')))
+
+    names = health_df[['StateAbbr', 'LocationName']].drop_duplicates().astype(str)
+    resolved = resolve_names(index, names.itertuples(index=False), county_fips_path)
+    place_geoids = {}
+    for (abbr, name), geoid in resolved.items():
+        place_geoids.setdefault(abbr, {})[name] = geoid
+    report_unmatched(f"{label}_places_names", pd.DataFrame(
+        [(abbr, name) for (abbr, name), geoid in resolved.items() if geoid == MISSING], columns=['StateAbbr', 'LocationName']))
+
+    jobs = []
+    for state in states:
+        fips = STATE_FIPS[state]
+        if fips not in walk_parts or state not in health_parts:
+            print(f"Skipping {state}: no rows in the walkability or health data.")
+            continue
+        jobs.append((state, walk_parts[fips], health_parts[state],
+                     county_parts.get(fips, county_fp_df.iloc[0:0]), moment_cols, place_geoids.get(state, {})))
+    return jobs
+
+
+# Concatenates per-state results into one county table and reports counties without walkability data
+def combine_states(results, label="national"):
+    national_df = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    if len(national_df):
+        no_walk = national_df[[name for name, _, _ in COUNTY_COLS]].isna().all(axis=1)
+        report_unmatched(f"{label}_no_walkability", national_df.loc[no_walk, ['StateAbbr', 'STATEFP', 'COUNTYFP', COUNTY_COL]])
+    return national_df
+
+
+# Runs the pipeline for every requested state and combines the results into one national county table.
+# Each source file is read once; the per-state work is spread across a process pool.
+# With use_store=True the SLD comes from the memory-mapped block group store (see sld_store.py) and
+# each worker maps its own state's slice instead of receiving a pickled copy.
+# With memory_budget_mb set, the SLD is read in chunks sized to that budget and kept in the compact dtypes.
+# With moments=True, each worker also accumulates the moments of its state's counties (MOMENT_COLS) and
+# the merged national MomentAccumulator is returned as well: (national_df, moments).
+def run_states(states='all', county_fips_path="InputData/COUNTYFP_US.csv",
+               walk_path=walk_path, health_path=health_path, max_workers=None, use_store=False,
+               memory_budget_mb=None, moments=False):
+    states = parse_states(states)
+    walk_parts = read_walk_parts(walk_path, [STATE_FIPS[s] for s in states], use_store, memory_budget_mb)
+    print("="*10, f"Importing {health_path}", "="*10)
+    health_df = read_places(health_path, states=states)
+    county_fp_df = read_county_fips(county_fips_path)
+    index = CountyIndex.from_table(county_fp_df, COUNTY_COL)
+    jobs = state_jobs(states, walk_parts, health_df, county_fp_df, index, county_fips_path,
+                      MOMENT_COLS if moments else None)
+
+    print("="*10, f"Processing {len(jobs)} state(s) on {max_workers or os.cpu_count()} worker(s)", "="*10)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(run_state, *zip(*jobs))) if jobs else []
+
+    national_moments = MomentAccumulator(MOMENT_COLS, pairwise=True)
+    if moments:
+        for _, state_moments in results:
+            national_moments.merge(state_moments)
+        results = [df for df, _ in results]
+    national_df = combine_states(results)
+    return (national_df, national_moments) if moments else national_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the walkability vs obesity cleaning for many states at once.")
+    parser.add_argument('--states', nargs='+', default=['all'], help='state abbreviations / FIPS codes, or "all"')
+    parser.add_argument('--county-fips', default="InputData/COUNTYFP_US.csv", help='national county FIPS table')
+    parser.add_argument('--walk-path', default=walk_path)
+    parser.add_argument('--health-path', default=health_path)
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('--output', default="OutputData/Merged_Data_National.csv")
+    parser.add_argument('--sld-store', action='store_true', help='read the SLD through the memory-mapped block group store')
+    parser.add_argument('--db', default=None, help='also upsert the counties into this SQLite store (see merged_store.py)')
+    parser.add_argument('--memory-budget', type=float, default=None, help='target memory in MB for the SLD ingest')
+    parser.add_argument('--corr-output', default=None,
+                        help='also write the county correlation matrix, merged from per-state moments, to this csv')
+    args = parser.parse_args(argv)
+
+    national_df = run_states(args.states, args.county_fips, args.walk_path, args.health_path, args.workers,
+                             use_store=args.sld_store, memory_budget_mb=args.memory_budget,
+                             moments=bool(args.corr_output))
+    if args.corr_output:
+        national_df, national_moments = national_df
+        national_moments.correlation().to_csv(args.corr_output)
+        print("="*10, f"Exported the correlation matrix to {args.corr_output}", "="*10)
+    national_df.to_csv(args.output, index=False)
+    print("="*10, f"Exported {len(national_df)} counties to {args.output}", "="*10)
+    if args.db:
+        from merged_store import write_merged
+        written = write_merged(args.db, national_df, county_col=COUNTY_COL)
+        print(f"{written} counties written to Merged_Main in {args.db}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# Bootstrap confidence intervals for the PCR model (StandardScaler -> PCA -> LinearRegression)
+# Resamples the county table with replacement and refits standardize -> PCA -> least squares for
+# every resample as batched linear algebra: a chunk of resamples is one (B, n, p) array, the PCA is
+# a stacked eigendecomposition of the (B, p, p) Gram matrices and the regression on the orthogonal
+# PC scores is a matrix product. Chunks are spread over a thread pool.
+#
+# Component signs are arbitrary, so each resample's components are flipped to point the same way as
+# the full-sample ones before the PC coefficients are compared. The feature contributions
+# (loadings x coefficients, summed over components) do not depend on the signs.
+#
+# With fit_rows the regression is fit on those rows only (the train split) while the standardization and
+# PCA use every row, as in the reported model; resamples then draw the fit rows and the other rows separately,
+# so the full-sample estimate is the reported fit and every interval belongs to it.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Resamples per batched fit; a chunk holds chunk_size * n_rows * n_predictors float64 values
+BOOT_CHUNK = 250
+
+# Eigenvalues of Z'Z below this (relative to the largest) are treated as zero (constant / collinear predictors)
+EIG_RTOL = 1e-10
+
+
+# Fits the PCR model on a stack of data sets at once.
+#   Xb (B, n, p), yb (B, n); ref_V (p, k) full-sample components used to fix the signs (None = leave as is)
+#   n_fit - the regression uses the first n_fit rows of each data set (None = all rows)
+# Returns the PC coefficients (B, k), the feature contributions (B, p) and the components (B, p, k).
+def batched_pcr(Xb, yb, n_components, ref_V=None, n_fit=None):
+    mean = Xb.mean(axis=1, keepdims=True)
+    scale = Xb.std(axis=1, keepdims=True)
+    scale[scale == 0] = 1.0
+    Z = (Xb - mean) / scale
+    yc = yb - yb.mean(axis=1, keepdims=True)
+
+    # Eigenvectors of Z'Z are the principal axes; eigh returns them in ascending order
+    gram = np.matmul(Z.transpose(0, 2, 1), Z)
+    eigvals, eigvecs = np.linalg.eigh(gram)
+    eigvals = eigvals[:, ::-1][:, :n_components]
+    V = eigvecs[:, :, ::-1][:, :, :n_components]
+    if ref_V is not None:
+        signs = np.sign(np.einsum('bpk,pk->bk', V, ref_V))
+        signs[signs == 0] = 1.0
+        V = V * signs[:, None, :]
+
+    keep = eigvals > EIG_RTOL * eigvals[:, :1]
+    if n_fit is None:
+        # Least squares on orthogonal scores T = Z V: coef_j = v_j' Z' y / lambda_j
+        zty = np.einsum('bnp,bn->bp', Z, yc)
+        proj = np.einsum('bpk,bp->bk', V, zty)
+        coef = np.where(keep, proj / np.where(keep, eigvals, 1.0), 0.0)
+    else:
+        # Scores of the fit rows are no longer orthogonal: least squares with an intercept on T = Z V
+        T = np.matmul(Z[:, :n_fit], V * keep[:, None, :])
+        T = T - T.mean(axis=1, keepdims=True)
+        yt = yb[:, :n_fit] - yb[:, :n_fit].mean(axis=1, keepdims=True)
+        coef = np.matmul(np.linalg.pinv(np.matmul(T.transpose(0, 2, 1), T)),
+                         np.einsum('bnk,bn->bk', T, yt)[:, :, None])[:, :, 0]
+    contrib = np.einsum('bpk,bk->bp', V, coef)
+    return coef, contrib, V
+
+
+def _boot_chunk(X, y, n_components, ref_V, n_fit, n_boot, seed):
+    rng = np.random.default_rng(seed)
+    if n_fit is None:
+        idx = rng.integers(0, len(X), size=(n_boot, len(X)))
+    else:
+        # fit rows and the other rows are resampled separately (X holds the fit rows first)
+        idx = np.concatenate([rng.integers(0, n_fit, size=(n_boot, n_fit)),
+                              rng.integers(n_fit, len(X), size=(n_boot, len(X) - n_fit))], axis=1)
+    coef, contrib, _ = batched_pcr(X[idx], y[idx], n_components, ref_V, n_fit)
+    return coef, contrib
+
+
+# Percentile bootstrap intervals for the PC coefficients and the per-predictor contributions.
+#   n_boot      - number of resamples;  ci - interval coverage (0.95 = 2.5th to 97.5th percentile)
+#   chunk_size  - resamples per batched fit;  seed - results do not depend on max_workers
+#   names       - predictor names (defaults to X's columns when X is a DataFrame)
+#   fit_rows    - positions of the rows the regression is fit on (None = all rows; see the top of the file)
+#   components  - (p, k) components whose signs the estimates follow, e.g. pca.components_.T of the reported
+#                 model (None = sklearn's convention: the largest loading of each component is positive)
+# Returns {"coeffs": DataFrame indexed PC1..PCk, "contrib": DataFrame indexed by predictor, "n_boot": n_boot}
+# with the full-sample estimate, the bootstrap standard error and the interval bounds.
+def bootstrap_pcr(X, y, n_components, n_boot=2000, ci=0.95, chunk_size=BOOT_CHUNK, seed=42,
+                  max_workers=None, names=None, fit_rows=None, components=None):
+    if names is None:
+        names = list(X.columns) if isinstance(X, pd.DataFrame) else [f"x{i}" for i in range(np.shape(X)[1])]
+    X = np.asarray(X, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n_components = min(n_components, X.shape[1])
+    n_fit = None
+    if fit_rows is not None:
+        fit = np.zeros(len(X), dtype=bool)
+        fit[np.asarray(fit_rows)] = True
+        order = np.concatenate([np.flatnonzero(fit), np.flatnonzero(~fit)])
+        X, y, n_fit = X[order], y[order], int(fit.sum())
+
+    full_coef, full_contrib, full_V = batched_pcr(X[None], y[None], n_components, n_fit=n_fit)
+    if components is None:
+        # same sign convention as sklearn's PCA: the largest loading of each component is positive
+        flip = np.sign(full_V[0][np.abs(full_V[0]).argmax(axis=0), np.arange(n_components)])
+    else:
+        flip = np.sign(np.einsum('pk,pk->k', full_V[0], np.asarray(components)[:, :n_components]))
+    flip[flip == 0] = 1.0
+    ref_V = full_V[0] * flip
+    full_coef = full_coef[0] * flip
+
+    sizes = [min(chunk_size, n_boot - start) for start in range(0, n_boot, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = max_workers or min(len(sizes), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(lambda job: _boot_chunk(X, y, n_components, ref_V, n_fit, *job), zip(sizes, seeds)))
+    coef = np.concatenate([p[0] for p in parts])
+    contrib = np.concatenate([p[1] for p in parts])
+
+    tail = (1 - ci) / 2 * 100
+    def summary(estimate, draws, index):
+        lo, hi = np.percentile(draws, [tail, 100 - tail], axis=0)
+        return pd.DataFrame({"estimate": estimate, "boot_se": draws.std(axis=0, ddof=1),
+                             "ci_low": lo, "ci_high": hi}, index=index)
+
+    pc_names = [f"PC{i+1}" for i in range(n_components)]
+    return {"coeffs": summary(full_coef, coef, pc_names),
+            "contrib": summary(full_contrib[0], contrib, names).sort_values("estimate", ascending=False),
+            "n_boot": n_boot}
@@ -0,0 +1,110 @@
+# Cross-validated component selection for the PCR model (StandardScaler -> PCA -> LinearRegression)
+# Scores every component count k = 1..p with K-fold / repeated K-fold cross-validation.
+# Each fold standardizes and takes the SVD of its training rows once; because the PC scores are
+# orthogonal, the k-component regression is just the first k terms of the full one, so all p fits
+# come from truncating the same decomposition instead of refitting PCA + LinearRegression p times.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Singular values below this (relative to the largest) are treated as zero (constant / collinear predictors)
+SVD_RTOL = 1e-10
+
+
+# (train_idx, test_idx) pairs for K-fold cross-validation, reshuffled for each repeat
+def kfold_splits(n_rows, n_splits=5, n_repeats=1, seed=42):
+    if n_splits < 2 or n_splits > n_rows:
+        raise ValueError(f"n_splits must be between 2 and the number of rows ({n_rows}), got {n_splits}")
+    rng = np.random.default_rng(seed)
+    splits = []
+    for _ in range(n_repeats):
+        order = rng.permutation(n_rows)
+        for test_idx in np.array_split(order, n_splits):
+            train_mask = np.ones(n_rows, dtype=bool)
+            train_mask[test_idx] = False
+            splits.append((np.flatnonzero(train_mask), np.sort(test_idx)))
+    return splits
+
+
+# Standard error of the cross-validated MSE from the (n_repeats * n_splits, k) fold scores.
+# The folds of one K-fold pass are treated as independent, so its SE is std / sqrt(n_splits). Repeats
+# reshuffle the same rows and are strongly correlated, so they don't shrink the SE: the per-repeat SEs
+# are averaged instead of dividing by sqrt(n_splits * n_repeats), which would understate it.
+def cv_se(fold_scores, n_splits):
+    per_repeat = np.asarray(fold_scores).reshape(-1, n_splits, *np.shape(fold_scores)[1:])
+    return (per_repeat.std(axis=1, ddof=1) / np.sqrt(n_splits)).mean(axis=0)
+
+
+# Standardize + SVD of the training rows of one fold.
+# Returns everything needed to score any number of components on new rows.
+def fit_fold(X_train, y_train):
+    mean = X_train.mean(axis=0)
+    scale = X_train.std(axis=0)          # ddof=0, same as StandardScaler
+    scale[scale == 0] = 1.0
+    Z = (X_train - mean) / scale
+    U, s, Vt = np.linalg.svd(Z, full_matrices=False)
+    y_mean = y_train.mean()
+    # Regression coefficient of y on each PC score (U * s): u_j . (y - y_mean) / s_j
+    keep = s > SVD_RTOL * (s[0] if len(s) else 0)
+    gamma = np.zeros_like(s)
+    gamma[keep] = (U[:, keep].T @ (y_train - y_mean)) / s[keep]
+    return {"mean": mean, "scale": scale, "Vt": Vt, "gamma": gamma, "y_mean": y_mean}
+
+
+# Predictions on X for every k = 1..max_k from one fitted fold (column k-1 = k components)
+def predict_all_k(fold_fit, X, max_k):
+    Z = (X - fold_fit["mean"]) / fold_fit["scale"]
+    scores = Z @ fold_fit["Vt"][:max_k].T
+    return fold_fit["y_mean"] + np.cumsum(scores * fold_fit["gamma"][:max_k], axis=1)
+
+
+# Squared error totals of one fold for every k
+def score_fold(X, y, train_idx, test_idx, max_k):
+    fold_fit = fit_fold(X[train_idx], y[train_idx])
+    y_test = y[test_idx]
+    preds = predict_all_k(fold_fit, X[test_idx], max_k)
+    sse = ((y_test[:, None] - preds) ** 2).sum(axis=0)
+    sst = ((y_test - y_test.mean()) ** 2).sum()
+    return sse, sst, len(test_idx)
+
+
+# Cross-validated MSE / R-squared curve over the number of components.
+#   n_splits, n_repeats - K-fold layout (n_repeats > 1 = repeated K-fold with a new shuffle each time)
+#   max_components      - largest k scored (default: every component the training folds support)
+#   one_se              - pick the smallest k within one standard error of the best MSE instead of the best
+# Folds run in a thread pool (the SVD and matrix products release the GIL).
+# Returns (curve, best_k); curve has one row per k with the mean over folds and its standard error (cv_se).
+def cv_components(X, y, n_splits=5, n_repeats=1, max_components=None, seed=42, max_workers=None, one_se=False):
+    X = np.asarray(X, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    splits = kfold_splits(len(X), n_splits, n_repeats, seed)
+    max_k = min(X.shape[1], min(len(train) for train, _ in splits))
+    if max_components is not None:
+        max_k = min(max_k, max_components)
+
+    workers = max_workers or min(len(splits), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda split: score_fold(X, y, split[0], split[1], max_k), splits))
+
+    sse = np.array([r[0] for r in results])
+    sst = np.array([r[1] for r in results])
+    n_test = np.array([r[2] for r in results])
+    fold_mse = sse / n_test[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fold_r2 = 1 - sse / sst[:, None]
+
+    curve = pd.DataFrame({
+        "n_components": np.arange(1, max_k + 1),
+        "cv_mse": fold_mse.mean(axis=0),
+        "cv_mse_se": cv_se(fold_mse, n_splits),
+        "cv_r2": np.nanmean(fold_r2, axis=0),
+    })
+
+    best = int(curve["cv_mse"].idxmin())
+    if one_se:
+        limit = curve["cv_mse"][best] + curve["cv_mse_se"][best]
+        best = int(np.flatnonzero(curve["cv_mse"].to_numpy() <= limit)[0])
+    return curve, int(curve["n_components"][best])
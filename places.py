@@ -0,0 +1,125 @@
+# PLACES (Local Data for Better Health, county data) helpers for the Data Dominators project
+# Filtering to one state and pivoting the health measures into one row per county
+
+import numpy as np
+import pandas as pd
+
+measures_to_keep = [
+    "Obesity among adults",
+    "Food insecurity in the past 12 months among adults",
+    "No leisure-time physical activity among adults"
+]
+
+# Columns that identify a PLACES row for de-duplication and feed the pivot.
+# Rows equal on all of these are duplicates as far as the county table is concerned.
+KEY_COLS = [
+    "Year", "StateAbbr", "LocationName", "LocationID", "Measure", "Data_Value_Type",
+    "Data_Value", "TotalPopulation", "TotalPop18plus"
+]
+CATEGORY_COLS = ["StateAbbr", "LocationName", "Measure", "Data_Value_Type"]
+PIVOT_INDEX = ["LocationName", "TotalPopulation", "TotalPop18plus"]
+
+# Rows per chunk when streaming the national PLACES csv (millions of rows, 40+ measures)
+PLACES_CHUNKSIZE = 250_000
+
+
+# Stores the string key columns as categoricals
+def categorize(df):
+    df = df.copy()
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+# Streams the PLACES csv, keeping only the key columns and rows for the requested states and measures.
+# states is a StateAbbr, a list of them, or None for every state.
+def read_places(path, states="TX", measures=measures_to_keep, chunksize=PLACES_CHUNKSIZE):
+    if isinstance(states, str):
+        states = [states]
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in KEY_COLS if c in header]
+
+    kept = []
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+        if states is not None:
+            chunk = chunk[chunk["StateAbbr"].isin(states)]
+        if measures is not None:
+            chunk = chunk[chunk["Measure"].isin(measures)]
+        if len(chunk):
+            kept.append(chunk.drop_duplicates())
+
+    if not kept:
+        return categorize(pd.DataFrame(columns=usecols))
+    df = pd.concat(kept, ignore_index=True).drop_duplicates(ignore_index=True)
+    return categorize(df)
+
+
+# Wide table of mean Data_Value per (LocationName, TotalPopulation, TotalPop18plus) x Measure.
+# Same result as df.pivot_table(index=PIVOT_INDEX, columns="Measure", values="Data_Value", aggfunc="mean")
+# but built straight from the integer codes with bincount instead of a generic groupby.
+def pivot_places(df):
+    # One sorted integer code per index column, combined into a single row key (mixed radix)
+    level_codes, level_values = [], []
+    for col in PIVOT_INDEX:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        level_codes.append(codes)
+        level_values.append(uniques)
+    combined = np.zeros(len(df), dtype="int64")
+    missing_key = np.zeros(len(df), dtype=bool)
+    for codes, uniques in zip(level_codes, level_values):
+        combined = combined * len(uniques) + codes
+        missing_key |= codes < 0
+    row_keys, row_codes = np.unique(combined[~missing_key], return_inverse=True)
+    row_codes_full = np.full(len(df), -1, dtype="int64")
+    row_codes_full[~missing_key] = row_codes
+    row_codes = row_codes_full
+
+    measure = df["Measure"].astype("category")
+    measure_names = measure.cat.categories
+    measure_codes = measure.cat.codes.to_numpy()
+
+    values = pd.to_numeric(df["Data_Value"], errors="coerce").to_numpy(dtype="float64")
+    valid = (row_codes >= 0) & (measure_codes >= 0) & ~np.isnan(values)
+    n_rows, n_measures = len(row_keys), len(measure_names)
+    flat = row_codes[valid] * n_measures + measure_codes[valid]
+
+    sums = np.bincount(flat, weights=values[valid], minlength=n_rows * n_measures)
+    counts = np.bincount(flat, minlength=n_rows * n_measures)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums / counts).reshape(n_rows, n_measures)
+    counts = counts.reshape(n_rows, n_measures)
+
+    # pivot_table drops measures and counties with no values at all, and orders measures by name
+    keep_rows = counts.any(axis=1)
+    order = np.argsort(np.asarray(measure_names, dtype=str), kind="stable")
+    order = order[counts[:, order].any(axis=0)]
+
+    # Decode the row keys back into the index columns
+    index_df = pd.DataFrame()
+    remaining = row_keys[keep_rows]
+    for col, uniques in reversed(list(zip(PIVOT_INDEX, level_values))):
+        remaining, codes = np.divmod(remaining, len(uniques))
+        values_col = np.asarray(uniques)[codes]
+        index_df.insert(0, col, values_col)
+    wide = pd.DataFrame(means[keep_rows][:, order], columns=[str(measure_names[i]) for i in order])
+    return pd.concat([index_df, wide], axis=1)
+
+
+# Cleans the long PLACES table into one row per county with a column per measure.
+# state is a StateAbbr ("TX") or None when df is already filtered; county_col names the county column in the output.
+def clean_places(df, state="TX", county_col="Texas County"):
+    if state is not None:
+        df = df[df["StateAbbr"] == state]
+
+    df = df[df["Measure"].isin(measures_to_keep)]
+    df = df[[c for c in KEY_COLS if c in df.columns]].drop_duplicates()
+
+    # Pivot Table
+    df_counties = pivot_places(categorize(df))
+
+    # Round Numbers
+    for col in measures_to_keep:
+        df_counties[col] = pd.to_numeric(df_counties[col], errors="coerce").round(1)
+
+    return df_counties.rename(columns={"LocationName": county_col})
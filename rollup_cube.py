@@ -0,0 +1,215 @@
+# Hierarchical rollup cube over the SLD block groups
+# Built once from the additive block group measures (SUM_COLS plus the TotPop-weighted numerators of
+# P_WrkAge and NatWalkInd, see walkability.py), sorted by the 12-digit block group GEOID
+# (STATEFP | COUNTYFP | TRACTCE | BLKGRPCE). Every geography that is a GEOID prefix (state, county, tract)
+# is then a contiguous run of rows, so with prefix sums over the sorted rows and the run offsets of each
+# level, the totals of any level are cum[end] - cum[start]: O(groups), no pass over the block groups.
+# Custom groupings (CBSAs, regions) are unions of counties or states and are summed from those totals.
+#
+# OutputData/rollup_cube/
+#   meta.json              source file hash, block group count, measure names
+#   bg_geoid.npy           sorted block group GEOIDs
+#   cum.npy                (rows + 1) x measures prefix sums (float64; row 0 is zeros)
+#   cum_err.npy            prefix sums of the rounding error of each cum step (see prefix_sums)
+#   <level>_keys.npy       GEOIDs of the level's units (state FIPS, 5-digit county, 11-digit tract)
+#   <level>_offsets.npy    unit i covers rows offsets[i]:offsets[i+1]
+#
+# A plain float64 prefix sum loses precision on small segments far into the file (the difference of two
+# large running totals), so every step's rounding error is kept too and segment sums are taken from both.
+#
+# Example:
+#   python rollup_cube.py --level tract --states TX --output OutputData/Walkability_Tracts.csv
+#   python rollup_cube.py --level county --groups InputData/cbsa_counties.csv --output OutputData/Walkability_CBSA.csv
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from artifact_cache import file_hash
+from walkability import SLD_CHUNKSIZE, SLD_COLS, SUM_COLS, WEIGHTED_COLS, condense_sums, iter_sld
+
+CUBE_DIR = "OutputData/rollup_cube"
+CUBE_COLS = SLD_COLS + ['TRACTCE', 'BLKGRPCE']
+MEASURES = SUM_COLS + list(WEIGHTED_COLS.values())
+
+# level -> divisor turning a 12-digit block group GEOID into the level's GEOID
+LEVELS = {"state": 10**10, "county": 10**7, "tract": 10}
+
+walk_path = "InputData/EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv"
+
+
+# 12-digit block group GEOID from the FIPS component columns
+def block_group_geoid(df):
+    geoid = df['STATEFP'].to_numpy(dtype='int64') * 1000 + df['COUNTYFP'].to_numpy(dtype='int64')
+    geoid = geoid * 1_000_000 + df['TRACTCE'].to_numpy(dtype='int64')
+    return geoid * 10 + df['BLKGRPCE'].to_numpy(dtype='int64')
+
+
+# Additive measures of a block group chunk (missing values count as 0, as in the pandas sums)
+def block_group_measures(df):
+    X = np.empty((len(df), len(MEASURES)))
+    for j, col in enumerate(SUM_COLS):
+        X[:, j] = df[col].to_numpy(dtype='float64')
+    pop = df['TotPop'].to_numpy(dtype='float64')
+    for j, col in enumerate(WEIGHTED_COLS, start=len(SUM_COLS)):
+        X[:, j] = df[col].to_numpy(dtype='float64') * pop
+    return np.nan_to_num(X, nan=0.0)
+
+
+# Prefix sums of X's rows with the rounding error of every addition (TwoSum, vectorized over the finished
+# cumsum): cum[e] - cum[s] + (err[e] - err[s]) is the segment sum to about float64 precision of the segment.
+def prefix_sums(X):
+    cum = np.zeros((len(X) + 1, X.shape[1]))
+    np.cumsum(X, axis=0, out=cum[1:])
+    prev, total = cum[:-1], cum[1:]
+    added = total - prev
+    err = np.zeros_like(cum)
+    np.cumsum((prev - (total - added)) + (X - added), axis=0, out=err[1:])
+    return cum, err
+
+
+# Streams the SLD once and writes the cube
+def build_cube(walk_path=walk_path, cube_dir=CUBE_DIR, chunksize=SLD_CHUNKSIZE):
+    print("="*10, f"Building rollup cube from {walk_path}", "="*10)
+    geoids, blocks = [], []
+    for chunk in iter_sld(walk_path, statefp=None, usecols=CUBE_COLS, chunksize=chunksize):
+        geoids.append(block_group_geoid(chunk))
+        blocks.append(block_group_measures(chunk))
+    geoid = np.concatenate(geoids) if geoids else np.empty(0, dtype='int64')
+    X = np.concatenate(blocks) if blocks else np.empty((0, len(MEASURES)))
+
+    order = np.argsort(geoid, kind='stable')
+    geoid = geoid[order]
+    cum, err = prefix_sums(X[order])
+
+    os.makedirs(cube_dir, exist_ok=True)
+    np.save(os.path.join(cube_dir, "bg_geoid.npy"), geoid)
+    np.save(os.path.join(cube_dir, "cum.npy"), cum)
+    np.save(os.path.join(cube_dir, "cum_err.npy"), err)
+    for level, divisor in LEVELS.items():
+        keys, starts = np.unique(geoid // divisor, return_index=True)
+        np.save(os.path.join(cube_dir, f"{level}_keys.npy"), keys)
+        np.save(os.path.join(cube_dir, f"{level}_offsets.npy"), np.append(starts, len(geoid)).astype('int64'))
+
+    meta = {"source": os.path.abspath(walk_path), "source_hash": file_hash(walk_path),
+            "rows": int(len(geoid)), "measures": MEASURES, "levels": list(LEVELS)}
+    with open(os.path.join(cube_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    return RollupCube(cube_dir)
+
+
+class RollupCube:
+    def __init__(self, cube_dir=CUBE_DIR):
+        self.cube_dir = cube_dir
+        with open(os.path.join(cube_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.measures = self.meta["measures"]
+        self.bg_geoid = np.load(os.path.join(cube_dir, "bg_geoid.npy"), mmap_mode='r')
+        self.cum = np.load(os.path.join(cube_dir, "cum.npy"), mmap_mode='r')
+        self.cum_err = np.load(os.path.join(cube_dir, "cum_err.npy"), mmap_mode='r')
+        self._levels = {}
+
+    # Measure sums of rows starts[i]:ends[i]
+    def segment_sums(self, starts, ends):
+        return ((np.asarray(self.cum[ends]) - np.asarray(self.cum[starts]))
+                + (np.asarray(self.cum_err[ends]) - np.asarray(self.cum_err[starts])))
+
+    # (unit GEOIDs, offsets) of a level, loaded on first use
+    def level(self, level):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level {level!r}; expected one of {list(LEVELS)}")
+        if level not in self._levels:
+            self._levels[level] = (np.load(os.path.join(self.cube_dir, f"{level}_keys.npy")),
+                                   np.load(os.path.join(self.cube_dir, f"{level}_offsets.npy")))
+        return self._levels[level]
+
+    # Raw measure totals per unit of a level (one row per unit, indexed by its GEOID).
+    # keys limits the result to those units (still one prefix-sum difference each).
+    def totals(self, level, keys=None):
+        unit_keys, offsets = self.level(level)
+        if keys is None:
+            starts, ends = offsets[:-1], offsets[1:]
+        else:
+            keys = np.unique(np.asarray(keys, dtype='int64'))
+            i = np.searchsorted(unit_keys, keys)
+            found = (i < len(unit_keys)) & (unit_keys[np.minimum(i, len(unit_keys) - 1)] == keys)
+            unit_keys, i = keys[found], i[found]
+            starts, ends = offsets[i], offsets[i + 1]
+        sums = self.segment_sums(starts, ends)
+        return pd.DataFrame(sums, index=pd.Index(unit_keys, name="GEOID"), columns=self.measures)
+
+    # Totals of a GEOID range [lo, hi) at block group resolution (two binary searches)
+    def range_totals(self, lo, hi):
+        start, end = np.searchsorted(self.bg_geoid, [lo, hi])
+        return pd.Series(self.segment_sums(start, end), index=self.measures)
+
+    # Raw totals of custom groups made of a level's units, e.g. CBSAs from counties or regions from states.
+    # groups maps unit GEOID -> group label ({48201: "Houston", ...} or a Series),
+    # or group label -> list of unit GEOIDs ({"South": [48, 40, 5], ...}).
+    # Units with a missing (NaN / None) label belong to no group and are left out.
+    def group_totals(self, level, groups):
+        if isinstance(groups, dict) and groups and all(isinstance(v, (list, tuple, set, np.ndarray)) for v in groups.values()):
+            groups = {unit: label for label, units in groups.items() for unit in units}
+        groups = pd.Series(groups)
+        unit_totals = self.totals(level, groups.index.to_numpy(dtype='int64'))
+        labels = groups.reindex(unit_totals.index)
+        codes, names = pd.factorize(labels, sort=True)
+        grouped = codes >= 0        # factorize gives missing labels code -1
+        sums = np.zeros((len(names), len(self.measures)))
+        np.add.at(sums, codes[grouped], unit_totals.to_numpy()[grouped])
+        return pd.DataFrame(sums, index=pd.Index(names, name="group"), columns=self.measures)
+
+    # Condensed walkability table (same columns as walkability.condense_counties) for a level or custom groups
+    def rollup(self, level, groups=None, keys=None):
+        sums = self.totals(level, keys) if groups is None else self.group_totals(level, groups)
+        return condense_sums(sums)
+
+
+# Opens the cube, building it first if it is missing or was built from a different file
+def open_cube(walk_path=walk_path, cube_dir=CUBE_DIR, chunksize=SLD_CHUNKSIZE):
+    meta_path = os.path.join(cube_dir, "meta.json")
+    if os.path.exists(meta_path):
+        cube = RollupCube(cube_dir)
+        if cube.meta["source_hash"] == file_hash(walk_path) and cube.meta["measures"] == MEASURES:
+            return cube
+    return build_cube(walk_path, cube_dir, chunksize)
+
+
+def main(argv=None):
+    from national import parse_states
+    from geo_index import STATE_FIPS
+    parser = argparse.ArgumentParser(description="Roll the SLD up to any geography level from the precomputed cube.")
+    parser.add_argument('--walk-path', default=walk_path)
+    parser.add_argument('--cube-dir', default=CUBE_DIR)
+    parser.add_argument('--level', choices=list(LEVELS), default="county")
+    parser.add_argument('--states', nargs='+', default=['all'], help='state abbreviations / FIPS codes, or "all"')
+    parser.add_argument('--groups', default=None,
+                        help='csv with GEOID and group columns: custom groups of --level units (e.g. counties -> CBSA)')
+    parser.add_argument('--output', default=None, help='csv to write (default: OutputData/Walkability_<level>.csv)')
+    args = parser.parse_args(argv)
+
+    cube = open_cube(args.walk_path, args.cube_dir)
+    if args.groups:
+        groups_df = pd.read_csv(args.groups)
+        table = cube.rollup(args.level, groups=dict(zip(groups_df['GEOID'], groups_df['group'])))
+        name = "groups"
+    else:
+        keys = None
+        if args.states != ['all']:
+            fips = [STATE_FIPS[s] for s in parse_states(args.states)]
+            unit_keys, _ = cube.level(args.level)
+            divisor = LEVELS["state"] // LEVELS[args.level]
+            keys = unit_keys[np.isin(unit_keys // divisor, fips)]
+        table = cube.rollup(args.level, keys=keys)
+        name = args.level
+    output = args.output or f"OutputData/Walkability_{name}.csv"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    table.to_csv(output, index=False)
+    print("="*10, f"Exported {len(table)} rows to {output}", "="*10)
+
+
+if __name__ == '__main__':
+    main()
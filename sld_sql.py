@@ -0,0 +1,174 @@
+# SQLite push-down backend for the walkability county rollup
+# The SLD block group columns are bulk-loaded once (chunk by chunk) into an indexed SQLite table; the
+# condense_function totals, shares and population-weighted means are then one GROUP BY over the county
+# GEOID, generated from the same COUNTY_COLS definitions as the pandas path (walkability.condense_counties).
+# The block groups never sit in a DataFrame: loading holds one csv chunk at a time and the rollup runs
+# inside SQLite, within its page cache (cache_mb), so it works on memory-constrained workers.
+#
+# OutputData/sld_blockgroups.db
+#   SLD_BlockGroups  GEOID, STATEFP, COUNTYFP and the SLD_VALUE_COLS, indexed on GEOID
+#   SLD_Meta         source file hash (a different file reloads the table)
+#
+# Example:
+#   python sld_sql.py --states TX --output OutputData/Walkability_Counties_SQL.csv
+
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from artifact_cache import file_hash
+from walkability import COUNTY_COLS, SLD_CHUNKSIZE, SLD_COLS, SLD_VALUE_COLS, SUM_COLS, WEIGHTED_COLS, iter_sld
+
+SQL_DB_PATH = "OutputData/sld_blockgroups.db"
+TABLE = "SLD_BlockGroups"
+META_TABLE = "SLD_Meta"
+
+# SQLite page cache for the rollup, in MB
+CACHE_MB = 64
+
+walk_path = "InputData/EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(db_path=SQL_DB_PATH, cache_mb=CACHE_MB):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.execute(f"PRAGMA cache_size = {-int(cache_mb * 1024)}")
+    con.execute("PRAGMA temp_store = FILE")     # GROUP BY sorts spill to disk instead of memory
+    return con
+
+
+def _source_hash(con):
+    try:
+        row = con.execute(f"SELECT value FROM {META_TABLE} WHERE key = 'source_hash'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+# Loads the SLD csv into SLD_BlockGroups, unless the table already holds this file.
+# Only one chunk of the csv is in memory at a time. Returns the number of block groups in the table.
+def load_sld_sql(walk_path=walk_path, db_path=SQL_DB_PATH, chunksize=SLD_CHUNKSIZE, force=False):
+    source_hash = file_hash(walk_path)
+    con = connect(db_path)
+    try:
+        if not force and _source_hash(con) == source_hash:
+            return con.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+        print("="*10, f"Loading {walk_path} into {TABLE} ({db_path})", "="*10)
+        cols = ["GEOID", "STATEFP", "COUNTYFP"] + SLD_VALUE_COLS
+        types = ["INTEGER"] * 3 + ["REAL"] * len(SLD_VALUE_COLS)
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        con.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        con.execute(f"DROP TABLE IF EXISTS {META_TABLE}")
+        con.execute(f"CREATE TABLE {TABLE} ({', '.join(f'{_quote(c)} {t}' for c, t in zip(cols, types))})")
+        con.execute(f"CREATE TABLE {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+
+        sql = f"INSERT INTO {TABLE} VALUES ({', '.join('?' * len(cols))})"
+        rows = 0
+        for chunk in iter_sld(walk_path, statefp=None, usecols=SLD_COLS, chunksize=chunksize):
+            geoid = chunk["STATEFP"].to_numpy(dtype="int64") * 1000 + chunk["COUNTYFP"].to_numpy(dtype="int64")
+            values = chunk[["STATEFP", "COUNTYFP"] + SLD_VALUE_COLS].astype(object)
+            values = values.where(chunk[values.columns].notna(), None)   # NaN -> NULL
+            values.insert(0, "GEOID", geoid.tolist())
+            with con:
+                con.executemany(sql, values.itertuples(index=False, name=None))
+            rows += len(chunk)
+
+        # indexed once, after the bulk load
+        con.execute(f"CREATE INDEX idx_{TABLE}_geoid ON {TABLE} (GEOID)")
+        with con:
+            con.execute(f"INSERT INTO {META_TABLE} VALUES ('source_hash', ?)", (source_hash,))
+            con.execute(f"INSERT INTO {META_TABLE} VALUES ('source', ?)", (os.path.abspath(walk_path),))
+        con.execute("ANALYZE")
+        return rows
+    finally:
+        con.close()
+
+
+# num / den with pandas' float semantics: 0/0 is NaN (NULL here), x/0 is +-inf
+def _ratio(num, den):
+    return f"CASE WHEN {den} <> 0 THEN {num} / {den} WHEN {num} > 0 THEN 1e999 WHEN {num} < 0 THEN -1e999 END"
+
+
+# The county rollup as one SELECT ... GROUP BY GEOID.
+# TOTAL() sums as float and gives 0.0 for an all-NULL group, like the float64 sums in county_sums.
+def rollup_sql(where=""):
+    sums = {col: f"TOTAL({_quote(col)})" for col in SUM_COLS}
+    for col, weighted in WEIGHTED_COLS.items():
+        sums[weighted] = f"TOTAL({_quote(col)} * TotPop)"
+    select = ["GEOID", "COUNT(*) AS block_groups"]
+    for name, num, den in COUNTY_COLS:
+        expr = sums[num] if den is None else _ratio(sums[num], sums[den])
+        select.append(f"{expr} AS {_quote(name)}")
+    return f"SELECT {', '.join(select)} FROM {TABLE} {where} GROUP BY GEOID ORDER BY GEOID"
+
+
+# Condensed walkability table computed inside SQLite: GEOID, block_groups and the COUNTY_COLS, one row per county.
+# statefp is a FIPS code, a list of them, or None for every state (filtered on GEOID ranges, which use the index).
+def condense_sql(db_path=SQL_DB_PATH, statefp=None, cache_mb=CACHE_MB):
+    where, params = "", []
+    if statefp is not None:
+        statefps = [statefp] if np.isscalar(statefp) else list(statefp)
+        where = "WHERE " + " OR ".join("(GEOID >= ? AND GEOID < ?)" for _ in statefps)
+        for fips in statefps:
+            params += [int(fips) * 1000, (int(fips) + 1) * 1000]
+    con = connect(db_path, cache_mb)
+    try:
+        rows = con.execute(rollup_sql(where), params).fetchall()
+    finally:
+        con.close()
+
+    names = ["GEOID", "block_groups"] + [name for name, _, _ in COUNTY_COLS]
+    data = np.array(rows, dtype="float64").reshape(len(rows), len(names))
+    df = pd.DataFrame(data, columns=names)
+    df["GEOID"] = df["GEOID"].astype("int64")
+    df["block_groups"] = df["block_groups"].astype("int64")
+    return df
+
+
+# Same table as condense_counties(attach_county_names(...), key=['GEOID', key]), from the SQLite backend:
+# names come from the county FIPS table and counties it doesn't list are dropped (returned separately,
+# with their block group counts, for the unmatched report). Returns (condensed_df, unmatched_df).
+def condense_counties_sql(county_fp_df, key='Texas County', statefp=None, db_path=SQL_DB_PATH, cache_mb=CACHE_MB):
+    from geo_index import CountyIndex
+    sums = condense_sql(db_path, statefp, cache_mb)
+    index = CountyIndex.from_table(county_fp_df, key, None if 'STATEFP' in county_fp_df.columns else statefp)
+    names = index.names_of(sums["GEOID"])
+    matched = ~pd.isna(names)
+    unmatched = sums.loc[~matched, ["GEOID", "block_groups"]].reset_index(drop=True)
+    condensed = sums[matched].drop(columns="block_groups").reset_index(drop=True)
+    condensed.insert(1, key, np.asarray(names[matched], dtype=object))
+    return condensed, unmatched
+
+
+def main(argv=None):
+    from national import parse_states
+    from geo_index import STATE_FIPS
+    parser = argparse.ArgumentParser(description="Roll the SLD block groups up to counties inside SQLite.")
+    parser.add_argument('--walk-path', default=walk_path)
+    parser.add_argument('--db', default=SQL_DB_PATH)
+    parser.add_argument('--states', nargs='+', default=['all'], help='state abbreviations / FIPS codes, or "all"')
+    parser.add_argument('--cache-mb', type=float, default=CACHE_MB, help='SQLite page cache for the rollup')
+    parser.add_argument('--reload', action='store_true', help='reload the block group table even if it is current')
+    parser.add_argument('--output', default="OutputData/Walkability_Counties_SQL.csv")
+    args = parser.parse_args(argv)
+
+    rows = load_sld_sql(args.walk_path, args.db, force=args.reload)
+    print(f"{rows} block groups in {TABLE}")
+    states = parse_states(args.states)
+    statefp = None if args.states == ['all'] else [STATE_FIPS[s] for s in states]
+    condensed = condense_sql(args.db, statefp, args.cache_mb)
+    condensed.to_csv(args.output, index=False)
+    print("="*10, f"Exported {len(condensed)} counties to {args.output}", "="*10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# Memory-mapped block group store for the EPA Smart Location Database
+# After the first parse of the SLD csv, the columns the project uses are saved one .npy file per column,
+# sorted by county GEOID (STATEFP * 1000 + COUNTYFP), plus an offset index of where each county starts.
+# Later runs np.load(..., mmap_mode='r') the columns and slice a state or county without re-parsing text;
+# slices are views on the mapped pages, so several worker processes share the same memory.
+#
+# OutputData/sld_store/
+#   meta.json        source file hash, row count, columns and dtypes
+#   county_geoid.npy sorted county GEOIDs present in the data
+#   offsets.npy      county i covers rows offsets[i]:offsets[i+1]
+#   <column>.npy     one file per SLD column
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from artifact_cache import file_hash
+from walkability import SLD_CHUNKSIZE, SLD_COLS, compact_values, iter_sld
+
+STORE_DIR = "OutputData/sld_store"
+
+
+# Parses the SLD csv once (every state) and writes the column store.
+# The csv is streamed: each chunk's columns are spilled to temporary .npy files, then every column is
+# scattered into its sorted position in a memory-mapped output file, one column at a time. Peak memory
+# is one parsed chunk plus the per-row sort positions (8 bytes a row), not the whole national table.
+# The columns keep the csv's dtypes; the compact dtype plan is applied to the slices one column at a
+# time (see SLDStore.frame), so the same store serves both.
+def build_sld_store(walk_path, store_dir=STORE_DIR, columns=SLD_COLS, chunksize=SLD_CHUNKSIZE):
+    print("="*10, f"Building block group store from {walk_path}", "="*10)
+    spill_dir = os.path.join(store_dir, "_chunks")
+    os.makedirs(spill_dir, exist_ok=True)
+    names, geoids, dtypes = None, [], {}
+    n_chunks = 0
+    for i, chunk in enumerate(iter_sld(walk_path, statefp=None, usecols=columns, chunksize=chunksize)):
+        names = list(chunk.columns)
+        geoids.append(chunk['STATEFP'].to_numpy(dtype='int64') * 1000 + chunk['COUNTYFP'].to_numpy(dtype='int64'))
+        for col in names:
+            values = chunk[col].to_numpy()
+            np.save(os.path.join(spill_dir, f"{col}.{i}.npy"), values)
+            dtypes[col] = np.result_type(dtypes[col], values.dtype) if col in dtypes else values.dtype
+        n_chunks += 1
+    names = names or list(dict.fromkeys(list(columns) + ['STATEFP']))
+    geoid = np.concatenate(geoids) if geoids else np.empty(0, dtype='int64')
+    del geoids
+
+    order = np.argsort(geoid, kind='stable')
+    geoid = geoid[order]
+    county_geoid, starts = np.unique(geoid, return_index=True)
+    offsets = np.append(starts, len(geoid)).astype('int64')
+    # rank[i] = sorted position of csv row i
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    del order, geoid
+
+    for col in names:
+        dtype = dtypes.get(col, np.dtype('float64'))
+        out = np.lib.format.open_memmap(os.path.join(store_dir, f"{col}.npy"), mode='w+', dtype=dtype, shape=(len(rank),))
+        start = 0
+        for i in range(n_chunks):
+            path = os.path.join(spill_dir, f"{col}.{i}.npy")
+            values = np.load(path)
+            out[rank[start:start + len(values)]] = values
+            start += len(values)
+            os.remove(path)
+        out.flush()
+        del out
+    os.rmdir(spill_dir)
+    np.save(os.path.join(store_dir, "county_geoid.npy"), county_geoid)
+    np.save(os.path.join(store_dir, "offsets.npy"), offsets)
+
+    meta = {"source": os.path.abspath(walk_path), "source_hash": file_hash(walk_path),
+            "rows": int(len(rank)), "columns": names, "dtypes": {col: str(dtypes.get(col, 'float64')) for col in names}}
+    with open(os.path.join(store_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    return SLDStore(store_dir)
+
+
+class SLDStore:
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.county_geoid = np.load(os.path.join(store_dir, "county_geoid.npy"))
+        self.offsets = np.load(os.path.join(store_dir, "offsets.npy"))
+        self._columns = {}
+
+    @property
+    def columns(self):
+        return self.meta["columns"]
+
+    # Memory-mapped column (opened on first use)
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.store_dir, f"{name}.npy"), mmap_mode='r')
+        return self._columns[name]
+
+    # Row range [start, stop) covering one state or one county
+    def state_range(self, statefp):
+        lo = np.searchsorted(self.county_geoid, statefp * 1000, side='left')
+        hi = np.searchsorted(self.county_geoid, (statefp + 1) * 1000, side='left')
+        return int(self.offsets[lo]), int(self.offsets[hi])
+
+    def county_range(self, geoid):
+        i = np.searchsorted(self.county_geoid, geoid)
+        if i == len(self.county_geoid) or self.county_geoid[i] != geoid:
+            return 0, 0
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    # Zero-copy views of the requested columns for one state (or one county GEOID)
+    def arrays(self, statefp=None, geoid=None, columns=None):
+        if geoid is not None:
+            start, stop = self.county_range(geoid)
+        elif statefp is not None:
+            start, stop = self.state_range(statefp)
+        else:
+            start, stop = 0, self.meta["rows"]
+        return {c: self.column(c)[start:stop] for c in (columns or self.columns)}
+
+    # Same slice as a DataFrame (pandas copies the values out of the mapped pages).
+    # compact=True casts each column to its SLD_DTYPE_PLAN dtype as it is copied out, so the
+    # full-precision slice is never held in memory.
+    def frame(self, statefp=None, geoid=None, columns=None, compact=False):
+        arrays = self.arrays(statefp, geoid, columns)
+        if compact:
+            arrays = {c: compact_values(c, values) for c, values in arrays.items()}
+        return pd.DataFrame(arrays)
+
+
+# Opens the store, (re)building it first if it is missing, built from a different file or lacks columns
+def open_sld_store(walk_path, store_dir=STORE_DIR, columns=SLD_COLS, chunksize=SLD_CHUNKSIZE):
+    meta_path = os.path.join(store_dir, "meta.json")
+    if os.path.exists(meta_path):
+        store = SLDStore(store_dir)
+        if store.meta["source_hash"] == file_hash(walk_path) and set(columns) <= set(store.columns):
+            return store
+    return build_sld_store(walk_path, store_dir, columns, chunksize)
+
+
+# Drop-in for read_sld(walk_path, statefp=...) that reads from the block group store
+# (compact=True reads the slice in the SLD_DTYPE_PLAN dtypes, see SLDStore.frame)
+def load_sld(walk_path, statefp=48, store_dir=STORE_DIR, columns=SLD_COLS, chunksize=SLD_CHUNKSIZE, compact=False):
+    store = open_sld_store(walk_path, store_dir, columns, chunksize)
+    if statefp is None or np.isscalar(statefp):
+        return store.frame(statefp=statefp, columns=columns, compact=compact)
+    return pd.concat([store.frame(statefp=s, columns=columns, compact=compact) for s in statefp], ignore_index=True)
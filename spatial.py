@@ -0,0 +1,292 @@
+# Spatial weights and spatial autocorrelation for the county tables
+# Counties are linked by the Census county adjacency file (a local copy, no download): two counties are
+# neighbors when they share a boundary. The weights are a sparse matrix over county GEOIDs (the same
+# STATEFP * 1000 + COUNTYFP keys as geo_index / COUNTYFP_TX.csv), row-standardized by default, so a
+# county's spatial lag is the mean of its neighbors' values.
+#
+# Moran's I (global and local) is tested by permutation. The permutations are drawn a batch at a time as
+# a dense matrix (counties x permutations) and the lags of the whole batch are one sparse matrix product,
+# so 9,999 permutations over ~3,200 counties never loop over permutations in Python.
+#   global   the values are shuffled across all counties (I of each shuffle from W @ Z_batch)
+#   local    conditional permutation: county i keeps its value and its k_i neighbors are replaced by
+#            k_i other counties drawn without replacement (one draw per permutation, shared by every county)
+# p-values are pseudo p-values from the tail the observed value falls in: (extreme + 1) / (permutations + 1).
+#
+# Adjacency file formats (https://www.census.gov/geographies/reference-files/time-series/geo/county-adjacency.html):
+#   county_adjacency2023.txt   "County Name|County GEOID|Neighbor Name|Neighbor GEOID" (header row)
+#   county_adjacency.txt       tab separated, no header, the county only on the first row of its block
+#
+# Example:
+#   python spatial.py --input OutputData/Merged_Data_National.csv --columns "Obesity among adults" wtd_avg_walk_index \
+#       --permutations 9999 --output OutputData/Spatial_Moran_National.csv
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from geo_index import MISSING
+
+ADJACENCY_PATH = "InputData/county_adjacency2023.txt"
+PERMUTATIONS = 999
+SEED = 42
+
+# Permutation values held at once (batch rows x counties, or x neighbor slots for local Moran's I)
+PERM_BATCH_ELEMENTS = 5_000_000
+
+QUADRANTS = np.array(["HH", "LH", "LL", "HL"], dtype=object)
+
+
+# Row of each key in geoids (the first row for a repeated GEOID), MISSING for MISSING keys and keys not there
+def _rows_of(geoids, keys):
+    keys = np.asarray(keys, dtype="int64")
+    order = np.argsort(geoids, kind="stable")
+    sorted_geoids = geoids[order]
+    if not len(sorted_geoids):
+        return np.full(len(keys), MISSING, dtype="int64")
+    i = np.minimum(np.searchsorted(sorted_geoids, keys), len(sorted_geoids) - 1)
+    found = (sorted_geoids[i] == keys) & (keys != MISSING)
+    return np.where(found, order[i], MISSING)
+
+
+# GEOIDs from a county table: its GEOID column, or STATEFP / COUNTYFP; unresolved counties (NaN) -> MISSING
+def table_geoids(df):
+    geoids = df["GEOID"] if "GEOID" in df.columns else df["STATEFP"] * 1000 + df["COUNTYFP"]
+    return pd.to_numeric(geoids, errors="coerce").fillna(MISSING).to_numpy(dtype="int64")
+
+
+# (GEOID, NEIGHBOR_GEOID) pairs from a Census county adjacency file (either format)
+def read_adjacency(path=ADJACENCY_PATH):
+    with open(path, encoding="latin-1") as f:
+        first = f.readline()
+    if "|" in first:
+        df = pd.read_csv(path, sep="|", encoding="latin-1", dtype=str)
+        df = df.rename(columns={"County GEOID": "GEOID", "Neighbor GEOID": "NEIGHBOR_GEOID"})
+    else:
+        df = pd.read_csv(path, sep="\t", header=None, encoding="latin-1", dtype=str,
+                         names=["County", "GEOID", "Neighbor", "NEIGHBOR_GEOID"])
+        df["GEOID"] = df["GEOID"].ffill()
+    pairs = df[["GEOID", "NEIGHBOR_GEOID"]].dropna()
+    return pairs.astype("int64").drop_duplicates().reset_index(drop=True)
+
+
+class SpatialWeights:
+    # geoids: the counties, in row order; neighbors: binary CSR matrix between them (no self links)
+    def __init__(self, geoids, neighbors):
+        self.geoids = np.asarray(geoids, dtype="int64")
+        self.neighbors = sparse.csr_matrix(neighbors, dtype="float64")
+        self.neighbors.setdiag(0)
+        self.neighbors.eliminate_zeros()
+        self.neighbors.sort_indices()
+
+    # Weights over the given counties from adjacency pairs (read_adjacency). Pairs with a county outside
+    # geoids are dropped. Counties without neighbors, MISSING (unresolved) rows and repeats of a GEOID
+    # after its first row are islands.
+    @classmethod
+    def from_pairs(cls, pairs, geoids):
+        geoids = np.asarray(geoids, dtype="int64")
+        a = _rows_of(geoids, pairs["GEOID"].to_numpy(dtype="int64"))
+        b = _rows_of(geoids, pairs["NEIGHBOR_GEOID"].to_numpy(dtype="int64"))
+        keep = (a != MISSING) & (b != MISSING) & (a != b)
+        n = len(geoids)
+        # adjacency is symmetric; both directions are added in case a file lists only one
+        rows = np.concatenate([a[keep], b[keep]])
+        cols = np.concatenate([b[keep], a[keep]])
+        neighbors = sparse.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n)).tocsr()
+        neighbors.data[:] = 1.0     # duplicates summed to 2 -> back to binary
+        return cls(geoids, neighbors)
+
+    @classmethod
+    def from_adjacency(cls, geoids, path=ADJACENCY_PATH):
+        return cls.from_pairs(read_adjacency(path), geoids)
+
+    def __len__(self):
+        return len(self.geoids)
+
+    @property
+    def cardinalities(self):
+        return np.diff(self.neighbors.indptr)
+
+    @property
+    def islands(self):
+        return self.geoids[self.cardinalities == 0]
+
+    # Weights matrix: "r" row-standardized (rows sum to 1, islands stay 0) or "b" binary
+    def matrix(self, style="r"):
+        if style == "b":
+            return self.neighbors
+        if style != "r":
+            raise ValueError(f"Unknown weights style {style!r}; expected 'r' or 'b'")
+        k = self.cardinalities.astype("float64")
+        inv = np.divide(1.0, k, out=np.zeros_like(k), where=k > 0)
+        return sparse.diags(inv) @ self.neighbors
+
+    # The same weights restricted to (and ordered as) the given GEOIDs. GEOIDs that aren't in the weights,
+    # MISSING rows and repeats of a GEOID after its first row are islands.
+    def subset(self, geoids):
+        geoids = np.asarray(geoids, dtype="int64")
+        pos = _rows_of(self.geoids, geoids)
+        present = pos != MISSING
+        present[present] = ~pd.Series(pos[present]).duplicated().to_numpy()
+        n = len(geoids)
+        sub = self.neighbors[pos[present]][:, pos[present]].tocoo()
+        rows = np.flatnonzero(present)
+        neighbors = sparse.coo_matrix((sub.data, (rows[sub.row], rows[sub.col])), shape=(n, n))
+        return SpatialWeights(geoids, neighbors)
+
+    # Mean of the neighbors' values for every county (over the neighbors that have a value; NaN for
+    # islands and counties whose neighbors are all missing). values: array or DataFrame columns.
+    def lag(self, values):
+        values = np.asarray(values, dtype="float64")
+        valid = np.isfinite(values)
+        total = self.neighbors @ np.where(valid, values, 0.0)
+        count = self.neighbors @ valid.astype("float64")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / count, np.nan)
+
+
+# Adds a lag_<col> column (neighbor mean, SpatialWeights.lag) for each column; df rows must match weights.geoids
+def add_spatial_lags(df, weights, cols, prefix="lag_"):
+    lags = weights.lag(df[cols].to_numpy(dtype="float64"))
+    return df.assign(**{f"{prefix}{col}": lags[:, j] for j, col in enumerate(cols)})
+
+
+# Permutation batches of size <= per_batch covering `permutations`
+def _batches(permutations, per_batch):
+    per_batch = max(1, int(per_batch))
+    for start in range(0, permutations, per_batch):
+        yield min(per_batch, permutations - start)
+
+
+# Folded permutation count: permutations at least as extreme as the observed value, in its own tail
+def _pseudo_p(larger, permutations):
+    larger = np.minimum(larger, permutations - larger)
+    return (larger + 1.0) / (permutations + 1.0)
+
+
+# Global Moran's I of x (aligned with weights.geoids, all finite) with a permutation test.
+# Returns a dict: I, expected I, permutation mean / std, z score and pseudo p-value.
+def moran(x, weights, permutations=PERMUTATIONS, style="r", seed=SEED):
+    x = np.asarray(x, dtype="float64")
+    if not np.isfinite(x).all():
+        raise ValueError("moran needs finite values for every county (subset the weights first)")
+    W = weights.matrix(style)
+    n = len(x)
+    z = x - x.mean()
+    zz = z @ z
+    scale = n / W.sum() / zz
+    I = scale * (z @ (W @ z))
+
+    rng = np.random.default_rng(seed)
+    sims = []
+    for size in _batches(permutations, PERM_BATCH_ELEMENTS // max(n, 1)):
+        Z = z[rng.permuted(np.tile(np.arange(n), (size, 1)), axis=1)].T     # n x size, one shuffle per column
+        sims.append(scale * np.einsum("ij,ij->j", Z, W @ Z))
+    sims = np.concatenate(sims) if sims else np.empty(0)
+    larger = int((sims >= I).sum())
+    return {"n": n, "I": I, "EI": -1.0 / (n - 1), "EI_sim": sims.mean() if len(sims) else np.nan,
+            "sd_sim": sims.std(ddof=1) if len(sims) > 1 else np.nan,
+            "z_sim": (I - sims.mean()) / sims.std(ddof=1) if len(sims) > 1 else np.nan,
+            "p_sim": _pseudo_p(larger, permutations) if permutations else np.nan, "permutations": permutations}
+
+
+# Local Moran's I of x (aligned with weights.geoids, all finite) with a conditional permutation test.
+# Returns one row per county: GEOID, Ii, its pseudo p-value, the standardized value / lag and the
+# Moran scatterplot quadrant (HH, LH, LL, HL). Islands get NaN.
+def local_moran(x, weights, permutations=PERMUTATIONS, style="r", seed=SEED):
+    x = np.asarray(x, dtype="float64")
+    if not np.isfinite(x).all():
+        raise ValueError("local_moran needs finite values for every county (subset the weights first)")
+    W = sparse.csr_matrix(weights.matrix(style))
+    W.sort_indices()
+    n = len(x)
+    z = x - x.mean()
+    m2 = (z @ z) / n
+    lag = W @ z
+    Ii = z / m2 * lag
+
+    k = np.diff(W.indptr)
+    has = k > 0
+    row_of_slot = np.repeat(np.arange(n), k)
+    slot = np.arange(W.nnz) - W.indptr[row_of_slot]        # position of each weight within its row
+    starts = W.indptr[:-1][has]
+    larger = np.zeros(n, dtype="int64")
+    rng = np.random.default_rng(seed)
+    k_max = int(k.max()) if n else 0
+    for size in _batches(permutations, PERM_BATCH_ELEMENTS // max(W.nnz, n, 1)):
+        # k_max draws without replacement from the n - 1 other counties, per permutation
+        draws = rng.permuted(np.tile(np.arange(n - 1), (size, 1)), axis=1)[:, :k_max]
+        idx = draws[:, slot]
+        idx += idx >= row_of_slot                          # skip the county itself
+        sim_lag = np.add.reduceat(z[idx] * W.data, starts, axis=1) if len(starts) else np.empty((size, 0))
+        sims = (z[has] / m2) * sim_lag
+        larger[has] += (sims >= Ii[has]).sum(axis=0)
+
+    p = np.full(n, np.nan)
+    p[has] = _pseudo_p(larger[has], permutations) if permutations else np.nan
+    quadrant = np.full(n, None, dtype=object)
+    q = np.where(z > 0, np.where(lag > 0, 0, 3), np.where(lag > 0, 1, 2))
+    quadrant[has] = QUADRANTS[q[has]]
+    return pd.DataFrame({"GEOID": weights.geoids, "Ii": np.where(has, Ii, np.nan), "p_sim": p,
+                         "z": z / np.sqrt(m2), "lag_z": np.where(has, lag / np.sqrt(m2), np.nan),
+                         "quadrant": quadrant})
+
+
+# Rows of a county table (rows = weights.geoids) that enter a Moran's I test of col: a value and a GEOID
+def located_values(df, weights, col):
+    x = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")
+    return x, np.isfinite(x) & (weights.geoids != MISSING)
+
+
+# Global Moran's I for several columns of a county table (rows = weights.geoids); each column is tested
+# over the counties that have a value and a GEOID. Returns one row per column.
+def moran_table(df, weights, cols, permutations=PERMUTATIONS, seed=SEED):
+    rows = []
+    for col in cols:
+        x, ok = located_values(df, weights, col)
+        w = weights if ok.all() else weights.subset(weights.geoids[ok])
+        rows.append({"column": col, **moran(x[ok], w, permutations, seed=seed)})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spatial lags and Moran's I for a county table.")
+    parser.add_argument('--input', default="OutputData/Merged_Data_National.csv",
+                        help='county csv with a GEOID column, or STATEFP and COUNTYFP columns')
+    parser.add_argument('--adjacency', default=ADJACENCY_PATH, help='Census county adjacency file')
+    parser.add_argument('--columns', nargs='+', default=["Obesity among adults", "wtd_avg_walk_index"])
+    parser.add_argument('--permutations', type=int, default=PERMUTATIONS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default="OutputData/Spatial_Moran.csv", help='global Moran table')
+    parser.add_argument('--local-output', default=None, help='local Moran rows for every column')
+    parser.add_argument('--lags-output', default=None, help='the input table with lag_<column> columns added')
+    args = parser.parse_args(argv)
+
+    df = pd.read_csv(args.input)
+    weights = SpatialWeights.from_adjacency(table_geoids(df), args.adjacency)
+    print(f"{len(weights)} counties, {weights.neighbors.nnz // 2} neighbor pairs, {len(weights.islands)} islands")
+
+    table = moran_table(df, weights, args.columns, args.permutations, args.seed)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    table.to_csv(args.output, index=False)
+    print(table.to_string(index=False))
+    print("="*10, f"Exported global Moran's I to {args.output}", "="*10)
+
+    if args.local_output:
+        parts = []
+        for col in args.columns:
+            x, ok = located_values(df, weights, col)
+            part = local_moran(x[ok], weights.subset(weights.geoids[ok]), args.permutations, seed=args.seed)
+            parts.append(part.assign(column=col))
+        pd.concat(parts, ignore_index=True).to_csv(args.local_output, index=False)
+        print("="*10, f"Exported local Moran's I to {args.local_output}", "="*10)
+    if args.lags_output:
+        numeric = [c for c in args.columns if pd.api.types.is_numeric_dtype(df[c])]
+        add_spatial_lags(df, weights, numeric).to_csv(args.lags_output, index=False)
+        print("="*10, f"Exported spatial lags to {args.lags_output}", "="*10)
+
+
+if __name__ == '__main__':
+    main()
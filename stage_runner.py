@@ -0,0 +1,145 @@
+# Incremental stage-graph runner for the Data Dominators pipeline
+# Each stage declares its upstream stages, input files, code files and parameters.
+# A stage's cache key is a hash of all of those (plus the keys of its upstream stages and its own source),
+# so a stage only re-runs when something it depends on changed. Results live in the artifact cache.
+# Stages whose upstream stages are done run together; threaded stages (the data branches) share a thread pool,
+# the rest (plots, anything using matplotlib) run one at a time on the main thread.
+# Every stage that runs is measured (instrument.traced_stage); pass a list as trace to collect the records.
+# Side effects are not in the cache: a stage's cached result only counts while the files it lists as outputs
+# exist, and always-run stages (figures shown on screen or rendered to disk) run every time they are wanted.
+
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from artifact_cache import CACHE_DIR, cache_key, has_result, load_result, save_result
+from instrument import shape_of, traced_stage
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), files=(), code=(), params=None, threaded=False, outputs=(), always=False):
+        self.name = name
+        self.func = func            # called as func(*upstream_results)
+        self.deps = list(deps)      # names of upstream stages, in argument order
+        self.files = list(files)    # input data files (hashed by content)
+        self.code = list(code)      # helper modules the stage relies on (hashed by content)
+        self.params = params or {}  # settings the stage reads; changing one invalidates the stage
+        self.threaded = threaded    # safe to run on a worker thread next to other stages
+        self.outputs = list(outputs)  # files the stage writes; the stage re-runs if one is missing
+        self.always = always        # never cached: the stage is run for its side effects
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, deps={self.deps})"
+
+
+# Orders stages so every stage comes after its upstream stages
+def topo_order(stages):
+    by_name = {s.name: s for s in stages}
+    order, state = [], {}
+
+    def visit(name):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Stage graph has a cycle at {name}")
+        if name not in by_name:
+            raise ValueError(f"Unknown stage: {name}")
+        state[name] = "visiting"
+        for dep in by_name[name].deps:
+            visit(dep)
+        state[name] = "done"
+        order.append(by_name[name])
+
+    for s in stages:
+        visit(s.name)
+    return order
+
+
+# Cache key of every stage: upstream keys + files + code + the stage's own source + params
+def stage_keys(stages):
+    keys = {}
+    for s in topo_order(stages):
+        try:
+            source = inspect.getsource(s.func)
+        except (OSError, TypeError):
+            source = s.func.__qualname__
+        keys[s.name] = cache_key(*[keys[d] for d in s.deps], *s.files, *s.code, source, **s.params)
+    return keys
+
+
+# Runs the graph. targets limits the run to those stages and their upstream stages;
+# force is a list of stage names to re-run even if they are up to date ("all" re-runs everything).
+# profile names stages to run under cProfile; trace (a list) receives one record per stage, in graph order.
+# Returns {stage name: "cached" or "ran"}.
+def run_stages(stages, targets=None, force=(), max_workers=2, cache_dir=CACHE_DIR, profile=(), trace=None):
+    by_name = {s.name: s for s in stages}
+    order = topo_order(stages)
+    keys = stage_keys(stages)
+
+    if targets:
+        wanted = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(by_name[name].deps)
+        order = [s for s in order if s.name in wanted]
+    force = {s.name for s in order} if "all" in force else set(force)
+
+    # A stage is stale if it was forced, always runs, has no cached result, is missing one of its output files,
+    # or an upstream stage is stale
+    stale = set()
+    for s in order:
+        if (s.name in force or s.always or not has_result(s.name, keys[s.name], cache_dir)
+                or any(not os.path.exists(path) for path in s.outputs) or any(d in stale for d in s.deps)):
+            stale.add(s.name)
+
+    results = {}  # only filled for stages whose result is needed
+
+    def get_result(name):
+        if name not in results:
+            found, value = load_result(name, keys[name], cache_dir)
+            if not found:
+                raise RuntimeError(f"Missing cached result for stage {name}")
+            results[name] = value
+        return results[name]
+
+    records = {}
+
+    def run_one(s):
+        args = [get_result(d) for d in s.deps]
+        print("="*10, f"Running stage: {s.name}", "="*10)
+        with traced_stage(s.name, args, profile=s.name in profile) as record:
+            value = s.func(*args)
+            record["out"] = shape_of(value)
+        records[s.name] = record
+        if not s.always:
+            save_result(s.name, keys[s.name], value, cache_dir)
+        return value
+
+    status = {s.name: "cached" for s in order if s.name not in stale}
+    for name in status:
+        print(f"Stage {name} is up to date ({keys[name][:8]})")
+
+    pending = [s for s in order if s.name in stale]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending:
+            ready = [s for s in pending if all(d not in stale or d in status for d in s.deps)]
+            # load upstream results on the main thread so worker threads never race on the same file
+            for s in ready:
+                for d in s.deps:
+                    get_result(d)
+            futures = {s.name: pool.submit(run_one, s) for s in ready if s.threaded}
+            for s in ready:
+                if not s.threaded:
+                    results[s.name] = run_one(s)
+            for name, future in futures.items():
+                results[name] = future.result()
+            for s in ready:
+                status[s.name] = "ran"
+            pending = [s for s in pending if s.name not in status]
+    if trace is not None:
+        trace.extend(records.get(s.name, {"stage": s.name, "status": "cached", "key": keys[s.name][:8]})
+                     for s in order)
+    return status
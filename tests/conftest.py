@@ -0,0 +1,13 @@
+# The project modules are flat files at the repository root
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+# The modules write to relative OutputData/ paths (file hash memo, caches); keep them out of the repository
+@pytest.fixture(autouse=True)
+def _run_in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,25 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from artifact_cache import file_hash
+
+
+def test_file_hash_stamps_survive_concurrent_writers(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    paths = []
+    for i in range(40):
+        path = tmp_path / f"input{i}.csv"
+        path.write_text(f"a,b\n{i},{i * i}\n" * 500)
+        paths.append(str(path))
+
+    with ThreadPoolExecutor(8) as pool:
+        hashes = list(pool.map(lambda p: file_hash(p, cache_dir), paths * 3))
+    expected = [hashlib.blake2b(open(p, "rb").read(), digest_size=16).hexdigest() for p in paths]
+    assert hashes == expected * 3
+
+    assert os.listdir(cache_dir) == ["file_hashes.json"]     # no temporary files left behind
+    with open(os.path.join(cache_dir, "file_hashes.json")) as f:
+        stamps = json.load(f)
+    assert all(stamps[os.path.abspath(p)]["hash"] == h for p, h in zip(paths, expected) if os.path.abspath(p) in stamps)
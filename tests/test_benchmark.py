@@ -0,0 +1,24 @@
+import os
+
+from benchmark import COUNTIES_PER_STATE, generate_inputs, pipeline_stages, walkability_cols
+from national import run_states
+
+
+# Every generated county resolves: the national run merges all of them with their walkability rows
+def test_generated_counties_all_merge(tmp_path):
+    data_dir = generate_inputs(str(tmp_path / "data"), 8000, 3)
+    national_df = run_states(['TX', 'AL', 'AK'], county_fips_path=os.path.join(data_dir, "county_fips.csv"),
+                             walk_path=os.path.join(data_dir, "sld.csv"),
+                             health_path=os.path.join(data_dir, "places.csv"), max_workers=2)
+    assert len(national_df) == 254 + 2 * COUNTIES_PER_STATE
+    assert national_df[walkability_cols].notna().all().all()
+    assert not os.path.exists(os.path.join("OutputData", "unmatched", "national_places_names.csv"))
+
+
+def test_texas_stages_join_on_geoid(tmp_path):
+    data_dir = generate_inputs(str(tmp_path / "data"), 3000, 1)
+    state = {}
+    rows = {name: fn(state) for name, fn in pipeline_stages(data_dir)}
+    assert rows["merge"] == rows["places_pivot"] == 254
+    assert (state["merged"]["GEOID"] // 1000 == 48).all()
+    assert state["merged"][walkability_cols].notna().all().all()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from blockgroup_pca import BG_FEATURES, StreamingPCA, block_group_features
+from moments import MomentAccumulator
+from walkability import SLD_VALUE_COLS
+
+
+def _sld_chunk(n, seed):
+    rng = np.random.default_rng(seed)
+    base = rng.integers(50, 2000, n)
+    chunk = pd.DataFrame({col: (base * rng.uniform(0.1, 1.0, n)).round() for col in SLD_VALUE_COLS})
+    chunk['P_WrkAge'] = rng.random(n)
+    chunk['NatWalkInd'] = 1 + 19 * rng.random(n) * chunk['P_WrkAge']
+    chunk.loc[::97, 'HH'] = 0               # zero denominators are dropped
+    chunk.loc[::89, 'NatWalkInd'] = np.nan  # and so are missing values
+    return chunk
+
+
+def _assert_matches_sklearn(pca, X):
+    scaler = StandardScaler().fit(X)
+    reference = PCA().fit(scaler.transform(X))
+    # components are only defined up to sign
+    signs = np.sign((pca.components_ * reference.components_).sum(axis=1))
+    np.testing.assert_allclose(pca.components_ * signs[:, None], reference.components_, atol=1e-8)
+    np.testing.assert_allclose(pca.explained_variance_, reference.explained_variance_, rtol=1e-9)
+    np.testing.assert_allclose(pca.explained_variance_ratio_, reference.explained_variance_ratio_, rtol=1e-9)
+    np.testing.assert_allclose(pca.singular_values_, reference.singular_values_, rtol=1e-9)
+    np.testing.assert_allclose(pca.scaler.mean_, scaler.mean_)
+    np.testing.assert_allclose(pca.scaler.scale_, scaler.scale_)
+    np.testing.assert_allclose(pca.transform(X) * signs, reference.transform(scaler.transform(X)), atol=1e-8)
+
+
+def test_streaming_pca_matches_sklearn():
+    chunks = [block_group_features(_sld_chunk(n, seed)) for seed, n in enumerate([700, 1300, 5, 900])]
+    pca = StreamingPCA().fit(lambda: iter(chunks))
+    X = np.vstack(chunks)
+    assert pca.n_samples_ == len(X) and pca.n_features_in_ == len(BG_FEATURES)
+    _assert_matches_sklearn(pca, X)
+
+
+def test_merged_state_moments_match_sklearn():
+    states = [block_group_features(_sld_chunk(n, seed)) for seed, n in [(10, 1200), (11, 800)]]
+    columns = [name for name, _, _ in BG_FEATURES]
+    acc = MomentAccumulator(columns).update(states[0]).merge(MomentAccumulator(columns).update(states[1]))
+    _assert_matches_sklearn(StreamingPCA().fit_moments(acc), np.vstack(states))
+
+
+def test_truncated_components_are_the_leading_ones():
+    X = block_group_features(_sld_chunk(2000, 3))
+    full = StreamingPCA().fit(lambda: iter([X]))
+    top = StreamingPCA(n_components=3).fit(lambda: iter([X]))
+    np.testing.assert_array_equal(top.components_, full.components_[:3])
+    np.testing.assert_allclose(top.explained_variance_ratio_, full.explained_variance_ratio_[:3])
@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+
+import county_service
+from county_service import CountyService, bench_store_lookups, query_mix, route
+from linear_predictor import LinearPredictor
+
+
+def _service():
+    data = {"StateAbbr": np.array(["TX", "TX", "TX"], dtype=object),
+            "County": np.array(["Harris", "Dallas", "Loving"], dtype=object),
+            "GEOID": np.array([48201.0, 48113.0, np.nan]),          # a NULL GEOID comes back as NaN
+            "Obesity among adults": np.array([33.0, 31.0, np.nan]),
+            "wtd_avg_walk_index": np.array([10.0, 12.0, 5.0])}
+    return CountyService(data, LinearPredictor(["wtd_avg_walk_index"], 40.0, [-0.5]))
+
+
+def test_null_geoids_are_returned_as_null():
+    service = _service()
+    assert service.query({"op": "county", "county": "48201"})["GEOID"] == 48201
+    assert service.query({"op": "county", "county": "Loving", "state": "TX"})["GEOID"] is None
+    top = service.query({"op": "top", "n": 3})
+    assert [r["GEOID"] for r in top] == [None, 48201, 48113]
+    assert '"GEOID": 48201' in json.dumps(top)
+
+
+def test_benchmarks_skip_null_geoids(monkeypatch):
+    service = _service()
+    for request in query_mix(service, 500, seed=1):
+        answer = service.query(request)
+        assert "error" not in answer, (request, answer)
+
+    looked_up = []
+    monkeypatch.setattr("county_service.query_counties",
+                        lambda db_path, geoids, vintage: looked_up.extend(geoids))
+    summary = bench_store_lookups("unused.db", service.geoids)
+    assert looked_up == [48201, 48113] and summary["queries"] == 2
+
+
+def test_query_parameters_do_not_override_the_path():
+    service = _service()
+    status, answer = route(service, "GET", "/county/48113?op=top&county=48201", b"")
+    assert status == 200 and answer["County"] == "Dallas"
+    status, answer = route(service, "GET", "/top?op=county&n=1", b"")
+    assert status == 200 and [r["County"] for r in answer] == ["Loving"]
+
+
+def test_bench_loads_the_service_it_would_serve(monkeypatch, tmp_path):
+    loaded, looked_up = [], []
+
+    def from_store(db_path, predictor_path, states, vintage, cache_size):
+        loaded.append((states, vintage, cache_size))
+        service = _service()
+        service.cache = county_service.LRUCache(cache_size)
+        return service
+
+    monkeypatch.setattr(CountyService, "from_store", from_store)
+    monkeypatch.setattr("county_service.query_counties",
+                        lambda db_path, geoids, vintage: looked_up.append(vintage))
+    output = tmp_path / "bench.json"
+    county_service.main(["bench", "--states", "tx", "--vintage", "latest", "--cache-size", "7",
+                         "--queries", "50", "--http-queries", "0", "--output", str(output)])
+    assert loaded == [(["TX"], "latest", 7)]
+    assert set(looked_up) == {"latest"}
+    meta = json.loads(output.read_text())["meta"]
+    assert meta["cache_size"] == 7 and meta["states"] == ["TX"] and meta["vintage"] == "latest"
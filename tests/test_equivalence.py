@@ -0,0 +1,127 @@
+# The vectorized rewrites against the code they replaced, on small synthetic tables
+import numpy as np
+import pandas as pd
+import pytest
+
+from walkability import SLD_VALUE_COLS, attach_county_names, condense_counties, condense_function, read_sld
+
+
+# Block groups for TX (48) and CA (6) with NaNs, a county without jobs (0 / 0) and one where
+# households with 0 cars are counted but HH is 0 (x / 0)
+def _block_groups(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'STATEFP': rng.choice([48, 48, 6], n), 'COUNTYFP': rng.choice([1, 3, 5, 7, 9], n)})
+    df['TRACTCE'] = rng.integers(100, 105, n) * 100
+    df['BLKGRPCE'] = rng.integers(1, 4, n)
+    for col in SLD_VALUE_COLS:
+        df[col] = rng.integers(0, 2000, n).astype('float64')
+    df['P_WrkAge'] = rng.random(n)
+    df['NatWalkInd'] = rng.random(n) * 19 + 1
+    df.loc[rng.random(n) < 0.05, 'P_WrkAge'] = np.nan
+    df.loc[rng.random(n) < 0.05, 'R_LowWageWk'] = np.nan
+    no_jobs = (df['STATEFP'] == 48) & (df['COUNTYFP'] == 5)
+    df.loc[no_jobs, ['TotEmp', 'E_LowWageWk', 'E_MedWageWk', 'E_HiWageWk']] = 0
+    no_hh = (df['STATEFP'] == 48) & (df['COUNTYFP'] == 9)
+    df.loc[no_hh, 'HH'] = 0
+    return df
+
+
+# COUNTYFP_TX.csv style table (no STATEFP); county 7 is not listed
+COUNTY_FP = pd.DataFrame({'COUNTYFP': [1, 3, 5, 9], 'Texas County': ['Anderson', 'Andrews', 'Angelina', 'Aransas']})
+
+
+@pytest.fixture
+def sld_csv(tmp_path):
+    path = tmp_path / "sld.csv"
+    _block_groups().to_csv(path, index=False)
+    return str(path)
+
+
+def _assert_same(actual, expected, by):
+    actual = actual.sort_values(by).reset_index(drop=True)
+    expected = expected.sort_values(by).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual[list(expected.columns)], expected, check_dtype=False, rtol=1e-12)
+
+
+def test_condense_counties_matches_condense_function():
+    merged_df = _block_groups()
+    merged_df = merged_df[merged_df['STATEFP'] == 48].copy()
+    merged_df['Texas County'] = merged_df['COUNTYFP'].map(dict(zip(COUNTY_FP['COUNTYFP'], COUNTY_FP['Texas County'])))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = merged_df.groupby(['Texas County'])[SLD_VALUE_COLS].apply(condense_function).reset_index()
+    _assert_same(condense_counties(merged_df, key='Texas County'), expected, 'Texas County')
+
+
+def test_pivot_places_matches_pivot_table():
+    from places import KEY_COLS, PIVOT_INDEX, categorize, pivot_places
+    rng = np.random.default_rng(1)
+    counties = pd.DataFrame({'LocationName': ['Anderson', 'Andrews', 'Angelina', 'Aransas'],
+                             'TotalPopulation': [58000, 18000, 87000, 24000],
+                             'TotalPop18plus': [46000, 13000, 66000, 19000]})
+    rows = counties.sample(200, replace=True, random_state=1).reset_index(drop=True)
+    rows['Measure'] = rng.choice(['Obesity among adults', 'No leisure-time physical activity among adults',
+                                  'Food insecurity in the past 12 months among adults'], len(rows))
+    rows['Data_Value'] = np.round(rng.random(len(rows)) * 40, 1)
+    rows.loc[rng.random(len(rows)) < 0.1, 'Data_Value'] = np.nan
+    # a measure only one county reports, and a county whose only rows have no value
+    rows.loc[len(rows)] = ['Andrews', 18000, 13000, 'Arthritis among adults', 25.0]
+    rows.loc[len(rows)] = ['Archer', 8500, 6700, 'Obesity among adults', np.nan]
+    rows = rows.assign(Year=2023, StateAbbr='TX', LocationID=0, Data_Value_Type='Age-adjusted prevalence')[KEY_COLS]
+
+    expected = rows.pivot_table(index=PIVOT_INDEX, columns="Measure", values="Data_Value", aggfunc="mean").reset_index()
+    expected.columns.name = None
+    pd.testing.assert_frame_equal(pivot_places(categorize(rows)), expected, check_dtype=False, rtol=1e-12)
+
+
+def test_condense_counties_sql_matches_condense_counties(sld_csv, tmp_path):
+    from sld_sql import condense_counties_sql, load_sld_sql
+    db_path = str(tmp_path / "sld.db")
+    load_sld_sql(sld_csv, db_path)
+    condensed, unmatched = condense_counties_sql(COUNTY_FP, key='Texas County', statefp=48, db_path=db_path)
+
+    merged_df = attach_county_names(read_sld(sld_csv, statefp=48), COUNTY_FP, key='Texas County', statefp=48)
+    expected = condense_counties(merged_df, key=['GEOID', 'Texas County'])
+    _assert_same(condensed, expected, 'GEOID')
+    assert unmatched['GEOID'].tolist() == [48007]
+    assert unmatched['block_groups'].tolist() == [int((merged_df['GEOID'] == 48007).sum())]
+
+
+def test_rollup_cube_counties_match_condense_counties(sld_csv, tmp_path):
+    from rollup_cube import build_cube
+    cube = build_cube(sld_csv, str(tmp_path / "cube"))
+
+    walk_df = read_sld(sld_csv, statefp=None)
+    walk_df['GEOID'] = walk_df['STATEFP'] * 1000 + walk_df['COUNTYFP']
+    expected = condense_counties(walk_df, key='GEOID')
+    _assert_same(cube.rollup("county"), expected, 'GEOID')
+    # a subset of counties, and a custom grouping of them
+    _assert_same(cube.rollup("county", keys=[48001, 6003]), expected[expected['GEOID'].isin([48001, 6003])], 'GEOID')
+    grouped = cube.rollup("county", groups={"a": [48001, 48003], "b": [6009]})
+    walk_df['group'] = walk_df['GEOID'].map({48001: "a", 48003: "a", 6009: "b"})
+    _assert_same(grouped, condense_counties(walk_df.dropna(subset=['group']), key='group'), 'group')
+    # units with a missing label are left out rather than added to the last group
+    labels = pd.Series({48001: "a", 48003: "a", 6009: "b", 6003: np.nan, 48005: None})
+    totals = cube.group_totals("county", labels)
+    assert list(totals.index) == ["a", "b"]
+    pd.testing.assert_frame_equal(totals, cube.group_totals("county", labels.dropna()))
+
+
+def test_collapse_pcr_matches_sklearn_pipeline():
+    from sklearn.decomposition import PCA
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+    from linear_predictor import collapse_pcr
+    rng = np.random.default_rng(2)
+    features = [f"x{j}" for j in range(6)]
+    X = pd.DataFrame(rng.normal(size=(150, 6)) @ rng.normal(size=(6, 6)) * 10 + 50, columns=features)
+    y = X.to_numpy() @ rng.normal(size=6) + rng.normal(size=150)
+
+    scaler = StandardScaler()
+    pca = PCA(n_components=3)
+    model = LinearRegression().fit(pca.fit_transform(scaler.fit_transform(X)), y)
+    expected = model.predict(pca.transform(scaler.transform(X)))
+
+    predictor = collapse_pcr(scaler, pca, model, features)
+    np.testing.assert_allclose(predictor.predict(X), expected, rtol=1e-10)
+    np.testing.assert_allclose(predictor.predict(X[features].to_numpy()), expected, rtol=1e-10)
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geo_index import MISSING, CountyIndex, attach_geoids, normalize_name, report_unmatched, resolve_names
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Harris County", "harris"),
+    ("  HARRIS   county ", "harris"),
+    ("De Kalb County", "dekalb"),
+    ("DeKalb", "dekalb"),
+    ("La Salle Parish", "lasalle"),
+    ("St. Louis County", "saintlouis"),
+    ("Ste. Genevieve", "saintegenevieve"),
+    ("Doña Ana County", "donaana"),
+    ("Prince George's", "princegeorges"),
+    ("Miami-Dade", "miamidade"),
+    ("Juneau City and Borough", "juneau"),
+    ("Bethel Census Area", "bethel"),
+    ("Baltimore city", "baltimorecity"),       # independent cities keep their suffix
+])
+def test_normalize_name_variants(name, expected):
+    assert normalize_name(name) == expected
+
+
+def _index():
+    county_fp_df = pd.DataFrame({'STATEFP': [48, 48, 24, 24, 29, 29],
+                                 'COUNTYFP': [201, 113, 5, 510, 186, 187],
+                                 'County': ["Harris County", "Dallas County", "Baltimore County", "Baltimore city",
+                                            "Ste. Genevieve County", "Ste Genevieve"]})
+    return county_fp_df, CountyIndex.from_table(county_fp_df, 'County')
+
+
+def test_ambiguous_names_are_dropped():
+    _, index = _index()
+    assert index.ambiguous == {(29, "saintegenevieve")}
+    assert index.geoid_of_name(29, "Ste. Genevieve") == MISSING
+    assert index.geoid_of_name(24, "Baltimore") == 24005 and index.geoid_of_name(24, "Baltimore City") == 24510
+    assert index.geoid_of_name(48, "harris") == 48201 and index.geoid_of_name(24, "Harris") == MISSING
+    np.testing.assert_array_equal(index.positions([48113, 48999, -5, 10**9]), [1, MISSING, MISSING, MISSING])
+
+
+def test_resolve_names_cache_round_trip(tmp_path):
+    county_fp_df, index = _index()
+    fips_path = tmp_path / "county_fips.csv"
+    county_fp_df.to_csv(fips_path, index=False)
+    cache_dir = str(tmp_path / "cache")
+    pairs = [("TX", "Harris"), ("TX", "Nowhere"), ("ZZ", "Harris")]
+    first = resolve_names(index, pairs, str(fips_path), cache_dir)
+    assert first == {("TX", "Harris"): 48201, ("TX", "Nowhere"): MISSING, ("ZZ", "Harris"): MISSING}
+    cache_files = [f for f in os.listdir(cache_dir) if f.startswith("place_geoids-")]
+    assert len(cache_files) == 1 and not cache_files[0].endswith(".tmp")
+
+    # a second run answers the cached names without the index; only new names are looked up
+    empty = CountyIndex([], [], [])
+    second = resolve_names(empty, pairs + [("TX", "Dallas")], str(fips_path), cache_dir)
+    assert second == {**first, ("TX", "Dallas"): MISSING}
+    assert resolve_names(index, [("TX", "Dallas")], str(fips_path), cache_dir) == {("TX", "Dallas"): MISSING}
+
+    # a different county table gets its own cache
+    county_fp_df.iloc[:2].to_csv(fips_path, index=False)
+    assert resolve_names(index, [("TX", "Dallas")], str(fips_path), cache_dir) == {("TX", "Dallas"): 48113}
+
+    places = pd.DataFrame({'StateAbbr': ["TX", "MD"], 'LocationName': ["Dallas", "Baltimore"]})
+    attach_geoids(places, index, 'LocationName', 'StateAbbr')
+    assert places.columns[0] == 'GEOID' and places['GEOID'].tolist() == [48113, 24005]
+
+
+def test_report_unmatched_writes_and_clears(tmp_path):
+    out_dir = str(tmp_path / "unmatched")
+    unmatched = pd.DataFrame({'StateAbbr': ["TX"], 'LocationName': ["Nowhere"]})
+    path = report_unmatched("places_names", unmatched, out_dir)
+    pd.testing.assert_frame_equal(pd.read_csv(path), unmatched)
+    assert report_unmatched("places_names", unmatched.iloc[0:0], out_dir) is None
+    assert not os.path.exists(path)
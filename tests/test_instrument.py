@@ -0,0 +1,45 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from instrument import STATM_PATH, format_summary, traced_stage
+
+
+def _allocate(mb, seconds=0.1):
+    block = np.ones(mb * 2**20 // 8)
+    threading.Event().wait(seconds)      # let the sampler see it
+    return block.sum()
+
+
+@pytest.mark.skipif(not os.path.exists(STATM_PATH), reason="RSS sampling reads /proc/self/statm")
+def test_later_stages_get_their_own_memory_growth():
+    with traced_stage("big") as big:
+        _allocate(200)
+    with traced_stage("small") as small:
+        _allocate(60)
+    # ru_maxrss would report 0 for "small": the earlier stage already set the process high-water mark
+    assert big["rss_growth_mb"] > 150
+    assert 40 < small["rss_growth_mb"] < 150
+    assert small["overlapped"] == []
+    assert "rss_growth_mb" in format_summary([big, small])
+
+
+@pytest.mark.skipif(not os.path.exists(STATM_PATH), reason="RSS sampling reads /proc/self/statm")
+def test_concurrent_stages_are_marked_as_overlapped():
+    records = {}
+    started = threading.Barrier(2)
+
+    def stage(name):
+        with traced_stage(name) as record:
+            started.wait()
+            _allocate(20)
+        records[name] = record
+
+    threads = [threading.Thread(target=stage, args=(name,)) for name in ("a", "b")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert records["a"]["overlapped"] == ["b"] and records["b"]["overlapped"] == ["a"]
@@ -0,0 +1,65 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from merged_store import DEFAULT_VINTAGE, SCHEMA, TABLE, query_counties, write_merged
+from places import measures_to_keep
+from walkability import COUNTY_COLS
+
+
+def _merged(n=5, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"Texas County": [f"County{i}" for i in range(n)], "COUNTYFP": np.arange(n) * 2 + 1,
+                       "TotalPopulation": rng.integers(1000, 100000, n), "TotalPop18plus": rng.integers(500, 900, n)})
+    for col in measures_to_keep:
+        df[col] = rng.uniform(10, 40, n).round(1)
+    for name, _, _ in COUNTY_COLS:
+        df[name] = rng.random(n)
+    return df
+
+
+def test_typed_schema_and_indexes(tmp_path):
+    db = str(tmp_path / "store.db")
+    write_merged(db, _merged(), state="TX", statefp=48)
+    con = sqlite3.connect(db)
+    columns = [(row[1], row[2]) for row in con.execute(f"PRAGMA table_info({TABLE})")]
+    indexes = {row[1] for row in con.execute(f"PRAGMA index_list({TABLE})")}
+    con.close()
+    assert columns == [(c, t.split()[0]) for c, t in SCHEMA]
+    assert {f"idx_{TABLE}_county", f"idx_{TABLE}_geoid", f"idx_{TABLE}_state"} <= indexes
+
+    df = query_counties(db, states="TX")
+    assert df["GEOID"].dtype == "int64" and df["TotalPopulation"].dtype == "int64"
+    assert df["GEOID"].tolist() == [48001, 48003, 48005, 48007, 48009]
+
+
+def test_only_changed_counties_are_written_and_missing_ones_pruned(tmp_path):
+    db = str(tmp_path / "store.db")
+    df = _merged()
+    assert write_merged(db, df, state="TX", statefp=48) == 5
+    assert write_merged(db, df, state="TX", statefp=48) == 0
+
+    changed = df.copy()
+    changed.loc[2, "Obesity among adults"] += 1
+    assert write_merged(db, changed, state="TX", statefp=48) == 1
+    stored = query_counties(db, states="TX").set_index("County")
+    assert stored.loc["County2", "Obesity among adults"] == changed.loc[2, "Obesity among adults"]
+
+    # County4 left the table; other states and vintages are not touched by the prune
+    write_merged(db, df, state="OK", statefp=40)
+    write_merged(db, df, state="TX", statefp=48, vintage="PLACES_2025")
+    assert write_merged(db, changed.iloc[:4], state="TX", statefp=48) == 0
+    assert query_counties(db, states="TX")["County"].tolist() == [f"County{i}" for i in range(4)]
+    assert len(query_counties(db, states="OK")) == 5
+    assert len(query_counties(db, states="TX", vintage="PLACES_2025")) == 5
+
+
+def test_vintage_defaults_to_the_written_one(tmp_path):
+    db = str(tmp_path / "store.db")
+    write_merged(db, _merged(seed=0), state="TX", statefp=48)
+    write_merged(db, _merged(n=3, seed=1), state="TX", statefp=48, vintage="ZZZZ_newer")
+    assert set(query_counties(db)["vintage"]) == {DEFAULT_VINTAGE}
+    assert len(query_counties(db)) == 5
+    assert set(query_counties(db, vintage="latest")["vintage"]) == {"ZZZZ_newer"}
+    assert len(query_counties(db, vintage="all")) == 8
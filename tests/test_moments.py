@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from moments import MomentAccumulator
+
+
+def _frame(n, seed, nan_rate=0.15):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=n)
+    df = pd.DataFrame({'Obesity': 30 + 4 * base + rng.normal(size=n),
+                       'walk': 1e4 + 3 * base + rng.normal(size=n),    # large mean, small spread
+                       'pop': rng.lognormal(8, 1, n),
+                       'share': rng.random(n)})
+    for col in df.columns:
+        df.loc[rng.random(n) < nan_rate, col] = np.nan
+    return df
+
+
+# Per-state accumulators, each fed in uneven chunks, merged in any order
+def _merged(parts, pairwise):
+    columns = list(parts[0].columns)
+    accs = [MomentAccumulator.from_frame(part, columns, pairwise=pairwise, chunk_rows=37) for part in parts]
+    acc = MomentAccumulator(columns, pairwise)
+    for other in reversed(accs):
+        acc.merge(other)
+    return acc
+
+
+def test_pairwise_merge_matches_pandas():
+    parts = [_frame(n, seed) for seed, n in enumerate([400, 3, 1, 250])]
+    parts[2].loc[:, 'share'] = np.nan     # a state without any value for one column
+    df = pd.concat(parts, ignore_index=True)
+    acc = _merged(parts, pairwise=True)
+
+    pd.testing.assert_series_equal(acc.count, df.count().astype('float64'))
+    pd.testing.assert_series_equal(acc.means(), df.mean(), rtol=1e-12)
+    pd.testing.assert_series_equal(acc.variances(), df.var(), rtol=1e-10)
+    pd.testing.assert_frame_equal(acc.covariance(), df.cov(), rtol=1e-10)
+    pd.testing.assert_frame_equal(acc.correlation(), df.corr(), rtol=1e-10)
+
+
+def test_complete_case_merge_matches_dropna():
+    parts = [_frame(n, seed) for seed, n in enumerate([300, 120, 80], start=10)]
+    df = pd.concat(parts, ignore_index=True).dropna()
+    acc = _merged(parts, pairwise=False)
+
+    assert (acc.n == len(df)).all()
+    pd.testing.assert_series_equal(acc.means(), df.mean(), rtol=1e-12)
+    pd.testing.assert_series_equal(acc.variances(ddof=0), df.var(ddof=0), rtol=1e-10)
+    pd.testing.assert_frame_equal(acc.correlation(), df.corr(), rtol=1e-10)
+
+
+def test_too_few_rows_give_nan():
+    df = pd.DataFrame({'a': [1.0, np.nan, 3.0], 'b': [np.nan, 2.0, 5.0]})
+    acc = MomentAccumulator.from_frame(df, pairwise=True)
+    assert np.isnan(acc.covariance().loc['a', 'b']) and np.isnan(df.cov().loc['a', 'b'])
+    assert np.isnan(acc.correlation().loc['a', 'b'])
+    pd.testing.assert_series_equal(acc.variances(), df.var())
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from pcr_bootstrap import bootstrap_pcr
+
+
+def _data(n=120, p=5, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, p)) @ rng.normal(size=(p, p)), columns=[f"x{j}" for j in range(p)])
+    y = pd.Series(X.to_numpy() @ rng.normal(size=p) + rng.normal(size=n))
+    return X, y
+
+
+# The bootstrap estimates are the reported fit: scaler + PCA on all rows, regression on the train rows
+def test_estimates_match_reported_train_split_fit():
+    X, y = _data()
+    scaler = StandardScaler()
+    pca = PCA(n_components=3)
+    X_pca = pca.fit_transform(scaler.fit_transform(X))
+    X_train, _, y_train, _, train_rows, _ = train_test_split(X_pca, y, np.arange(len(y)), test_size=0.2, random_state=42)
+    model = LinearRegression().fit(X_train, y_train)
+    contrib = pca.components_.T @ model.coef_
+
+    boot = bootstrap_pcr(X, y, 3, n_boot=200, fit_rows=train_rows, components=pca.components_.T)
+    np.testing.assert_allclose(boot["coeffs"]["estimate"].to_numpy(), model.coef_, rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(boot["contrib"]["estimate"].reindex(X.columns).to_numpy(), contrib, rtol=1e-8, atol=1e-10)
+    assert (boot["coeffs"]["ci_low"] <= boot["coeffs"]["ci_high"]).all()
+
+
+def test_estimates_match_full_sample_fit():
+    X, y = _data(seed=1)
+    pca = PCA(n_components=2)
+    X_pca = pca.fit_transform(StandardScaler().fit_transform(X))
+    model = LinearRegression().fit(X_pca, y)
+
+    boot = bootstrap_pcr(X, y, 2, n_boot=50)
+    np.testing.assert_allclose(boot["coeffs"]["estimate"].to_numpy(), model.coef_, rtol=1e-8, atol=1e-10)
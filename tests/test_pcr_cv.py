@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from pcr_cv import cv_components, cv_se, kfold_splits
+
+
+def _data(n=120, p=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, p)) @ rng.normal(size=(p, p)) + 10
+    y = X @ rng.normal(size=p) + rng.normal(scale=2.0, size=n)
+    return X, y
+
+
+def test_curve_matches_refitting_the_pipeline():
+    X, y = _data()
+    splits = kfold_splits(len(X), n_splits=4, n_repeats=2, seed=7)
+    curve, _ = cv_components(X, y, n_splits=4, n_repeats=2, seed=7)
+    for k in [1, 3, 6]:
+        fold_mse = []
+        for train, test in splits:
+            model = make_pipeline(StandardScaler(), PCA(k), LinearRegression()).fit(X[train], y[train])
+            fold_mse.append(mean_squared_error(y[test], model.predict(X[test])))
+        row = curve.set_index("n_components").loc[k]
+        assert np.isclose(row["cv_mse"], np.mean(fold_mse))
+        assert np.isclose(row["cv_mse_se"], cv_se(np.array(fold_mse), 4))
+
+
+def test_repeats_do_not_shrink_the_standard_error():
+    fold_scores = np.array([[1.0], [2.0], [3.0], [2.0], [2.0], [2.0]])     # 2 repeats of 3 folds
+    np.testing.assert_allclose(cv_se(fold_scores, 3), [(1.0 / np.sqrt(3) + 0.0) / 2])
+    np.testing.assert_allclose(cv_se(fold_scores[:3], 3), [1.0 / np.sqrt(3)])
+
+    X, y = _data(seed=1)
+    once = cv_components(X, y, n_splits=5, n_repeats=1)[0]["cv_mse_se"]
+    repeated = cv_components(X, y, n_splits=5, n_repeats=10)[0]["cv_mse_se"]
+    # the old std / sqrt(n_splits * n_repeats) would be ~sqrt(10) times smaller than a single pass
+    assert (repeated > once / 2).all()
+    assert isinstance(repeated, pd.Series)
+
+
+def test_model_table_pcr_rows_match_the_cv_curve():
+    from model_paths import compare_models
+    X, y = _data(seed=2)
+    curve, _ = cv_components(X, y, n_splits=5, n_repeats=3)
+    table, _ = compare_models(X, y, n_splits=5, n_repeats=3)
+    pcr = table[table["family"] == "pcr"].set_index("n_components")
+    np.testing.assert_allclose(pcr["cv_mse"], curve["cv_mse"], rtol=1e-8)
+    np.testing.assert_allclose(pcr["cv_mse_se"], curve["cv_mse_se"], rtol=1e-6)
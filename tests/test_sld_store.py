@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from national import read_walk_parts
+from sld_store import SLDStore, load_sld, open_sld_store
+from walkability import COMPACT_RTOL, SLD_COLS, SLD_DTYPE_PLAN, SLD_VALUE_COLS, condense_counties, read_sld
+
+
+def _sld_csv(path, n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'STATEFP': rng.choice([6, 48, 36], n), 'COUNTYFP': rng.integers(1, 60, n) * 2 + 1,
+                       'OTHER': rng.normal(size=n)})
+    for col in SLD_VALUE_COLS:
+        df[col] = rng.integers(0, 500, n)
+    df['P_WrkAge'] = rng.random(n)
+    df['NatWalkInd'] = rng.random(n) * 20
+    df.loc[2500:, 'TotEmp'] = np.nan        # a column whose dtype changes in a later chunk
+    df.to_csv(path, index=False)
+
+
+def test_chunked_store_matches_csv(tmp_path):
+    csv = tmp_path / "sld.csv"
+    _sld_csv(csv)
+    store_dir = str(tmp_path / "store")
+    walk_df = load_sld(str(csv), statefp=48, store_dir=store_dir, chunksize=700)
+
+    expected = read_sld(str(csv), statefp=48)
+    expected = expected.iloc[np.argsort(expected['COUNTYFP'].to_numpy(), kind='stable')].reset_index(drop=True)
+    pd.testing.assert_frame_equal(walk_df, expected[SLD_COLS], check_dtype=False)
+    assert not os.path.exists(os.path.join(store_dir, "_chunks"))
+
+
+def test_compact_slices_share_the_store(tmp_path):
+    csv = tmp_path / "sld.csv"
+    _sld_csv(csv)
+    store_dir = str(tmp_path / "store")
+    full = load_sld(str(csv), statefp=[6, 36], store_dir=store_dir, chunksize=1000)
+    built = os.path.getmtime(os.path.join(store_dir, "meta.json"))
+
+    compact = load_sld(str(csv), statefp=[6, 36], store_dir=store_dir, chunksize=1000, compact=True)
+    assert os.path.getmtime(os.path.join(store_dir, "meta.json")) == built
+    assert compact['TotPop'].dtype == 'int32'
+    np.testing.assert_allclose(compact['NatWalkInd'], full['NatWalkInd'], rtol=1e-6)
+    assert open_sld_store(str(csv), store_dir).meta["rows"] == 3000
+
+
+def test_condensed_compact_slices_match_float64(tmp_path):
+    csv = tmp_path / "sld.csv"
+    _sld_csv(csv)
+    store = open_sld_store(str(csv), str(tmp_path / "store"), chunksize=1000)
+    full = store.frame(statefp=48).astype('float64')
+    compact = store.frame(statefp=48, compact=True)
+    assert compact['COUNTYFP'].dtype == SLD_DTYPE_PLAN['COUNTYFP'] and compact['P_WrkAge'].dtype == 'float32'
+    assert compact['TotEmp'].dtype == 'float32'          # NaN counts fall back to float32
+
+    expected = condense_counties(full, key='COUNTYFP')
+    result = condense_counties(compact, key='COUNTYFP')
+    np.testing.assert_array_equal(result['COUNTYFP'], expected['COUNTYFP'])
+    values = expected.columns.drop('COUNTYFP')
+    np.testing.assert_allclose(result[values].to_numpy(dtype='float64'), expected[values].to_numpy(), rtol=COMPACT_RTOL)
+
+
+def test_store_parts_keep_the_memory_budget(tmp_path):
+    csv = tmp_path / "sld.csv"
+    _sld_csv(csv)
+    parts = read_walk_parts(str(csv), [6, 48, 12], use_store=True, memory_budget_mb=64)
+    assert sorted(parts) == [6, 48]
+    store_dir, compact = parts[48]
+    assert compact and SLDStore(store_dir).frame(statefp=48, compact=compact)['TotPop'].dtype == 'int32'
+    assert read_walk_parts(str(csv), [48], use_store=True)[48] == (store_dir, False)
@@ -0,0 +1,68 @@
+# Spatial weights over county tables with unresolved (MISSING / NaN) and repeated GEOIDs
+import numpy as np
+import pandas as pd
+
+from geo_index import MISSING
+from spatial import SpatialWeights, add_spatial_lags, located_values, local_moran, main, moran_table
+
+# A 3 x 3 grid of counties, rook contiguity (GEOIDs 48001..48009)
+GRID = 48000 + np.arange(1, 10)
+
+
+def grid_pairs():
+    pairs = []
+    for i in range(9):
+        r, c = divmod(i, 3)
+        for j in range(9):
+            rr, cc = divmod(j, 3)
+            if abs(r - rr) + abs(c - cc) == 1:
+                pairs.append((GRID[i], GRID[j]))
+    return pd.DataFrame(pairs, columns=["GEOID", "NEIGHBOR_GEOID"])
+
+
+def test_unresolved_and_repeated_geoids_are_islands():
+    table_geoids = np.array([48001, MISSING, 48002, MISSING, 48005, 48002, 99999])
+    weights = SpatialWeights.from_pairs(grid_pairs(), GRID).subset(table_geoids)
+    assert list(weights.cardinalities) == [1, 0, 2, 0, 1, 0, 0]     # 48001-48002, 48002-48005
+    direct = SpatialWeights.from_pairs(grid_pairs(), table_geoids)
+    assert (direct.neighbors != weights.neighbors).nnz == 0
+    # and a subset of a subset with MISSING rows still works (what the spatial stage does per column)
+    again = weights.subset(weights.geoids[[0, 1, 2, 3]])
+    assert list(again.cardinalities) == [1, 0, 1, 0]
+
+
+def test_moran_and_lags_skip_unresolved_counties():
+    rng = np.random.default_rng(0)
+    geoids = np.concatenate([GRID, [MISSING, MISSING]])
+    df = pd.DataFrame({"GEOID": geoids, "v": rng.normal(size=len(geoids))})
+    weights = SpatialWeights.from_pairs(grid_pairs(), GRID).subset(df["GEOID"])
+
+    table = moran_table(df, weights, ["v"], permutations=99)
+    resolved = moran_table(df.iloc[:9], SpatialWeights.from_pairs(grid_pairs(), GRID), ["v"], permutations=99)
+    assert table["n"][0] == 9
+    assert np.isclose(table["I"][0], resolved["I"][0])
+
+    x, ok = located_values(df, weights, "v")
+    local = local_moran(x[ok], weights.subset(weights.geoids[ok]), permutations=99)
+    assert len(local) == 9 and local["Ii"].notna().all()
+
+    lags = add_spatial_lags(df, weights, ["v"])["lag_v"]
+    assert lags.iloc[9:].isna().all()
+    assert np.isclose(lags.iloc[0], df["v"].iloc[[1, 3]].mean())        # 48001: 48002 and 48004
+
+
+def test_cli_with_unresolved_counties(tmp_path):
+    adjacency = tmp_path / "adjacency.txt"
+    lines = ["County Name|County GEOID|Neighbor Name|Neighbor GEOID"]
+    lines += [f"a|{a:05d}|b|{b:05d}" for a, b in grid_pairs().itertuples(index=False)]
+    adjacency.write_text("\n".join(lines) + "\n")
+    # national table layout: no GEOID column, COUNTYFP NaN where the county didn't resolve
+    rng = np.random.default_rng(1)
+    table = pd.DataFrame({"STATEFP": [48] * 11, "COUNTYFP": list(range(1, 10)) + [np.nan, np.nan],
+                          "Obesity among adults": rng.normal(30, 3, 11), "wtd_avg_walk_index": rng.normal(8, 2, 11)})
+    table.to_csv(tmp_path / "national.csv", index=False)
+    main(["--input", str(tmp_path / "national.csv"), "--adjacency", str(adjacency), "--permutations", "99",
+          "--output", str(tmp_path / "moran.csv"), "--local-output", str(tmp_path / "local.csv"),
+          "--lags-output", str(tmp_path / "lags.csv")])
+    assert (pd.read_csv(tmp_path / "moran.csv")["n"] == 9).all()
+    assert pd.read_csv(tmp_path / "lags.csv")["lag_wtd_avg_walk_index"].iloc[9:].isna().all()
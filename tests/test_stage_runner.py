@@ -0,0 +1,26 @@
+from stage_runner import Stage, run_stages
+
+
+def test_outputs_and_always_run_stages(tmp_path):
+    out = tmp_path / "table.csv"
+    calls = []
+
+    def write():
+        calls.append("write")
+        out.write_text("x\n1\n")
+        return 1
+
+    def show(value):
+        calls.append("show")
+
+    stages = [Stage("write", write, outputs=[str(out)]), Stage("show", show, deps=["write"], always=True)]
+    cache = str(tmp_path / "cache")
+
+    assert run_stages(stages, cache_dir=cache) == {"write": "ran", "show": "ran"}
+    # the side-effect stage runs again, its cached upstream stage does not
+    assert run_stages(stages, cache_dir=cache) == {"write": "cached", "show": "ran"}
+    # a missing output file re-runs the stage that writes it
+    out.unlink()
+    assert run_stages(stages, cache_dir=cache) == {"write": "ran", "show": "ran"}
+    assert out.exists()
+    assert calls == ["write", "show", "show", "write", "show"]
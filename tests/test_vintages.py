@@ -0,0 +1,48 @@
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from benchmark import generate_inputs
+from merged_store import list_vintages
+from places import measures_to_keep
+from vintages import Vintage, ingest_vintages
+from walkability import COUNTY_COLS
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data Dominators Walkability vs Obesity.py")
+
+
+def _pipeline():
+    spec = importlib.util.spec_from_file_location("pipeline", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The main pipeline's merged table for a few Texas counties
+def _merged(n=6, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"GEOID": 48000 + np.arange(n) * 2 + 1, "Texas County": [f"TX{i:03d}" for i in range(n)],
+                       "TotalPopulation": rng.integers(1000, 100000, n), "TotalPop18plus": rng.integers(500, 900, n)})
+    for col in measures_to_keep:
+        df[col] = rng.uniform(10, 40, n).round(1)
+    for name, _, _ in COUNTY_COLS:
+        df[name] = rng.random(n)
+    return df
+
+
+# A newer release ingested into the same database must not change what persist reads back
+def test_persist_reads_its_own_vintage_after_a_newer_one_is_ingested(tmp_path):
+    pipeline = _pipeline()
+    data_dir = generate_inputs(str(tmp_path / "data"), 3000, 1)
+    ingest_vintages([Vintage("PLACES_2099_newer", os.path.join(data_dir, "places.csv"), os.path.join(data_dir, "sld.csv"))],
+                    db_path=pipeline.db_path, county_fips_path=os.path.join(data_dir, "county_fips.csv"),
+                    states=['TX'], max_workers=1)
+
+    merged_df = _merged()
+    results_df = pipeline.persist(merged_df)
+    assert len(list_vintages(pipeline.db_path)) == 2
+    assert len(results_df) == len(merged_df)
+    np.testing.assert_allclose(results_df["Obesity among adults"], merged_df["Obesity among adults"])
+    np.testing.assert_allclose(results_df["wtd_avg_walk_index"], merged_df["wtd_avg_walk_index"])
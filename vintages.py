@@ -0,0 +1,155 @@
+# Multi-vintage ingestion for the Data Dominators pipeline
+# A vintage is one release pair: a PLACES county release and the SLD version it is joined with.
+# Every stored county row carries its vintage (the vintage column of Merged_Main, see merged_store.py).
+#
+# ingest_vintages() loads only what the store doesn't have yet: vintages (or states of a vintage) that are
+# already in Merged_Main are skipped, so a new quarterly release appends its own county rows and never
+# rebuilds the older ones. Several new vintages are processed together:
+#   - the county FIPS table is read once and one CountyIndex (GEOID keys + name index) is shared by all of them
+#   - each distinct SLD file is read once, even when several PLACES releases are joined with it
+#   - the source files are read on a thread pool, and every (vintage, state) runs on one process pool
+# Change tables between vintages come straight out of the store (merged_store.change_table).
+#
+# The vintages are listed in a json manifest, oldest first:
+#   [{"name": "PLACES_2024_20251119", "places": "InputData/PLACES__..._2024_release_20251119.csv",
+#     "sld": "InputData/EPA_SmartLocationDatabase_V3_Jan_2021_Final.csv"}, ...]
+#
+# Example:
+#   python vintages.py --manifest InputData/vintages.json --states TX OK --county-fips InputData/COUNTYFP_US.csv \
+#       --changes-output OutputData/Vintage_Changes.csv
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from geo_index import STATE_FIPS, CountyIndex
+from merged_store import DEFAULT_VINTAGE, change_table, list_vintages, vintage_states, write_merged
+from national import (COUNTY_COL, combine_states, health_path, parse_states, read_county_fips, read_walk_parts,
+                      run_state, state_jobs, walk_path)
+from places import read_places
+
+DB_PATH = "OutputData/my_database.db"
+
+
+class Vintage:
+    def __init__(self, name, places_path, sld_path):
+        self.name = name                # stored in the vintage column; sorts in release order
+        self.places_path = places_path
+        self.sld_path = sld_path
+
+    def __repr__(self):
+        return f"Vintage({self.name!r})"
+
+
+# The current single release (what the rest of the pipeline reads)
+DEFAULT_VINTAGES = [Vintage(DEFAULT_VINTAGE, health_path, walk_path)]
+
+
+def read_manifest(path):
+    with open(path) as f:
+        entries = json.load(f)
+    return [Vintage(e["name"], e["places"], e["sld"]) for e in entries]
+
+
+# Loads every vintage / state that isn't in the store yet (all of them with force=True).
+# Returns {vintage name: the county table written for it} for the vintages that were processed.
+def ingest_vintages(vintages=DEFAULT_VINTAGES, db_path=DB_PATH, county_fips_path="InputData/COUNTYFP_US.csv",
+                    states='all', max_workers=None, force=False):
+    states = parse_states(states)
+    stored = {} if force else vintage_states(db_path)
+    todo = {}
+    for v in vintages:
+        missing = [s for s in states if s not in stored.get(v.name, set())]
+        if missing:
+            todo[v.name] = (v, missing)
+        else:
+            print(f"Vintage {v.name} is already in {db_path}")
+    if not todo:
+        return {}
+
+    county_fp_df = read_county_fips(county_fips_path)
+    index = CountyIndex.from_table(county_fp_df, COUNTY_COL)   # shared by every vintage
+
+    # Source files on a thread pool: each distinct SLD once, each PLACES release once
+    sld_states = {}
+    for v, missing in todo.values():
+        sld_states.setdefault(v.sld_path, set()).update(STATE_FIPS[s] for s in missing)
+
+    def read_places_vintage(v, missing):
+        print("="*10, f"Importing {v.places_path} ({v.name})", "="*10)
+        return read_places(v.places_path, states=missing)
+
+    with ThreadPoolExecutor() as pool:
+        walk_futures = {path: pool.submit(read_walk_parts, path, sorted(fips)) for path, fips in sld_states.items()}
+        health_futures = {name: pool.submit(read_places_vintage, v, missing) for name, (v, missing) in todo.items()}
+        walk = {path: f.result() for path, f in walk_futures.items()}
+        health = {name: f.result() for name, f in health_futures.items()}
+
+    jobs, owners = [], []
+    for name, (v, missing) in todo.items():
+        vintage_jobs = state_jobs(missing, walk[v.sld_path], health[name], county_fp_df, index, county_fips_path,
+                                  label=name)
+        jobs += vintage_jobs
+        owners += [name] * len(vintage_jobs)
+
+    print("="*10, f"Processing {len(jobs)} vintage-state(s) on {max_workers or os.cpu_count()} worker(s)", "="*10)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(run_state, *zip(*jobs))) if jobs else []
+
+    written_tables = {}
+    for name in todo:
+        vintage_df = combine_states([df for df, owner in zip(results, owners) if owner == name], label=name)
+        if not len(vintage_df):
+            print(f"Vintage {name}: no counties.")
+            continue
+        vintage_df.insert(0, 'vintage', name)
+        written = write_merged(db_path, vintage_df, county_col=COUNTY_COL, vintage=name)
+        print(f"Vintage {name}: {written} of {len(vintage_df)} counties written to Merged_Main in {db_path}")
+        written_tables[name] = vintage_df
+    return written_tables
+
+
+# Change tables between consecutive vintages (in the given order, or every stored vintage in name order),
+# stacked into one long table with base_vintage / vintage columns
+def vintage_changes(db_path=DB_PATH, vintages=None, columns=None, states=None):
+    if vintages is None:
+        vintages = list_vintages(db_path)
+    tables = [change_table(db_path, base, target, columns, states) for base, target in zip(vintages, vintages[1:])]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load new PLACES / SLD releases into the county store and compare vintages.")
+    parser.add_argument('--manifest', default=None, help='json list of vintages (name, places, sld), oldest first')
+    parser.add_argument('--vintage', nargs=3, action='append', metavar=('NAME', 'PLACES', 'SLD'),
+                        help='a vintage given on the command line (repeatable, instead of --manifest)')
+    parser.add_argument('--states', nargs='+', default=['all'], help='state abbreviations / FIPS codes, or "all"')
+    parser.add_argument('--county-fips', default="InputData/COUNTYFP_US.csv", help='national county FIPS table')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: all cores)')
+    parser.add_argument('--force', action='store_true', help='reload vintages that are already in the store')
+    parser.add_argument('--changes-output', default=None, help='write the change table between consecutive vintages here')
+    parser.add_argument('--columns', nargs='+', default=None, help='columns for the change table (default: the health measures)')
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        vintages = read_manifest(args.manifest)
+    elif args.vintage:
+        vintages = [Vintage(*v) for v in args.vintage]
+    else:
+        vintages = DEFAULT_VINTAGES
+    ingest_vintages(vintages, args.db, args.county_fips, args.states, args.workers, args.force)
+
+    if args.changes_output:
+        states = None if args.states == ['all'] else parse_states(args.states)
+        changes = vintage_changes(args.db, [v.name for v in vintages], args.columns, states)
+        os.makedirs(os.path.dirname(args.changes_output) or ".", exist_ok=True)
+        changes.to_csv(args.changes_output, index=False)
+        print("="*10, f"Exported {len(changes)} county changes to {args.changes_output}", "="*10)
+
+
+if __name__ == '__main__':
+    main()
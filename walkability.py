@@ -0,0 +1,221 @@
+# Walkability helpers for the Data Dominators project
+# Reading the EPA Smart Location Database (SLD) and rolling block groups up to counties
+
+import numpy as np
+import pandas as pd
+
+# Columns of EPA_SmartLocationDatabase_V3 that the county rollup actually uses
+SLD_KEY_COLS = ['STATEFP', 'COUNTYFP']
+SLD_VALUE_COLS = [
+    'TotPop', 'TotEmp',
+    'E_LowWageWk', 'E_MedWageWk', 'E_HiWageWk',
+    'Workers', 'R_LowWageWk', 'R_MedWageWk', 'R_HiWageWk',
+    'HH', 'AutoOwn0', 'AutoOwn1', 'AutoOwn2p',
+    'P_WrkAge', 'NatWalkInd'
+]
+SLD_COLS = SLD_KEY_COLS + SLD_VALUE_COLS
+
+# Rows per chunk when streaming the SLD csv (~220k block groups nationally)
+SLD_CHUNKSIZE = 50_000
+
+# Compact dtype plan for the SLD columns (pandas defaults to int64/float64 for all of them).
+# Counts fit in int32, the FIPS keys in int8/int16, and the two indices/shares are stored as float32.
+# Sums and weighted sums are still accumulated in float64 (see county_sums), so the condensed county
+# table stays within COMPACT_RTOL (relative) of the full-precision result.
+SLD_DTYPE_PLAN = {
+    'STATEFP': 'int8', 'COUNTYFP': 'int16',
+    'TotPop': 'int32', 'TotEmp': 'int32',
+    'E_LowWageWk': 'int32', 'E_MedWageWk': 'int32', 'E_HiWageWk': 'int32',
+    'Workers': 'int32', 'R_LowWageWk': 'int32', 'R_MedWageWk': 'int32', 'R_HiWageWk': 'int32',
+    'HH': 'int32', 'AutoOwn0': 'int32', 'AutoOwn1': 'int32', 'AutoOwn2p': 'int32',
+    'P_WrkAge': 'float32', 'NatWalkInd': 'float32'
+}
+COMPACT_RTOL = 1e-6
+
+
+# Downcasts one column according to the dtype plan (columns not in the plan come back as they are).
+# Integer targets are only used when the column really is whole numbers in range (no NaN);
+# otherwise the column falls back to float32 for counts, or stays as it is for keys.
+def compact_values(col, values, plan=SLD_DTYPE_PLAN):
+    dtype = plan.get(col)
+    if dtype is None or values.dtype == dtype:
+        return values
+    if dtype.startswith('int'):
+        info = np.iinfo(dtype)
+        whole = len(values) > 0 and not pd.isna(values).any() and (values % 1 == 0).all()
+        if whole and values.min() >= info.min and values.max() <= info.max:
+            return values.astype(dtype)
+        return values if col in SLD_KEY_COLS else values.astype('float32')
+    return values.astype(dtype)
+
+
+# Downcasts the columns of df according to the dtype plan (see compact_values)
+def compact_sld(df, plan=SLD_DTYPE_PLAN):
+    for col in plan:
+        if col in df.columns:
+            df[col] = compact_values(col, df[col], plan)
+    return df
+
+
+# Picks a csv chunk size that keeps one parsed chunk well under the memory budget (in MB).
+# The SLD has 100+ columns, so the text of a row costs far more than the projected values;
+# the bytes per line are measured from the top of the file.
+def plan_chunksize(path, memory_budget_mb, sample_lines=2000):
+    with open(path, 'rb') as f:
+        f.readline()
+        sample = [len(line) for _, line in zip(range(sample_lines), f)]
+    bytes_per_line = max(sum(sample) / max(len(sample), 1), 1)
+    # a quarter of the budget for the chunk, ~3x the raw text for the tokenizer and parsed columns
+    rows = int(memory_budget_mb * 1024 * 1024 * 0.25 / (3 * bytes_per_line))
+    return max(1_000, min(rows, 500_000))
+
+
+# Yields the SLD csv chunk by chunk, keeping only the needed columns and the requested state(s).
+# statefp can be a single FIPS code (48 = Texas), a list of codes, or None for every state.
+# compact=True applies SLD_DTYPE_PLAN to every chunk.
+def iter_sld(path, statefp=48, usecols=SLD_COLS, chunksize=SLD_CHUNKSIZE, compact=False):
+    if statefp is not None and not isinstance(statefp, (list, tuple, set)):
+        statefp = [statefp]
+    usecols = list(dict.fromkeys(list(usecols) + ['STATEFP']))
+
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+        if statefp is not None:
+            chunk = chunk[chunk['STATEFP'].isin(statefp)]
+        if len(chunk):
+            yield compact_sld(chunk.copy()) if compact else chunk
+
+
+# Streams the SLD csv (see iter_sld) into one frame.
+# Peak memory is one chunk plus the rows that survive the state filter.
+def read_sld(path, statefp=48, usecols=SLD_COLS, chunksize=SLD_CHUNKSIZE, compact=False):
+    kept = list(iter_sld(path, statefp, usecols, chunksize, compact))
+    if not kept:
+        return pd.DataFrame(columns=list(dict.fromkeys(list(usecols) + ['STATEFP'])))
+    return pd.concat(kept, ignore_index=True)
+
+
+# Adds the packed county GEOID (STATEFP * 1000 + COUNTYFP) and the county name column from a county
+# FIPS table (COUNTYFP_TX.csv or the national table). Names come from one array lookup on the GEOID
+# (see geo_index.py) and are stored as a categorical instead of merging a copy of the whole block group frame.
+# A table without STATEFP (COUNTYFP_TX.csv) is taken to cover statefp, or the only state in walk_df.
+# Block groups in counties the table doesn't list get a NaN name.
+def attach_county_names(walk_df, county_fp_df, key='Texas County', statefp=None):
+    from geo_index import CountyIndex, pack_geoid
+    if 'STATEFP' not in county_fp_df.columns and statefp is None:
+        states = walk_df['STATEFP'].unique()
+        if len(states) > 1:
+            raise ValueError("County table has no STATEFP column and walk_df covers several states; pass statefp")
+        statefp = states[0] if len(states) else 0
+    index = CountyIndex.from_table(county_fp_df, key, statefp)
+    walk_df['GEOID'] = pack_geoid(walk_df['STATEFP'], walk_df['COUNTYFP'])
+    walk_df[key] = index.names_of(walk_df['GEOID'])
+    return walk_df
+
+
+# Block group count per SLD county that the county table doesn't list (run after attach_county_names)
+def unmatched_counties(walk_df, key='Texas County'):
+    missing = walk_df.loc[walk_df[key].isna(), 'GEOID']
+    counts = missing.value_counts().sort_index()
+    return pd.DataFrame({'GEOID': counts.index.astype('int64'), 'block_groups': counts.to_numpy()})
+
+
+# Original per-county rollup, applied with merged_df.groupby(['Texas County']).apply(condense_function).
+# Kept as the reference definition of every column; condense_counties below gives the same table in one pass.
+def condense_function(df):
+    new_df = pd.Series({
+        'COUNTY_POP': df['TotPop'].sum(), # Total population of county
+        'COUNTY_EMP': df['TotEmp'].sum(), # Total employed population of county
+        'total_low_wage_emp': df['E_LowWageWk'].sum(),
+        'total_med_wage_emp': df['E_MedWageWk'].sum(),
+        'total_hi_wage_emp': df['E_HiWageWk'].sum(),
+        'pct_low_wage_emp': df['E_LowWageWk'].sum() / df['TotEmp'].sum(),
+        'pct_med_wage_emp': df['E_MedWageWk'].sum() / df['TotEmp'].sum(),
+        'pct_hi_wage_emp': df['E_HiWageWk'].sum() / df['TotEmp'].sum(),
+        'COUNTY_WRK': df['Workers'].sum(), # Total worker population of county
+        'total_low_wage_wrk': df['R_LowWageWk'].sum(),
+        'total_med_wage_wrk': df['R_MedWageWk'].sum(),
+        'total_hi_wage_wrk': df['R_HiWageWk'].sum(),
+        'pct_low_wage_wrk': df['R_LowWageWk'].sum() / df['Workers'].sum(),
+        'pct_med_wage_wrk': df['R_MedWageWk'].sum() / df['Workers'].sum(),
+        'pct_hi_wage_wrk': df['R_HiWageWk'].sum() / df['Workers'].sum(),
+        'HH_total': df['HH'].sum(), # total number of households in county
+        'total_0_autos': df['AutoOwn0'].sum(), # number of households with 0 vehicles
+        'total_1_autos': df['AutoOwn1'].sum(), # number of households with 1 vehicles
+        'total_2_autos': df['AutoOwn2p'].sum(), # number of households with 2 or more vehicles
+        '0_autos_pct': df['AutoOwn0'].sum() / df['HH'].sum(), # percentage of households with 0 vehicles
+        '1_autos_pct': df['AutoOwn1'].sum() / df['HH'].sum(), # percentage of households with 1 vehicles
+        '2_autos_pct': df['AutoOwn2p'].sum() / df['HH'].sum(), # percentage of households with 2 or more vehicles
+        'wtd_WrkAge_pop_pct': (df['P_WrkAge'] * df['TotPop']).sum() / df['TotPop'].sum(), # percentage of working age people in population
+        'wtd_avg_walk_index': (df['NatWalkInd'] * df['TotPop']).sum() / df['TotPop'].sum() # average walkability index weighted by region population in county
+    })
+    return new_df
+
+
+# Raw block group columns that get summed per county
+SUM_COLS = [
+    'TotPop', 'TotEmp',
+    'E_LowWageWk', 'E_MedWageWk', 'E_HiWageWk',
+    'Workers', 'R_LowWageWk', 'R_MedWageWk', 'R_HiWageWk',
+    'HH', 'AutoOwn0', 'AutoOwn1', 'AutoOwn2p'
+]
+# Population-weighted columns, summed as value * TotPop and divided by the county TotPop
+WEIGHTED_COLS = {'P_WrkAge': 'WrkAge_x_pop', 'NatWalkInd': 'WalkInd_x_pop'}
+
+# Output columns of the county rollup, in the same order as condense_function
+# (name, numerator sum, denominator sum or None for plain totals)
+COUNTY_COLS = [
+    ('COUNTY_POP', 'TotPop', None),
+    ('COUNTY_EMP', 'TotEmp', None),
+    ('total_low_wage_emp', 'E_LowWageWk', None),
+    ('total_med_wage_emp', 'E_MedWageWk', None),
+    ('total_hi_wage_emp', 'E_HiWageWk', None),
+    ('pct_low_wage_emp', 'E_LowWageWk', 'TotEmp'),
+    ('pct_med_wage_emp', 'E_MedWageWk', 'TotEmp'),
+    ('pct_hi_wage_emp', 'E_HiWageWk', 'TotEmp'),
+    ('COUNTY_WRK', 'Workers', None),
+    ('total_low_wage_wrk', 'R_LowWageWk', None),
+    ('total_med_wage_wrk', 'R_MedWageWk', None),
+    ('total_hi_wage_wrk', 'R_HiWageWk', None),
+    ('pct_low_wage_wrk', 'R_LowWageWk', 'Workers'),
+    ('pct_med_wage_wrk', 'R_MedWageWk', 'Workers'),
+    ('pct_hi_wage_wrk', 'R_HiWageWk', 'Workers'),
+    ('HH_total', 'HH', None),
+    ('total_0_autos', 'AutoOwn0', None),
+    ('total_1_autos', 'AutoOwn1', None),
+    ('total_2_autos', 'AutoOwn2p', None),
+    ('0_autos_pct', 'AutoOwn0', 'HH'),
+    ('1_autos_pct', 'AutoOwn1', 'HH'),
+    ('2_autos_pct', 'AutoOwn2p', 'HH'),
+    ('wtd_WrkAge_pop_pct', 'WrkAge_x_pop', 'TotPop'),
+    ('wtd_avg_walk_index', 'WalkInd_x_pop', 'TotPop'),
+]
+
+
+# Per-county raw sums of every additive block group column (one grouped pass)
+def county_sums(merged_df, key='Texas County'):
+    keys = [key] if isinstance(key, str) else list(key)
+    # float64 accumulators, whatever dtypes the block group frame is stored in
+    sums_in = merged_df[keys].copy()
+    for col in SUM_COLS:
+        sums_in[col] = merged_df[col] if merged_df[col].dtype.kind == 'i' else merged_df[col].astype('float64')
+    for col, weighted in WEIGHTED_COLS.items():
+        sums_in[weighted] = merged_df[col].astype('float64') * merged_df['TotPop'].astype('float64')
+    return sums_in.groupby(keys, observed=True).sum().astype('float64')
+
+
+# Turns the raw county sums into the condensed walkability table (totals, shares, weighted means)
+def condense_sums(sums):
+    new_df = pd.DataFrame(index=sums.index)
+    for name, num, den in COUNTY_COLS:
+        new_df[name] = sums[num] if den is None else sums[num] / sums[den]
+    new_df = new_df.reset_index()
+    # county names attached as categoricals go back to plain values for the merges downstream
+    for col in sums.index.names:
+        if isinstance(new_df[col].dtype, pd.CategoricalDtype):
+            new_df[col] = new_df[col].astype(new_df[col].cat.categories.dtype)
+    return new_df
+
+
+# Vectorized replacement for merged_df.groupby([key]).apply(condense_function).reset_index()
+def condense_counties(merged_df, key='Texas County'):
+    return condense_sums(county_sums(merged_df, key))